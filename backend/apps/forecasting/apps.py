@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ForecastingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.forecasting'
+
+    def ready(self):
+        from apps.timeseries.signals import points_appended
+        from apps.forecasting.services.online import rescore_on_append
+        points_appended.connect(rescore_on_append, dispatch_uid='forecasting-online-accuracy')
@@ -0,0 +1,55 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(poll_interval, sandbox_workers, stop_event):
+    import django
+    django.setup()
+    from apps.forecasting.services.jobs import run_worker
+    from apps.forecasting.services.sandbox import default_pool
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Воркер выполняет одно задание за раз: пул песочницы воркера небольшой, а не по числу ядер
+    default_pool(sandbox_workers)
+    run_worker(poll_interval=poll_interval, should_stop=stop_event.is_set)
+
+
+class Command(BaseCommand):
+    help = 'Запускает N процессов-воркеров, выполняющих задания прогнозирования из очереди ForecastJob.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Количество процессов-воркеров (по умолчанию — число ядер).')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза в секундах между опросами пустой очереди.')
+        parser.add_argument('--sandbox-workers', type=int, default=None,
+                            help='Наибольшее число процессов песочницы в каждом воркере '
+                                 '(по умолчанию — FORECAST_JOB_SANDBOX_WORKERS).')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        sandbox_workers = max(1, options['sandbox_workers'] or getattr(settings, 'FORECAST_JOB_SANDBOX_WORKERS', 1))
+        # Соединения с БД нельзя наследовать дочерним процессам
+        connections.close_all()
+        ctx = multiprocessing.get_context('spawn')
+        stop_event = ctx.Event()
+        processes = [
+            ctx.Process(target=_worker_main, args=(options['poll_interval'], sandbox_workers, stop_event), daemon=False)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено воркеров: {workers}')
+
+        def stop(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
+        self.stdout.write('Воркеры остановлены.')
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0005_forecastjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScriptValidation',
+            fields=[
+                ('script_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('passed', models.BooleanField()),
+                ('error', models.TextField(blank=True)),
+                ('checked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
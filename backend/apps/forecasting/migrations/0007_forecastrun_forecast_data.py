@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0006_scriptvalidation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastrun',
+            name='forecast_data',
+            field=models.BinaryField(null=True),
+        ),
+    ]
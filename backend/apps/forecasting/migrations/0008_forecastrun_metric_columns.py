@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+METRIC_FIELDS = {
+    'MAE': 'mae', 'RMSE': 'rmse', 'R2': 'r2', 'MAPE': 'mape', 'sMAPE': 'smape', 'MASE': 'mase',
+    'duration': 'duration', 'memory_peak_mb': 'memory_peak_mb',
+}
+
+
+def metrics_to_columns(apps, schema_editor):
+    """
+    Переносит стандартные метрики из строк ForecastMetric в колонки ForecastRun
+    (по одному UPDATE ... FROM на метрику) и удаляет перенесённые строки.
+    """
+    ForecastRun = apps.get_model('forecasting', 'ForecastRun')
+    ForecastMetric = apps.get_model('forecasting', 'ForecastMetric')
+    for name, field in METRIC_FIELDS.items():
+        value = ForecastMetric.objects.filter(run=models.OuterRef('pk'), name=name).order_by('-id').values('value')[:1]
+        ForecastRun.objects.filter(metrics__name=name).update(**{field: models.Subquery(value)})
+    ForecastMetric.objects.filter(name__in=METRIC_FIELDS).delete()
+
+
+def columns_to_metrics(apps, schema_editor):
+    ForecastRun = apps.get_model('forecasting', 'ForecastRun')
+    ForecastMetric = apps.get_model('forecasting', 'ForecastMetric')
+    for name, field in METRIC_FIELDS.items():
+        rows = ForecastRun.objects.filter(**{f'{field}__isnull': False}).values_list('id', field)
+        ForecastMetric.objects.bulk_create(
+            [ForecastMetric(run_id=run_id, name=name, value=value) for run_id, value in rows.iterator()],
+            batch_size=5000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0007_forecastrun_forecast_data'),
+        ('timeseries', '0005_timeseriespoint_hypertable'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastrun',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='mae',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='mape',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='mase',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='memory_peak_mb',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='r2',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='rmse',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='smape',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(metrics_to_columns, columns_to_metrics),
+        migrations.AddIndex(
+            model_name='forecastmetric',
+            index=models.Index(fields=['name', 'run'], include=('value',), name='forecastmetric_name_run'),
+        ),
+        migrations.AddIndex(
+            model_name='forecastrun',
+            index=models.Index(fields=['user', 'timeseries', 'created_at'], include=('mae', 'rmse', 'r2', 'mape', 'smape', 'mase', 'script_name'), name='forecastrun_user_ts_created'),
+        ),
+        migrations.AddIndex(
+            model_name='forecastrun',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='forecastrun_user_created'),
+        ),
+    ]
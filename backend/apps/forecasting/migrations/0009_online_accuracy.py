@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_forecast_bounds(apps, schema_editor):
+    import pandas as pd
+    from apps.forecasting.services.forecast_storage import decode_forecast
+
+    ForecastRun = apps.get_model('forecasting', 'ForecastRun')
+    runs = ForecastRun.objects.filter(forecast_data__isnull=False).only('id', 'forecast_data')
+    for run in runs.iterator(chunk_size=500):
+        ds = decode_forecast(bytes(run.forecast_data))[0]
+        if len(ds):
+            ForecastRun.objects.filter(pk=run.pk).update(
+                forecast_start=pd.Timestamp(ds.min(), unit='ns', tz='UTC').to_pydatetime(),
+                forecast_end=pd.Timestamp(ds.max(), unit='ns', tz='UTC').to_pydatetime(),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0008_forecastrun_metric_columns'),
+        ('timeseries', '0007_timeseries_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastAccuracy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actual_until', models.DateTimeField()),
+                ('points', models.PositiveIntegerField()),
+                ('mae', models.FloatField(null=True)),
+                ('rmse', models.FloatField(null=True)),
+                ('r2', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='forecast_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='forecast_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='online_stats',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(backfill_forecast_bounds, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='forecastrun',
+            index=models.Index(fields=['timeseries', 'forecast_end'], name='forecastrun_ts_forecast_end'),
+        ),
+        migrations.AddField(
+            model_name='forecastaccuracy',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accuracy', to='forecasting.forecastrun'),
+        ),
+        migrations.AddIndex(
+            model_name='forecastaccuracy',
+            index=models.Index(fields=['run', 'actual_until'], name='forecasting_run_id_0b3be6_idx'),
+        ),
+    ]
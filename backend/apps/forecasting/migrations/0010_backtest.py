@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0009_online_accuracy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastrun',
+            name='backtest',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='BacktestFold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fold', models.PositiveIntegerField()),
+                ('train_start', models.DateTimeField()),
+                ('test_start', models.DateTimeField()),
+                ('test_end', models.DateTimeField()),
+                ('mae', models.FloatField(null=True)),
+                ('rmse', models.FloatField(null=True)),
+                ('r2', models.FloatField(null=True)),
+                ('mape', models.FloatField(null=True)),
+                ('smape', models.FloatField(null=True)),
+                ('mase', models.FloatField(null=True)),
+                ('duration', models.FloatField(null=True)),
+                ('memory_peak_mb', models.FloatField(null=True)),
+                ('error', models.TextField(blank=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='folds', to='forecasting.forecastrun')),
+            ],
+            options={
+                'ordering': ['run', 'fold'],
+                'constraints': [models.UniqueConstraint(fields=('run', 'fold'), name='backtestfold_run_fold')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0010_backtest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastrun',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='sandbox_pid',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastrun',
+            name='status',
+            field=models.CharField(choices=[('running', 'Выполняется'), ('done', 'Готово'), ('timeout', 'Превышено время'), ('oom', 'Превышен лимит памяти'), ('cancelled', 'Отменён')], default='done', max_length=20),
+        ),
+    ]
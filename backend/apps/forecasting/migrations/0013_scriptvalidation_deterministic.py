@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0012_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptvalidation',
+            name='deterministic',
+            field=models.BooleanField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0013_scriptvalidation_deterministic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastrun',
+            name='sandbox_host',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
@@ -6,13 +6,169 @@ from django.contrib.auth.models import User
 from apps.timeseries.models import Timeseries
 
 class ForecastRun(models.Model):
+    # Запуск пользовательского скрипта создаётся со статусом running и завершается одним из остальных;
+    # timeout и oom — скрипт остановлен ограничениями песочницы (services/sandbox.py), cancelled — отменён
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_TIMEOUT = 'timeout'
+    STATUS_OOM = 'oom'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_TIMEOUT, 'Превышено время'),
+        (STATUS_OOM, 'Превышен лимит памяти'),
+        (STATUS_CANCELLED, 'Отменён'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forecast_runs')
     timeseries = models.ForeignKey(Timeseries, on_delete=models.CASCADE, related_name='forecast_runs', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     script_name = models.CharField(max_length=255, blank=True, null=True)  # Новое поле для имени скрипта
     csv_file_name = models.CharField(max_length=255, blank=True, null=True)  # New field for CSV filename
+    # Прогноз в компактном бинарном виде (services/forecast_storage.py) и его границы
+    forecast_data = models.BinaryField(null=True, editable=False)
+    forecast_start = models.DateTimeField(null=True, blank=True, editable=False)
+    forecast_end = models.DateTimeField(null=True, blank=True, editable=False)
+    # Накопленные суммы для оценки прогноза по фактам, поступившим после запуска (services/online.py)
+    online_stats = models.JSONField(default=dict, blank=True, editable=False)
+    # Параметры бэктеста (services/backtest.py), если метрики — средние по фолдам; фолды — в BacktestFold
+    backtest = models.JSONField(null=True, blank=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_DONE)
+    error = models.TextField(blank=True)
+    # Рабочий процесс песочницы, выполняющий запуск, и процесс, отправивший ему задачу (хост:pid).
+    # Только для диагностики: отмену выполняет сам отправивший процесс, увидев статус cancelled
+    sandbox_pid = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    sandbox_host = models.CharField(max_length=255, blank=True, editable=False)
+
+    # Стандартные метрики хранятся колонками; прочие — строками ForecastMetric
+    mae = models.FloatField(null=True, blank=True)
+    rmse = models.FloatField(null=True, blank=True)
+    r2 = models.FloatField(null=True, blank=True)
+    mape = models.FloatField(null=True, blank=True)
+    smape = models.FloatField(null=True, blank=True)
+    mase = models.FloatField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    memory_peak_mb = models.FloatField(null=True, blank=True)
+
+    # Имя метрики в результатах execute_script -> колонка
+    METRIC_FIELDS = {
+        'MAE': 'mae', 'RMSE': 'rmse', 'R2': 'r2', 'MAPE': 'mape', 'sMAPE': 'smape', 'MASE': 'mase',
+        'duration': 'duration', 'memory_peak_mb': 'memory_peak_mb',
+    }
+
+    class Meta:
+        indexes = [
+            # Запуски пользователя по ряду в порядке времени; метрики в INCLUDE позволяют
+            # отвечать на запросы вида «RMSE этого ряда» сканированием только индекса
+            models.Index(
+                fields=['user', 'timeseries', 'created_at'],
+                include=['mae', 'rmse', 'r2', 'mape', 'smape', 'mase', 'script_name'],
+                name='forecastrun_user_ts_created',
+            ),
+            models.Index(fields=['user', '-created_at', '-id'], name='forecastrun_user_created'),
+            # Поиск прогнозов ряда, покрывающих новые факты
+            models.Index(fields=['timeseries', 'forecast_end'], name='forecastrun_ts_forecast_end'),
+        ]
+
+    def metric_values(self) -> dict:
+        """
+        Все метрики запуска: колонки и дополнительные строки ForecastMetric.
+        """
+        values = {name: getattr(self, field) for name, field in self.METRIC_FIELDS.items() if getattr(self, field) is not None}
+        values.update((m.name, m.value) for m in self.metrics.all())
+        return values
+
+class ForecastAccuracy(models.Model):
+    """
+    Снимок онлайн-точности запуска после очередной порции фактов: история для графиков точности во времени.
+    """
+    run = models.ForeignKey(ForecastRun, on_delete=models.CASCADE, related_name='accuracy')
+    created_at = models.DateTimeField(auto_now_add=True)
+    actual_until = models.DateTimeField()  # Последний учтённый факт
+    points = models.PositiveIntegerField()
+    mae = models.FloatField(null=True)
+    rmse = models.FloatField(null=True)
+    r2 = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['run', 'actual_until'])]
+
+
+class BacktestFold(models.Model):
+    """
+    Фолд бэктеста: обучающий участок [train_start, test_start) и метрики на тестовом [test_start, test_end].
+    """
+    run = models.ForeignKey(ForecastRun, on_delete=models.CASCADE, related_name='folds')
+    fold = models.PositiveIntegerField()
+    train_start = models.DateTimeField()
+    test_start = models.DateTimeField()
+    test_end = models.DateTimeField()
+    mae = models.FloatField(null=True)
+    rmse = models.FloatField(null=True)
+    r2 = models.FloatField(null=True)
+    mape = models.FloatField(null=True)
+    smape = models.FloatField(null=True)
+    mase = models.FloatField(null=True)
+    duration = models.FloatField(null=True)
+    memory_peak_mb = models.FloatField(null=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['run', 'fold']
+        constraints = [models.UniqueConstraint(fields=['run', 'fold'], name='backtestfold_run_fold')]
+
 
 class ForecastMetric(models.Model):
     run = models.ForeignKey(ForecastRun, on_delete=models.CASCADE, related_name='metrics')
     name = models.CharField(max_length=50)
-    value = models.FloatField()
\ No newline at end of file
+    value = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['name', 'run'], include=['value'], name='forecastmetric_name_run')]
+
+class ForecastJob(models.Model):
+    """
+    Задание на прогнозирование, выполняемое фоновыми воркерами (manage.py run_forecast_workers).
+    Воркеры забирают задания через SELECT ... FOR UPDATE SKIP LOCKED и, пока выполняют задание,
+    обновляют heartbeat_at; задание, чей воркер перестал отвечать, возвращается в очередь (services/jobs.py).
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forecast_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    scripts = models.JSONField()  # Список словарей {'name': имя файла, 'source': исходный код}
+    timeseries_ids = models.JSONField(default=list)
+    result = models.JSONField(null=True, blank=True)  # Результаты в формате ответа BenchmarkView
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(default=0)  # Сколько раз задание забирали воркеры
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Последний сигнал воркера о работе
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+
+class ScriptValidation(models.Model):
+    """
+    Результат проверки скрипта на соответствие шаблону, ключ — SHA-256 исходного кода.
+    Скрипт с тем же содержимым повторно не проверяется.
+    """
+    script_hash = models.CharField(max_length=64, primary_key=True)
+    passed = models.BooleanField()
+    error = models.TextField(blank=True)
+    # Значение DETERMINISTIC скрипта, прочитанное при проверке в песочнице (None — ещё не известно)
+    deterministic = models.BooleanField(null=True)
+    checked_at = models.DateTimeField(auto_now_add=True)
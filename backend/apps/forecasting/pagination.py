@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BenchmarkResultsPagination(CursorPagination):
+    """
+    Курсорная пагинация запусков: от новых к старым, размер страницы задаётся параметром page_size.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,36 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class BinaryRenderer(BaseRenderer):
+    """
+    Отдаёт байты как есть; остальные данные (например, ошибки) — в виде JSON.
+    """
+    media_type = 'application/octet-stream'
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else json.dumps(data).encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON: одна JSON-строка на объект. Потоковые ответы формируют
+    строки сами через ndjson_line, renderer нужен для согласования Accept и ответов с ошибкой.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(ndjson_line(item) for item in items)
+
+
+def ndjson_line(item) -> bytes:
+    return json.dumps(item, ensure_ascii=False).encode() + b'\n'
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ForecastRun, ForecastMetric
+from .models import ForecastRun, ForecastMetric, ForecastJob
 from apps.timeseries.serializers import TimeseriesSerializer
 
 class ForecastMetricSerializer(serializers.ModelSerializer):
@@ -8,11 +8,25 @@ class ForecastMetricSerializer(serializers.ModelSerializer):
         fields = ['name', 'value']
 
 class ForecastRunSerializer(serializers.ModelSerializer):
-    metrics = ForecastMetricSerializer(many=True)
+    metrics = serializers.SerializerMethodField()
     timeseries = serializers.CharField(source='timeseries.name', read_only=True)
     script_name = serializers.CharField(read_only=True)  # Добавляем поле script_name
     csv_file_name = serializers.CharField(read_only=True, allow_null=True)  # Add csv_file_name
 
     class Meta:
         model = ForecastRun
-        fields = ['id', 'timeseries', 'created_at', 'metrics', 'script_name', 'csv_file_name']
\ No newline at end of file
+        fields = ['id', 'timeseries', 'created_at', 'metrics', 'script_name', 'csv_file_name', 'status', 'error']
+
+    def get_metrics(self, obj):
+        return [{'name': name, 'value': value} for name, value in obj.metric_values().items()]
+
+class ForecastJobSerializer(serializers.ModelSerializer):
+    scripts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ForecastJob
+        fields = ['id', 'status', 'scripts', 'timeseries_ids', 'result', 'error', 'attempts',
+                  'created_at', 'started_at', 'finished_at']
+
+    def get_scripts(self, obj):
+        return [s['name'] for s in obj.scripts]
@@ -0,0 +1,63 @@
+"""
+Сводка запусков бенчмарка, вычисляемая в базе данных (GROUP BY), без выгрузки всех ForecastRun.
+"""
+from django.db.models import Avg, Count, F, Max, Min, Window
+from django.db.models.functions import RowNumber
+
+from apps.forecasting.models import ForecastRun
+from apps.forecasting.services.metrics import HIGHER_IS_BETTER
+
+# Параметр group_by -> поля ForecastRun, по которым группируются запуски
+GROUP_FIELDS = {
+    'script_name': ['script_name'],
+    'timeseries': ['timeseries', 'timeseries__name'],
+    'csv_file_name': ['csv_file_name'],
+}
+
+
+def aggregate_runs(runs, group_by: str, rank_metric: str = 'MAE') -> list:
+    """
+    Для каждой группы запусков возвращает число запусков, среднее/минимум/максимум
+    каждой метрики и лучший запуск по rank_metric. Метрики считаются одним запросом с GROUP BY,
+    лучшие запуски — вторым, с нумерацией ROW_NUMBER() внутри группы: в отличие от сравнения
+    с внешним запросом, PARTITION BY объединяет в одну группу и запуски с NULL (например,
+    запуски по CSV-файлам при group_by=timeseries).
+
+    Параметры:
+      - runs: QuerySet ForecastRun (уже отфильтрованный по пользователю)
+      - group_by: ключ GROUP_FIELDS
+      - rank_metric: метрика из ForecastRun.METRIC_FIELDS для выбора лучшего запуска
+    """
+    fields = GROUP_FIELDS[group_by]
+    rank_field = ForecastRun.METRIC_FIELDS[rank_metric]
+    order = F(rank_field).desc(nulls_last=True) if rank_metric in HIGHER_IS_BETTER else F(rank_field).asc(nulls_last=True)
+    best_runs = (
+        runs.filter(**{f'{rank_field}__isnull': False})
+        .annotate(position=Window(RowNumber(), partition_by=[F(fields[0])], order_by=[order, F('id').asc()]))
+        .filter(position=1)
+        .values_list(fields[0], 'id', rank_field)
+    )
+    best = {group: (pk, value) for group, pk, value in best_runs}
+    annotations = {'runs': Count('id')}
+    for name, field in ForecastRun.METRIC_FIELDS.items():
+        annotations[f'{field}_mean'] = Avg(field)
+        annotations[f'{field}_min'] = Min(field)
+        annotations[f'{field}_max'] = Max(field)
+    rows = (
+        runs.order_by().values(*fields)
+        .annotate(**annotations)
+        .order_by(*fields)
+    )
+
+    summary = []
+    for row in rows:
+        best_run, best_value = best.get(row[fields[0]], (None, None))
+        group = {'group': row[fields[0]], 'runs': row['runs'], 'best_run': best_run,
+                 'best_value': best_value, 'metrics': {}}
+        if group_by == 'timeseries':
+            group['timeseries_name'] = row['timeseries__name']
+        for name, field in ForecastRun.METRIC_FIELDS.items():
+            if row[f'{field}_mean'] is not None:
+                group['metrics'][name] = {stat: row[f'{field}_{stat}'] for stat in ('mean', 'min', 'max')}
+        summary.append(group)
+    return summary
@@ -0,0 +1,100 @@
+"""
+Бэктест со скользящим началом прогноза (rolling origin).
+
+Ряд делится на folds фолдов: в каждом скрипт обучается на участке до точки начала прогноза
+и оценивается на следующих horizon точках, которых он не видел. Начала соседних фолдов
+отстоят на step точек, последний фолд заканчивается последней точкой ряда.
+  - expanding: обучающий участок — вся история до начала прогноза;
+  - sliding: обучающий участок — последние window точек до начала прогноза.
+Модуль не импортирует Django и используется процессами пула.
+"""
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+BacktestSpec = namedtuple('BacktestSpec', ['mode', 'horizon', 'step', 'folds', 'window'])
+
+MODES = ('expanding', 'sliding')
+# Минимальная длина обучающего участка фолда
+MIN_TRAIN_POINTS = 2
+
+
+def _positive_int(params, name: str, default: Optional[int] = None) -> Optional[int]:
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 0
+    if value < 1:
+        raise ValueError(f'{name} должен быть положительным целым числом.')
+    return value
+
+
+def parse_backtest(params) -> Optional[BacktestSpec]:
+    """
+    Разбирает параметры backtest, horizon, step, folds и window.
+    Возвращает None, если бэктест не запрошен; при ошибке вызывает ValueError.
+    """
+    mode = params.get('backtest') or None
+    if mode is None:
+        return None
+    if mode not in MODES:
+        raise ValueError(f'backtest должен быть одним из: {", ".join(MODES)}.')
+    horizon = _positive_int(params, 'horizon')
+    if horizon is None:
+        raise ValueError('Для бэктеста нужен horizon — число точек прогноза в фолде.')
+    step = _positive_int(params, 'step', horizon)
+    folds = _positive_int(params, 'folds', 3)
+    window = _positive_int(params, 'window')
+    if mode == 'sliding' and window is None:
+        raise ValueError('Для режима sliding нужен window — длина обучающего окна.')
+    return BacktestSpec(mode, horizon, step, folds, window if mode == 'sliding' else None)
+
+
+def fold_bounds(n: int, spec: BacktestSpec) -> List[Tuple[int, int, int]]:
+    """
+    Границы фолдов в индексах точек: (начало обучения, начало прогноза, конец прогноза),
+    полуинтервалы [начало, конец). Вызывает ValueError, если ряд слишком короткий.
+    """
+    bounds = []
+    for fold in range(spec.folds):
+        origin = n - spec.horizon - (spec.folds - 1 - fold) * spec.step
+        start = max(origin - spec.window, 0) if spec.window else 0
+        if origin - start < MIN_TRAIN_POINTS:
+            raise ValueError(
+                f'Ряд из {n} точек слишком короткий для {spec.folds} фолдов '
+                f'с horizon={spec.horizon} и step={spec.step}.'
+            )
+        bounds.append((start, origin, origin + spec.horizon))
+    return bounds
+
+
+def aggregate_folds(script_name: str, folds: List[dict]) -> dict:
+    """
+    Сводит результаты фолдов в результат пары (набор данных, скрипт).
+    Метрики — средние по успешным фолдам, duration — суммарное время, memory_peak_mb — максимум.
+    Прогноз — объединение прогнозов фолдов на их тестовых участках.
+    """
+    succeeded = [fold for fold in folds if 'error' not in fold]
+    summary = [{key: value for key, value in fold.items() if key != 'forecast'} for fold in folds]
+    if not succeeded:
+        return {'script': script_name, 'error': f"Все фолды завершились ошибкой: {folds[0]['error']}", 'folds': summary}
+    metrics = {}
+    for name in succeeded[0]['metrics']:
+        values = [fold['metrics'].get(name) for fold in succeeded]
+        values = [value for value in values if value is not None]
+        if name == 'duration':
+            metrics[name] = sum(values)
+        elif name == 'memory_peak_mb':
+            metrics[name] = max(values) if values else None
+        else:
+            metrics[name] = float(np.mean(values)) if values else None
+    return {
+        'script': script_name,
+        'forecast': [point for fold in succeeded for point in fold['forecast']],
+        'metrics': metrics,
+        'folds': summary,
+    }
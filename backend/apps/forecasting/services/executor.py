@@ -0,0 +1,538 @@
+"""
+Выполнение пользовательских скриптов прогнозирования без обращения к базе данных.
+Модуль не импортирует модели Django, поэтому его функции можно запускать в дочерних процессах.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import timeit
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from apps.forecasting.services.backtest import BacktestSpec, aggregate_folds, fold_bounds
+from apps.forecasting.services.forecast import DEFAULT_HORIZON, forecast_batch
+from apps.forecasting.services.metrics import score_forecast, to_int64_timestamps
+from apps.forecasting.services.sandbox import CANCEL_POLL_SECONDS, RunLimits, SandboxError, default_limits, default_pool
+from apps.forecasting.services.script_cache import registry, script_hash
+
+# Скрипт прогнозирования: имя файла и исходный код (bytes)
+ScriptSource = namedtuple('ScriptSource', ['name', 'source'])
+
+
+def check_template(module) -> None:
+    """
+    Проверяет соответствие скрипта шаблону на двух тестовых точках.
+    Вызывает ValueError с описанием нарушения.
+    """
+    test_data = pd.DataFrame({'ds': [datetime(2023, 1, 1), datetime(2023, 1, 2)], 'y': [100.0, 110.0]})
+    test_output = module.forecast(test_data.copy())
+    if not isinstance(test_output, dict) or 'forecast' not in test_output:
+        raise ValueError("Функция должна возвращать словарь с ключом 'forecast'.")
+    forecast_output = test_output['forecast']
+    if not isinstance(forecast_output, list) or not forecast_output:
+        raise ValueError("Ключ 'forecast' должен содержать непустой список.")
+    for item in forecast_output:
+        if not isinstance(item, dict) or 'ds' not in item or 'yhat' not in item:
+            raise ValueError("Каждый элемент должен быть словарем с 'ds' и 'yhat'.")
+        if not isinstance(item['ds'], str):
+            raise ValueError("Поле 'ds' должно быть строкой.")
+        if not isinstance(item['yhat'], (int, float)):
+            raise ValueError("Поле 'yhat' должно быть числом.")
+    try:
+        pd.to_datetime(pd.Series([item['ds'] for item in forecast_output]), format='mixed')
+    except ValueError:
+        raise ValueError("Поле 'ds' должно быть валидной датой.")
+
+
+def _load(script: ScriptSource):
+    """
+    Загружает модуль скрипта. Возвращает (модуль, None) или (None, сообщение об ошибке).
+    """
+    try:
+        module = registry.load_module(script.source, script.name)
+    except MemoryError:
+        raise  # превышен лимит памяти песочницы — это не ошибка скрипта
+    except Exception as e:
+        return None, f'Ошибка загрузки скрипта: {str(e)}'
+    if not hasattr(module, 'forecast'):
+        return None, 'Функция forecast отсутствует.'
+    return module, None
+
+
+def inspect_script(script: ScriptSource) -> Tuple[Optional[str], bool]:
+    """
+    Полная проверка скрипта (check_script) и объявленный им признак DETERMINISTIC
+    (недетерминированные скрипты не используют кэш результатов). Пользовательский код
+    выполняется, поэтому функция вызывается только в процессе песочницы.
+    """
+    module, error = _load(script)
+    if error:
+        return error, False
+    deterministic = bool(getattr(module, 'DETERMINISTIC', True))
+    try:
+        check_template(module)
+    except MemoryError:
+        raise
+    except Exception as e:
+        return f'Скрипт не соответствует шаблону: {str(e)}', deterministic
+    return None, deterministic
+
+
+def check_script(script: ScriptSource) -> Optional[str]:
+    """
+    Полная проверка скрипта: загрузка, наличие forecast и соответствие шаблону.
+    Возвращает None, если скрипт прошёл проверку, иначе сообщение об ошибке.
+    MemoryError пробрасывается: нехватка памяти не означает, что скрипт не соответствует шаблону.
+    """
+    return inspect_script(script)[0]
+
+
+def forecast_arrays(out) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Проверяет результат функции forecast и возвращает массивы (int64-наносекунды, float64).
+    """
+    if not isinstance(out, dict) or 'forecast' not in out:
+        raise ValueError("Функция должна возвращать словарь с ключом 'forecast'.")
+    forecast_output = out['forecast']
+    if not isinstance(forecast_output, list) or not all(isinstance(i, dict) and 'ds' in i and 'yhat' in i for i in forecast_output):
+        raise ValueError("Неверный формат прогноза.")
+    forecast_ds = to_int64_timestamps([item['ds'] for item in forecast_output])
+    forecast_yhat = np.array([item['yhat'] for item in forecast_output], dtype='float64')
+    return forecast_ds, forecast_yhat
+
+
+def supports_batch(script: ScriptSource) -> bool:
+    """
+    Скрипт объявляет forecast_batch(data) — прогноз сразу для словаря наборов данных.
+    """
+    module, error = _load(script)
+    return error is None and callable(getattr(module, 'forecast_batch', None))
+
+
+def execute_script(script: ScriptSource, data: pd.DataFrame, validated: bool = False,
+                   holdout: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> dict:
+    """
+    Выполняет прогноз скрипта на данных.
+
+    Параметры:
+      - script: имя и исходный код скрипта
+      - data: DataFrame с колонками 'ds' и 'y'; скрипт получает поверхностную копию,
+        массивы которой доступны только для чтения
+      - validated: скрипт уже прошёл check_script, проверку на тестовых данных можно пропустить
+      - holdout: отложенные факты (ds, y), которых скрипт не видел; если заданы, прогноз
+        оценивается по ним (MASE — относительно data), а в результат попадают только точки их диапазона
+    Возвращает:
+      - {'script', 'forecast', 'metrics'} при успехе или {'script', 'error'} при ошибке
+    """
+    tracemalloc.start()
+    start_time = timeit.default_timer()
+    try:
+        module, error = _load(script)
+        if error:
+            return {'script': script.name, 'error': error}
+
+        if not validated:
+            try:
+                check_template(module)
+            except MemoryError:
+                raise
+            except Exception as e:
+                return {'script': script.name, 'error': f'Скрипт не соответствует шаблону: {str(e)}'}
+
+        try:
+            forecast_ds, forecast_yhat = forecast_arrays(module.forecast(data.copy(deep=False)))
+        except MemoryError:
+            raise  # превышен лимит памяти песочницы
+        except Exception as e:
+            return {'script': script.name, 'error': f'Ошибка прогноза: {str(e)}'}
+
+        current, peak = tracemalloc.get_traced_memory()
+        return score_result(script.name, dataset_arrays(data), forecast_ds, forecast_yhat, holdout,
+                            timeit.default_timer() - start_time, peak / 1024 / 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def execute_script_batch(script: ScriptSource, datasets: Dict[str, pd.DataFrame],
+                         validated: bool = False) -> Dict[str, dict]:
+    """
+    Выполняет forecast_batch скрипта одним вызовом для всех наборов данных.
+    forecast_batch получает словарь ключ -> DataFrame с колонками 'ds' и 'y' и возвращает
+    словарь ключ -> {'forecast': [...]} (формат forecast). Возвращает результаты в формате
+    execute_script по ключам; duration в метриках — доля общего времени вызова.
+    """
+    tracemalloc.start()
+    start_time = timeit.default_timer()
+    try:
+        module, error = _load(script)
+        if not error and not validated:
+            try:
+                check_template(module)
+            except MemoryError:
+                raise
+            except Exception as e:
+                error = f'Скрипт не соответствует шаблону: {str(e)}'
+        if not error:
+            try:
+                outputs = module.forecast_batch({key: frame.copy(deep=False) for key, frame in datasets.items()})
+                if not isinstance(outputs, dict):
+                    raise ValueError('forecast_batch должна возвращать словарь ключ набора -> прогноз.')
+            except MemoryError:
+                raise
+            except Exception as e:
+                error = f'Ошибка прогноза: {str(e)}'
+        if error:
+            return {key: {'script': script.name, 'error': error} for key in datasets}
+        duration = (timeit.default_timer() - start_time) / max(len(datasets), 1)
+        memory_peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+    results = {}
+    for key, frame in datasets.items():
+        try:
+            forecast_ds, forecast_yhat = forecast_arrays(outputs.get(key))
+        except Exception as e:
+            results[key] = {'script': script.name, 'error': f'Ошибка прогноза: {str(e)}'}
+            continue
+        results[key] = score_result(script.name, dataset_arrays(frame), forecast_ds, forecast_yhat, None,
+                                    duration, memory_peak_mb)
+    return results
+
+
+def score_result(name: str, actual: Tuple[np.ndarray, np.ndarray], forecast_ds: np.ndarray, forecast_yhat: np.ndarray,
+                 holdout: Optional[Tuple[np.ndarray, np.ndarray]], duration: float, memory_peak_mb: float) -> dict:
+    """
+    Результат в формате execute_script по прогнозу (forecast_ds, forecast_yhat) и фактам actual (ds, y).
+    Если заданы отложенные факты holdout, прогноз оценивается по ним (см. execute_script).
+    """
+    if holdout is None:
+        matched, metrics = score_forecast(*actual, forecast_ds, forecast_yhat)
+    else:
+        matched, metrics = score_forecast(*holdout, forecast_ds, forecast_yhat, history=actual[1])
+        inside = (forecast_ds >= holdout[0][0]) & (forecast_ds <= holdout[0][-1])
+        forecast_ds, forecast_yhat = forecast_ds[inside], forecast_yhat[inside]
+    if not matched:
+        return {'script': name, 'error': 'Прогноз не пересекается по датам с фактическими данными.'}
+
+    metrics['duration'] = duration
+    metrics['memory_peak_mb'] = memory_peak_mb
+
+    stamps = pd.DatetimeIndex(forecast_ds.view('datetime64[ns]')).strftime('%Y-%m-%d %H:%M:%S')
+    normalized_forecast = [{'ds': d, 'yhat': v} for d, v in zip(stamps, forecast_yhat.tolist())]
+    return {
+        'script': name,
+        'forecast': normalized_forecast,
+        'metrics': metrics
+    }
+
+
+def prepare_data(ds: np.ndarray, y: np.ndarray) -> pd.DataFrame:
+    """
+    Собирает DataFrame для execute_script из массивов (ds — int64-наносекунды, y — float64).
+    Массивы используются без копирования и помечаются только для чтения, поэтому срезы
+    (например, обучающие участки фолдов бэктеста) остаются представлениями тех же данных.
+    """
+    ds, y = ds.view(), y.view()
+    ds.flags.writeable = False
+    y.flags.writeable = False
+    return pd.DataFrame({'ds': ds.view('datetime64[ns]'), 'y': y}, copy=False)
+
+
+def execute_fold(script: ScriptSource, ds: np.ndarray, y: np.ndarray, fold: int,
+                 bounds: Tuple[int, int, int], validated: bool = False) -> dict:
+    """
+    Выполняет один фолд бэктеста: скрипт получает только обучающий участок [start, origin)
+    и оценивается на [origin, end).
+    """
+    start, origin, end = bounds
+    result = execute_script(script, prepare_data(ds[start:origin], y[start:origin]), validated,
+                            holdout=(ds[origin:end], y[origin:end]))
+    return fold_result(ds, fold, bounds, result)
+
+
+def fold_result(ds: np.ndarray, fold: int, bounds: Tuple[int, int, int], result: dict) -> dict:
+    """
+    Результат фолда для services.backtest.aggregate_folds: номер, границы и результат без имени скрипта.
+    """
+    start, origin, end = bounds
+    stamps = pd.DatetimeIndex(ds[[start, origin, end - 1]].view('datetime64[ns]')).strftime('%Y-%m-%d %H:%M:%S')
+    info = {'fold': fold, 'train_start': stamps[0], 'test_start': stamps[1], 'test_end': stamps[2]}
+    info.update((key, value) for key, value in result.items() if key != 'script')
+    return info
+
+
+# Каталог для файлов наборов, общих с процессами песочницы: /dev/shm (в памяти), иначе временный каталог
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+@contextmanager
+def shared_datasets(arrays: Dict[str, tuple]) -> Iterator[Dict[str, Tuple[str, str]]]:
+    """
+    Записывает массивы наборов (ds, y) в файлы .npy один раз на запрос и отдаёт пути к ним по ключу.
+    Задачи песочницы получают только пути (run_task), поэтому данные не сериализуются в канал
+    ни для каждой пары, ни для каждого фолда. Файлы удаляются при выходе.
+    """
+    directory = tempfile.mkdtemp(prefix='forecast-data-', dir=SHARED_DIR)
+    try:
+        paths = {}
+        for index, (key, (ds, y)) in enumerate(arrays.items()):
+            paths[key] = (os.path.join(directory, f'{index}-ds.npy'), os.path.join(directory, f'{index}-y.npy'))
+            np.save(paths[key][0], ds)
+            np.save(paths[key][1], y)
+        yield paths
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run_task(script: ScriptSource, ds, y, validated: bool,
+             fold: Optional[int] = None, bounds: Optional[Tuple[int, int, int]] = None) -> dict:
+    """
+    Задача для процесса песочницы: прогноз по массивам ряда или один фолд бэктеста.
+    ds и y — массивы или пути к файлам из shared_datasets; файлы отображаются в память
+    только для чтения, без копирования.
+    """
+    if isinstance(ds, str):
+        ds, y = np.load(ds, mmap_mode='r'), np.load(y, mmap_mode='r')
+    if fold is not None:
+        return execute_fold(script, ds, y, fold, bounds, validated)
+    return execute_script(script, prepare_data(ds, y), validated)
+
+
+def sandbox_failure(script_name: str, error: SandboxError) -> dict:
+    """
+    Результат с ошибкой для задачи, не выполненной в песочнице. Если задача остановлена
+    ограничениями, в результате есть status (timeout, oom) и время до остановки в metrics.
+    """
+    result = {'script': script_name, 'error': str(error)}
+    if error.elapsed is not None:
+        result['metrics'] = {'duration': error.elapsed}
+    if error.status:
+        result['status'] = error.status
+    return result
+
+
+def sandboxed(func, script: ScriptSource, *args, limits: Optional[RunLimits] = None,
+              on_start: Optional[Callable[[int], None]] = None,
+              should_cancel: Optional[Callable[[], bool]] = None) -> dict:
+    """
+    Выполняет func(script, *args) в процессе песочницы (services/sandbox.py) с ограничениями
+    limits (по умолчанию — из settings, sandbox.default_limits); on_start получает pid процесса,
+    should_cancel периодически проверяет, не отменена ли задача.
+    Если процесс упал, задача не выполнилась или была остановлена, возвращает результат с ошибкой.
+    """
+    try:
+        return default_pool().run(func, script, *args, limits=limits or default_limits(), on_start=on_start,
+                                  should_cancel=should_cancel)
+    except SandboxError as e:
+        return sandbox_failure(script.name, e)
+
+
+def default_parallelism() -> int:
+    return os.cpu_count() or 1
+
+
+def _expand_folds(tasks: List[tuple], datasets: Dict[str, pd.DataFrame], scripts: List[ScriptSource],
+                  spec: BacktestSpec) -> Iterator[Tuple[str, int, dict]]:
+    """
+    Заменяет задачи (ключ, номер скрипта) задачами фолдов (ключ, номер, фолд, границы) в списке tasks.
+    Для наборов, слишком коротких для бэктеста, отдаёт результаты с ошибкой.
+    """
+    bounds, pairs = {}, tasks[:]
+    tasks.clear()
+    for key, index in pairs:
+        if key not in bounds:
+            try:
+                bounds[key] = fold_bounds(len(datasets[key]), spec)
+            except ValueError as e:
+                bounds[key] = str(e)
+        if isinstance(bounds[key], str):
+            yield key, index, {'script': scripts[index].name, 'error': bounds[key]}
+            continue
+        tasks.extend((key, index, fold, fold_range) for fold, fold_range in enumerate(bounds[key]))
+
+
+def iter_grid(scripts: List[ScriptSource], datasets: Dict[str, pd.DataFrame],
+              max_parallelism: Optional[int] = None,
+              verdicts: Optional[Dict[str, Optional[str]]] = None,
+              known: Optional[Dict[tuple, dict]] = None,
+              backtest: Optional[BacktestSpec] = None,
+              runs=None) -> Iterator[Tuple[str, int, dict]]:
+    """
+    Выполняет все пары (набор данных, скрипт) в процессах песочницы (services/sandbox.py)
+    и отдаёт тройки (ключ набора, номер скрипта, результат) по мере завершения.
+
+    Массивы наборов записываются в общие файлы один раз на запрос (shared_datasets), задача передаёт
+    процессу скрипт и пути к ним; одновременно выполняется не больше max_parallelism задач запроса.
+    Сначала отдаются пары, не требующие выполнения (ошибка проверки или готовый результат).
+    Если генератор закрыт досрочно, невыполненные задачи отменяются.
+
+    Параметры:
+      - datasets: упорядоченный словарь ключ -> DataFrame с колонками 'ds' и 'y'
+      - max_parallelism: верхняя граница числа одновременных задач (по умолчанию — число ядер)
+      - verdicts: известные результаты check_script по хэшу исходника (None — проверка пройдена);
+        скрипты с ошибкой не запускаются, для прошедших проверка на тестовых данных пропускается
+      - known: готовые результаты по паре (ключ набора, номер скрипта), например из кэша;
+        эти пары не выполняются
+      - backtest: параметры бэктеста (services.backtest); каждый фолд пары выполняется отдельной
+        задачей, результат пары отдаётся, когда завершены все её фолды
+      - runs: записи выполняемых пар (например, runner.GridRuns): runs.start(пары) вызывается перед
+        запуском задач, runs.cancelled() — не чаще раза в CANCEL_POLL_SECONDS, пока задачи выполняются,
+        из потока, читающего генератор. Задачи отменённых пар останавливаются (SandboxCancelled),
+        ещё не начатые — не запускаются
+    """
+    verdicts = verdicts or {}
+    known = known or {}
+    hashes = [script_hash(script.source) for script in scripts]
+    failed = {index: verdicts[h] for index, h in enumerate(hashes) if verdicts.get(h)}
+    validated = [h in verdicts for h in hashes]
+    tasks = []
+    for key in datasets:
+        for index, script in enumerate(scripts):
+            if index in failed:
+                yield key, index, {'script': script.name, 'error': failed[index]}
+            elif (key, index) in known:
+                yield key, index, known[(key, index)]
+            else:
+                tasks.append((key, index))
+    folds = {}
+    if backtest is not None:
+        yield from _expand_folds(tasks, datasets, scripts, backtest)
+
+    def collect(task: tuple, result: dict) -> Optional[dict]:
+        # Результат фолда откладывается, пока не завершатся все фолды пары
+        if len(task) == 2:
+            return result
+        done = folds.setdefault(task[:2], [])
+        done.append(result)
+        if len(done) < backtest.folds:
+            return None
+        return aggregate_folds(scripts[task[1]].name, sorted(folds.pop(task[:2]), key=lambda fold: fold['fold']))
+
+    workers = min(max_parallelism or default_parallelism(), default_parallelism(), len(tasks))
+    if not tasks:
+        return
+    # Флаг отмены каждой пары; задачи проверяют его в потоках диспетчера без обращения к базе
+    cancel = {pair: threading.Event() for pair in dict.fromkeys(task[:2] for task in tasks)}
+    if runs is not None:
+        runs.start(list(cancel))
+    # Массивы — представления данных наборов, без копирования
+    arrays = {key: dataset_arrays(datasets[key]) for key in dict.fromkeys(task[0] for task in tasks)}
+    # Потоки только ждут ответа процессов песочницы; их число ограничивает параллелизм запроса
+    dispatcher = ThreadPoolExecutor(max_workers=workers)
+    with shared_datasets(arrays) as paths:
+        try:
+            futures = {
+                dispatcher.submit(sandboxed, run_task, scripts[task[1]], *paths[task[0]], validated[task[1]], *task[2:],
+                                  should_cancel=cancel[task[:2]].is_set if runs is not None else None): task
+                for task in tasks
+            }
+            polled = timeit.default_timer()
+            while futures:
+                done, _ = wait(futures, timeout=CANCEL_POLL_SECONDS if runs is not None else None,
+                               return_when=FIRST_COMPLETED)
+                if runs is not None and timeit.default_timer() - polled >= CANCEL_POLL_SECONDS:
+                    polled = timeit.default_timer()
+                    for pair in runs.cancelled():
+                        cancel[pair].set()
+                for future in done:
+                    task = futures.pop(future)
+                    result = future.result()
+                    if len(task) > 2 and 'fold' not in result:
+                        # Процесс упал: ошибка оформляется как результат фолда
+                        result = fold_result(arrays[task[0]][0], task[2], task[3], result)
+                    result = collect(task, result)
+                    if result is not None:
+                        yield task[0], task[1], result
+        finally:
+            dispatcher.shutdown(wait=True, cancel_futures=True)
+
+
+def run_grid(scripts: List[ScriptSource], datasets: Dict[str, pd.DataFrame],
+             max_parallelism: Optional[int] = None,
+             verdicts: Optional[Dict[str, Optional[str]]] = None,
+             known: Optional[Dict[tuple, dict]] = None,
+             backtest: Optional[BacktestSpec] = None,
+             runs=None) -> Dict[str, List[dict]]:
+    """
+    То же, что iter_grid, но результаты собираются в словарь ключ набора -> список результатов
+    в исходном порядке наборов и скриптов независимо от порядка завершения.
+    С runs каждый результат по мере завершения передаётся в runs.finish(ключ, номер, результат),
+    в словарь попадает возвращённый им результат.
+    """
+    completed = {}
+    for key, index, result in iter_grid(scripts, datasets, max_parallelism, verdicts, known, backtest, runs):
+        completed[(key, index)] = runs.finish(key, index, result) if runs is not None else result
+    return {key: [completed[(key, index)] for index in range(len(scripts))] for key in datasets}
+
+
+def run_models(names: List[str], datasets: Dict[str, pd.DataFrame], horizon: int = DEFAULT_HORIZON,
+               backtest: Optional[BacktestSpec] = None,
+               series_keys: Optional[Dict[str, tuple]] = None) -> Iterator[Tuple[str, int, dict]]:
+    """
+    Выполняет встроенные модели (services.forecast.MODELS) на всех наборах данных и отдаёт
+    тройки (ключ набора, номер модели, результат) в формате iter_grid.
+    series_keys — (идентификатор ряда, версия) по ключу набора для кэша моделей Prophet;
+    фолды бэктеста и наборы без ключа кэшируются по содержимому. Показатели кэша
+    (model_cache_hit, warm_start, fit_time, fit_time_saved) добавляются в метрики результата.
+
+    Каждая модель считается одним пакетным вызовом forecast_batch по всем наборам
+    (при бэктесте — по всем обучающим участкам всех фолдов), поэтому duration в метриках —
+    доля общего времени пакета, а memory_peak_mb — пик памяти всего пакета.
+    Прогноз на horizon точек вперёд; при бэктесте horizon берётся из его параметров.
+    """
+    jobs, failed = [], {}
+    for key, frame in datasets.items():
+        ds, y = dataset_arrays(frame)
+        if backtest is None:
+            jobs.append((key, None, None, ds, y))
+            continue
+        try:
+            bounds = fold_bounds(len(ds), backtest)
+        except ValueError as e:
+            failed[key] = str(e)
+            continue
+        jobs.extend((key, fold, fold_range, ds, y) for fold, fold_range in enumerate(bounds))
+    horizon = backtest.horizon if backtest is not None else horizon
+
+    for index, name in enumerate(names):
+        for key, error in failed.items():
+            yield key, index, {'script': name, 'error': error}
+        train = [(ds[b[0]:b[1]], y[b[0]:b[1]]) if b else (ds, y) for _, _, b, ds, y in jobs]
+        keys = [None if b else (series_keys or {}).get(key) for key, _, b, _, _ in jobs]
+        tracemalloc.start()
+        start_time = timeit.default_timer()
+        try:
+            outputs = forecast_batch(name, train, horizon, keys=keys)
+            duration = (timeit.default_timer() - start_time) / max(len(jobs), 1)
+            memory_peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+
+        folds: Dict[str, List[dict]] = {}
+        for (key, fold, bounds, ds, y), actual, output in zip(jobs, train, outputs):
+            if isinstance(output, str):
+                result = {'script': name, 'error': f'Ошибка прогноза: {output}'}
+            else:
+                holdout = (ds[bounds[1]:bounds[2]], y[bounds[1]:bounds[2]]) if bounds else None
+                result = score_result(name, actual, *output[:2], holdout, duration, memory_peak_mb)
+                if len(output) > 2 and 'metrics' in result:
+                    # Показатели кэша модели — только для оценённого прогноза, не для результата с ошибкой
+                    result['metrics'].update(output[2])
+            if bounds is None:
+                yield key, index, result
+                continue
+            folds.setdefault(key, []).append(fold_result(ds, fold, bounds, result))
+            if len(folds[key]) == backtest.folds:
+                yield key, index, aggregate_folds(name, folds.pop(key))
+
+
+def dataset_arrays(frame: pd.DataFrame) -> tuple:
+    return frame['ds'].to_numpy(dtype='datetime64[ns]').view('i8'), frame['y'].to_numpy(dtype='float64')
@@ -1,22 +1,127 @@
-import pandas as pd
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from typing import Dict, Any
+"""
+Встроенные модели прогнозирования.
+
+Базовые модели (BASELINES) работают на матрице рядов одинаковой длины (ряд — строка)
+и считаются векторно по всем рядам сразу: тысячи рядов обучаются одним вызовом.
+Каждая модель возвращает одношаговые прогнозы по истории (fitted, NaN там, где прогноз
+не определён) и horizon точек вперёд (future).
+
+Модели SERIES_MODELS (Prophet) обучаются по каждому ряду отдельно и кэшируют обученные модели.
+
+Prophet, statsmodels импортируются при первом использовании: импорт занимает около секунды
+и не нужен процессам, которые эти модели не запускают.
+"""
+import hashlib
+import itertools
+import timeit
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 import numpy as np
+import pandas as pd
+
+from apps.forecasting.services.metrics import score_forecast, to_int64_timestamps
+from apps.forecasting.services.model_cache import ModelCache, default_cache
+
+# Сетка параметров сглаживания, по которой подбираются alpha, beta и gamma моделей ETS
+SMOOTHING_GRID = np.linspace(0.1, 0.9, 9)
+# Предельный объём состояний ETS при подборе параметров: ряды и сетка обрабатываются порциями,
+# чтобы (ряды × наборы параметров × длина сезона) не превышали его
+ETS_CHUNK_BYTES = 64 * 1024 * 1024
+ARIMA_ORDER = (1, 1, 1)
+# Число точек прогноза вперёд по умолчанию
+DEFAULT_HORIZON = 30
+# Длина сезона по шагу ряда, если она не задана явно
+HOUR_NS = 60 * 60 * 10 ** 9
+SEASON_BY_STEP = {HOUR_NS: 24, 24 * HOUR_NS: 7, 7 * 24 * HOUR_NS: 52}
+# Сколько последних меток времени ряда используется для pd.infer_freq
+FREQ_SAMPLE_SIZE = 1000
+
+
+def warm_start_params(model) -> Dict[str, Any]:
+    """
+    Параметры обученной модели Prophet в формате аргумента init метода fit.
+    """
+    params = {name: float(np.mean(model.params[name])) for name in ('k', 'm', 'sigma_obs')}
+    params.update((name, np.mean(model.params[name], axis=0)) for name in ('delta', 'beta'))
+    return params
 
-def forecast_timeseries(data: pd.DataFrame, periods: int = 30) -> Dict[str, Any]:
+
+def fit_prophet(data: pd.DataFrame, series_key: Optional[str] = None, version: Any = None,
+                cache: Optional[ModelCache] = None, **params) -> Tuple[Any, Dict[str, float]]:
+    """
+    Обученная модель Prophet для data (колонки 'ds' и 'y') с учётом кэша моделей.
+
+    Модель кэшируется (services/model_cache.py) по ряду, его версии и гиперпараметрам;
+    при попадании модель не обучается заново. Если ряд изменился (новая версия), модель обучается
+    с параметрами последней модели этого ряда в качестве начального приближения.
+    Без series_key и version ключом служит хэш содержимого data, а warm start не используется.
+    Возвращает модель и показатели кэша: model_cache_hit и warm_start (1 или 0),
+    fit_time и fit_time_saved (секунды).
+    """
+    from prophet import Prophet
+    from prophet.serialize import model_from_json, model_to_json
+
+    cache = cache or default_cache()
+    if series_key is None or version is None:
+        actual_ds = to_int64_timestamps(data['ds'])
+        actual_y = data['y'].to_numpy(dtype='float64')
+        version = hashlib.sha256(actual_ds.tobytes() + actual_y.tobytes()).hexdigest()
+    key = cache.key(series_key or '', version, params)
+
+    entry = cache.get(key)
+    warm_start = False
+    if entry is not None:
+        model = model_from_json(entry['model'])
+        fit_time, fit_time_saved = 0.0, entry['fit_time']
+    else:
+        previous = cache.latest(series_key, params) if series_key is not None else None
+        start_time = timeit.default_timer()
+        model = None
+        if previous is not None:
+            # Начальное приближение может не подойти (например, изменилось число сезонных
+            # признаков после добавления точек) — тогда модель обучается с нуля
+            try:
+                model = Prophet(**params).fit(data, init=warm_start_params(model_from_json(previous['model'])))
+                warm_start = True
+            except (ValueError, RuntimeError):
+                model = None
+        if model is None:
+            # Инициализация и обучение модели Prophet
+            model = Prophet(**params).fit(data)
+        fit_time = timeit.default_timer() - start_time
+        # Эталон — время обучения с нуля; экономия warm start считается относительно него
+        cold_fit_time = previous['cold_fit_time'] if warm_start else fit_time
+        fit_time_saved = max(cold_fit_time - fit_time, 0.0)
+        cache.put(key, {'model': model_to_json(model), 'fit_time': fit_time, 'cold_fit_time': cold_fit_time},
+                  series=series_key, params=params)
+        if warm_start:
+            cache.record_saving(fit_time_saved)
+    return model, {
+        'model_cache_hit': float(entry is not None),
+        'warm_start': float(warm_start),
+        'fit_time': fit_time,
+        'fit_time_saved': fit_time_saved,
+    }
+
+
+def forecast_timeseries(data: pd.DataFrame, periods: int = 30, series_key: Optional[str] = None,
+                        version: Any = None, cache: Optional[ModelCache] = None, **params) -> Dict[str, Any]:
     """
-    Выполняет прогнозирование временного ряда с использованием модели Prophet.
-    
+    Выполняет прогнозирование временного ряда с использованием модели Prophet
+    (обученной или взятой из кэша, см. fit_prophet).
+
     Параметры:
       - data: pandas DataFrame с колонками 'ds' (дата) и 'y' (значение)
       - periods: количество дней для прогнозирования
+      - series_key, version: идентификатор ряда и его версия (например, Timeseries.version)
+      - cache: кэш моделей (по умолчанию model_cache.default_cache())
+      - params: гиперпараметры Prophet
     Возвращает:
-      - Словарь с прогнозом и рассчитанными метриками
+      - Словарь с прогнозом и рассчитанными метриками; кроме метрик точности в них есть
+        model_cache_hit и warm_start (1 или 0), fit_time и fit_time_saved (секунды)
     """
-    # Инициализация и обучение модели Prophet
-    model = Prophet()
-    model.fit(data)
+    model, info = fit_prophet(data, series_key, version, cache, **params)
 
     # Создание DataFrame для предсказаний
     future = model.make_future_dataframe(periods=periods)
@@ -24,16 +129,300 @@ def forecast_timeseries(data: pd.DataFrame, periods: int = 30) -> Dict[str, Any]
 
     # Расчёт стандартных метрик на основе фактических данных и прогноза
     # Для вычисления метрик используется пересечение прогнозных значений и исходных данных
-    merged = data.merge(forecast[['ds', 'yhat']], on='ds', how='inner')
-    mae = mean_absolute_error(merged['y'], merged['yhat'])
-    rmse = np.sqrt(mean_squared_error(merged['y'], merged['yhat']))
-    r2 = r2_score(merged['y'], merged['yhat'])
+    _, metrics = score_forecast(
+        to_int64_timestamps(data['ds']), data['y'].to_numpy(dtype='float64'),
+        to_int64_timestamps(forecast['ds']), forecast['yhat'].to_numpy(dtype='float64'),
+    )
+    metrics.update(info)
 
     return {
         'forecast': forecast[['ds', 'yhat']].tail(periods).to_dict(orient='records'),
-        'metrics': {
-            'MAE': mae,
-            'RMSE': rmse,
-            'R2': r2,
-        }
+        'metrics': metrics
     }
+
+
+def prophet(ds: np.ndarray, y: np.ndarray, horizon: int, step: int,
+            key: Optional[Tuple[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, float]]:
+    """
+    Prophet для одного ряда (ds — int64-наносекунды): прогнозы по истории и horizon точек вперёд
+    с шагом ряда step. key — (идентификатор ряда, версия) для кэша моделей (см. fit_prophet).
+    Возвращает (ds, yhat, показатели кэша).
+    """
+    series_key, version = key or (None, None)
+    model, info = fit_prophet(pd.DataFrame({'ds': ds.view('datetime64[ns]'), 'y': y}), series_key, version)
+    forecast = model.predict(model.make_future_dataframe(periods=horizon, freq=series_freq(ds, step)))
+    return to_int64_timestamps(forecast['ds']), forecast['yhat'].to_numpy(dtype='float64'), info
+
+
+def series_freq(ds: np.ndarray, step: int):
+    """
+    Частота ряда для построения будущих дат. Если последние интервалы равны step, это Timedelta(step);
+    иначе частота определяется pd.infer_freq (календарные месяцы, кварталы, рабочие дни).
+    Медианный шаг step остаётся запасным вариантом для нерегулярных рядов без частоты.
+    """
+    tail = ds[-FREQ_SAMPLE_SIZE:]
+    if len(tail) >= 3 and (np.diff(tail) != step).any():
+        freq = pd.infer_freq(pd.DatetimeIndex(tail.view('datetime64[ns]')))
+        if freq is not None:
+            return freq
+    return pd.Timedelta(int(step), 'ns')
+
+
+def future_dates(ds: np.ndarray, horizon: int, step: int) -> np.ndarray:
+    """
+    horizon меток времени (int64-наносекунды) после конца ряда с частотой series_freq.
+    """
+    dates = pd.date_range(pd.Timestamp(int(ds[-1])), periods=horizon + 1, freq=series_freq(ds, step))
+    return dates[1:].to_numpy(dtype='datetime64[ns]').view('i8')
+
+
+def _steps(horizon: int) -> np.ndarray:
+    return np.arange(1, horizon + 1, dtype='float64')
+
+
+def naive(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Последнее значение.
+    """
+    fitted = np.full_like(Y, np.nan)
+    fitted[:, 1:] = Y[:, :-1]
+    return fitted, np.repeat(Y[:, -1:], horizon, axis=1)
+
+
+def seasonal_naive(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Значение того же момента предыдущего сезона.
+    """
+    n = Y.shape[1]
+    if season >= n:
+        raise ValueError(f'Для сезона длины {season} нужно больше {season} точек.')
+    fitted = np.full_like(Y, np.nan)
+    fitted[:, season:] = Y[:, :-season]
+    return fitted, Y[:, n - season + np.arange(horizon) % season]
+
+
+def drift(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Последнее значение плюс средний прирост за всю историю.
+    """
+    n = Y.shape[1]
+    slope = (Y[:, -1:] - Y[:, :1]) / max(n - 1, 1)
+    fitted = np.full_like(Y, np.nan)
+    fitted[:, 1:] = Y[:, :-1] + slope
+    return fitted, Y[:, -1:] + slope * _steps(horizon)
+
+
+def moving_average(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Среднее последних window точек; window — длина сезона (3 для несезонных рядов).
+    """
+    window = min(season if season > 1 else 3, Y.shape[1])
+    sums = np.concatenate([np.zeros((len(Y), 1)), np.cumsum(Y, axis=1)], axis=1)
+    means = (sums[:, window:] - sums[:, :-window]) / window
+    fitted = np.full_like(Y, np.nan)
+    fitted[:, window:] = means[:, :-1]
+    return fitted, np.repeat(means[:, -1:], horizon, axis=1)
+
+
+def _ets_pass(Y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+              trend: bool, season: int, fitted: np.ndarray = None):
+    """
+    Один проход аддитивной модели ETS по всем рядам и наборам параметров сразу.
+    alpha, beta, gamma — массивы формы (наборы,) (общие для всех рядов) или (ряды, 1)
+    (свои у каждого ряда); состояния имеют форму (ряды, наборы).
+    Возвращает сумму квадратов одношаговых ошибок и конечные уровень, тренд и сезонность.
+    """
+    k, n = Y.shape
+    shape = (k, alpha.shape[-1])
+    if season > 1:
+        level = np.broadcast_to(Y[:, :season].mean(axis=1, keepdims=True), shape).copy()
+        seasonal = np.broadcast_to((Y[:, :season] - level[:, :1])[:, None, :], shape + (season,)).copy()
+        slope = (Y[:, season:2 * season].mean(axis=1) - level[:, 0]) / season if trend else np.zeros(k)
+        start = season
+    else:
+        level = np.broadcast_to(Y[:, :1], shape).copy()
+        seasonal = np.zeros(shape + (1,))
+        slope = Y[:, 1] - Y[:, 0] if trend else np.zeros(k)
+        start = 1
+    slope = np.broadcast_to(slope[:, None], shape).copy()
+    sse = np.zeros(shape)
+    for t in range(start, n):
+        y = Y[:, t, None]
+        s = seasonal[:, :, t % season] if season > 1 else 0.0
+        prediction = level + slope + s
+        if fitted is not None:
+            fitted[:, t] = prediction[:, 0]
+        sse += (y - prediction) ** 2
+        new_level = alpha * (y - s) + (1 - alpha) * (level + slope)
+        if trend:
+            slope = beta * (new_level - level) + (1 - beta) * slope
+        if season > 1:
+            seasonal[:, :, t % season] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+    return sse, level, slope, seasonal
+
+
+def _ets_search(Y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+                trend: bool, season: int) -> np.ndarray:
+    """
+    Номер лучшего набора параметров (минимум суммы квадратов ошибок) для каждого ряда.
+    Ряды и сетка делятся на порции так, чтобы состояния одного прохода укладывались в ETS_CHUNK_BYTES.
+    """
+    # Байт на пару (ряд, набор): сезонные состояния и около шести массивов формы (ряды, наборы)
+    cell = 8 * (max(season, 1) + 6)
+    grid_chunk = int(max(1, min(len(alpha), ETS_CHUNK_BYTES // cell)))
+    row_chunk = int(max(1, ETS_CHUNK_BYTES // (cell * grid_chunk)))
+    best = np.zeros(len(Y), dtype='int64')
+    for row in range(0, len(Y), row_chunk):
+        part = Y[row:row + row_chunk]
+        best_sse = np.full(len(part), np.inf)
+        for lo in range(0, len(alpha), grid_chunk):
+            hi = lo + grid_chunk
+            sse, *_ = _ets_pass(part, alpha[lo:hi], beta[lo:hi], gamma[lo:hi], trend, season)
+            index = np.argmin(sse, axis=1)
+            value = sse[np.arange(len(part)), index]
+            better = value < best_sse
+            best_sse[better] = value[better]
+            best[row:row + row_chunk][better] = lo + index[better]
+    return best
+
+
+def _ets(Y: np.ndarray, horizon: int, trend: bool, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Аддитивная ETS: параметры подбираются по сетке SMOOTHING_GRID отдельно для каждого ряда
+    (минимум суммы квадратов одношаговых ошибок, см. _ets_search), затем модель с лучшими
+    параметрами проходится ещё раз для одношаговых прогнозов по истории.
+    """
+    n = Y.shape[1]
+    if n < (2 * season if season > 1 else 2):
+        raise ValueError(f'Недостаточно точек для модели: {n}.')
+    axes = [SMOOTHING_GRID, SMOOTHING_GRID if trend else [0.0], SMOOTHING_GRID if season > 1 else [0.0]]
+    alpha, beta, gamma = (np.array(values) for values in zip(*itertools.product(*axes)))
+    best = _ets_search(Y, alpha, beta, gamma, trend, season)
+    fitted = np.full_like(Y, np.nan)
+    _, level, slope, seasonal = _ets_pass(Y, alpha[best, None], beta[best, None], gamma[best, None],
+                                          trend, season, fitted)
+    level, slope, seasonal = level[:, 0], slope[:, 0], seasonal[:, 0]
+    future = level[:, None] + slope[:, None] * _steps(horizon)
+    if season > 1:
+        future += seasonal[:, (n + np.arange(horizon)) % season]
+    return fitted, future
+
+
+def ses(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Простое экспоненциальное сглаживание.
+    """
+    return _ets(Y, horizon, trend=False, season=1)
+
+
+def holt(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Модель Хольта: уровень и линейный тренд.
+    """
+    return _ets(Y, horizon, trend=True, season=1)
+
+
+def holt_winters(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Модель Хольта — Уинтерса: уровень, тренд и аддитивная сезонность.
+    """
+    if season < 2:
+        raise ValueError('Для модели Хольта — Уинтерса нужна длина сезона больше 1.')
+    return _ets(Y, horizon, trend=True, season=season)
+
+
+def arima(Y: np.ndarray, horizon: int, season: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ARIMA(ARIMA_ORDER) из statsmodels. Модель обучается по каждому ряду отдельно;
+    ряды, на которых обучение не удалось, получают NaN.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    fitted = np.full_like(Y, np.nan)
+    future = np.full((len(Y), horizon), np.nan)
+    for row, y in enumerate(Y):
+        try:
+            # Предупреждения о сходимости statsmodels выводит по каждому ряду
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                result = ARIMA(y, order=ARIMA_ORDER).fit()
+        except (ValueError, np.linalg.LinAlgError):
+            continue
+        # Первый одношаговый прогноз дифференцированной модели не информативен
+        fitted[row, 1:] = result.fittedvalues[1:]
+        future[row] = result.forecast(horizon)
+    return fitted, future
+
+
+BASELINES: Dict[str, Callable[[np.ndarray, int, int], Tuple[np.ndarray, np.ndarray]]] = {
+    'naive': naive,
+    'seasonal_naive': seasonal_naive,
+    'drift': drift,
+    'moving_average': moving_average,
+    'ses': ses,
+    'holt': holt,
+    'holt_winters': holt_winters,
+    'arima': arima,
+}
+
+
+# Модели, которые обучаются по каждому ряду отдельно: (ds, y, horizon, шаг, ключ ряда) -> (ds, yhat, метрики).
+# Ключ ряда (идентификатор, версия) позволяет переиспользовать обученную модель между запусками
+SERIES_MODELS: Dict[str, Callable[..., Tuple[np.ndarray, np.ndarray, Dict[str, float]]]] = {
+    'prophet': prophet,
+}
+# Все встроенные модели, доступные в бенчмарке и пакетном прогнозе
+MODELS = [*BASELINES, *SERIES_MODELS]
+
+
+def season_length(step: int) -> int:
+    """
+    Длина сезона по шагу ряда в наносекундах (1 — сезонность не определена).
+    """
+    return SEASON_BY_STEP.get(int(step), 1)
+
+
+def forecast_batch(name: str, series: List[Tuple[np.ndarray, np.ndarray]], horizon: int,
+                   season: int = None, keys: Optional[List[Optional[tuple]]] = None) -> List[Any]:
+    """
+    Прогноз встроенной модели name (MODELS) для набора рядов (ds — int64-наносекунды по возрастанию, y — float64).
+    Для базовых моделей ряды группируются по длине, каждая группа считается одним векторным вызовом;
+    модели SERIES_MODELS обучаются по каждому ряду, keys — ключи рядов для их кэша.
+    Возвращает для каждого ряда (ds, yhat): одношаговые прогнозы по истории и horizon точек вперёд
+    с частотой ряда (future_dates; для SERIES_MODELS — (ds, yhat, метрики модели)); если модель неприменима к ряду,
+    вместо результата возвращается строка с ошибкой.
+    Длина сезона по умолчанию определяется по шагу каждого ряда.
+    """
+    steps = [int(np.median(np.diff(ds))) if len(ds) > 1 else 0 for ds, _ in series]
+    if name in SERIES_MODELS:
+        output = []
+        for position, ((ds, y), step) in enumerate(zip(series, steps)):
+            try:
+                if len(ds) < 2:
+                    raise ValueError('Для прогноза нужно не меньше двух точек.')
+                output.append(SERIES_MODELS[name](ds, y, horizon, step, keys[position] if keys else None))
+            except (ValueError, RuntimeError) as e:
+                output.append(str(e))
+        return output
+    model = BASELINES[name]
+    groups: Dict[tuple, List[int]] = {}
+    for position, ((ds, _), step) in enumerate(zip(series, steps)):
+        groups.setdefault((len(ds), season or season_length(step)), []).append(position)
+    output: List[Any] = [None] * len(series)
+    for (length, group_season), positions in groups.items():
+        try:
+            if length < 2:
+                raise ValueError('Для прогноза нужно не меньше двух точек.')
+            fitted, future = model(np.stack([series[p][1] for p in positions]), horizon, group_season)
+        except ValueError as e:
+            for position in positions:
+                output[position] = str(e)
+            continue
+        for row, position in enumerate(positions):
+            ds = series[position][0]
+            future_ds = future_dates(ds, horizon, steps[position])
+            all_ds, all_yhat = np.concatenate([ds, future_ds]), np.concatenate([fitted[row], future[row]])
+            keep = ~np.isnan(all_yhat)
+            output[position] = (all_ds[keep], all_yhat[keep]) if keep.any() else 'Модель не смогла построить прогноз.'
+    return output
@@ -0,0 +1,81 @@
+"""
+Компактное бинарное хранение прогноза ForecastRun.
+
+Формат (little-endian):
+  - заголовок: число точек, первая метка времени (нс), шаг квантования меток (нс),
+    размер целого для разностей меток (1, 2, 4 или 8 байт), размер значения (4 или 8 байт);
+  - разности соседних меток в единицах шага (беззнаковые целые минимальной ширины);
+  - значения прогноза (float32, если он передаёт их без потерь, иначе float64).
+Для ряда с регулярной частотой каждая метка занимает один байт.
+"""
+import math
+import struct
+from functools import reduce
+from typing import Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+HEADER = struct.Struct('<qqqBB')
+DELTA_DTYPES = {1: '<u1', 2: '<u2', 4: '<u4', 8: '<u8'}
+VALUE_DTYPES = {4: '<f4', 8: '<f8'}
+STREAM_CHUNK_SIZE = 10_000
+
+
+def encode_forecast(ds: np.ndarray, yhat: np.ndarray) -> bytes:
+    """
+    Кодирует прогноз (ds — int64-наносекунды, yhat — float) в байты.
+    Точки сортируются по времени.
+    """
+    ds = np.asarray(ds, dtype='<i8')
+    yhat = np.asarray(yhat, dtype='<f8')
+    if len(ds) and np.any(ds[1:] < ds[:-1]):
+        order = np.argsort(ds, kind='stable')
+        ds, yhat = ds[order], yhat[order]
+    deltas = np.diff(ds).astype('<u8')
+    unit = reduce(math.gcd, np.unique(deltas).tolist(), 0) or 1
+    steps = deltas // np.uint64(unit)
+    top = int(steps.max()) if len(steps) else 0
+    delta_size = next(size for size in (1, 2, 4, 8) if top < 2 ** (8 * size))
+    narrow = yhat.astype('<f4')
+    value_size = 4 if np.array_equal(narrow.astype('<f8'), yhat, equal_nan=True) else 8
+    header = HEADER.pack(len(ds), int(ds[0]) if len(ds) else 0, unit, delta_size, value_size)
+    values = narrow if value_size == 4 else yhat
+    return header + steps.astype(DELTA_DTYPES[delta_size]).tobytes() + values.tobytes()
+
+
+def decode_forecast(blob: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Декодирует байты encode_forecast в массивы (ds — int64-наносекунды, yhat — float64).
+    """
+    count, start, unit, delta_size, value_size = HEADER.unpack_from(blob)
+    if not count:
+        return np.empty(0, dtype='<i8'), np.empty(0, dtype='<f8')
+    offset = HEADER.size
+    steps = np.frombuffer(blob, dtype=DELTA_DTYPES[delta_size], count=count - 1, offset=offset)
+    offset += steps.nbytes
+    yhat = np.frombuffer(blob, dtype=VALUE_DTYPES[value_size], count=count, offset=offset)
+    ds = np.empty(count, dtype='<i8')
+    ds[0] = start
+    np.cumsum(steps.astype('<i8') * unit, out=ds[1:])
+    ds[1:] += start
+    return ds, yhat.astype('<f8')
+
+
+def forecast_to_arrays(forecast: list) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Переводит нормализованный прогноз execute_script (список {'ds', 'yhat'}) в массивы.
+    """
+    ds = pd.to_datetime([item['ds'] for item in forecast]).as_unit('ns').asi8
+    yhat = np.array([item['yhat'] for item in forecast], dtype='float64')
+    return ds, yhat
+
+
+def iter_forecast_records(blob: bytes, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Отдаёт сохранённый прогноз частями по chunk_size записей {'ds', 'yhat'}.
+    """
+    ds, yhat = decode_forecast(blob)
+    for start in range(0, len(ds), chunk_size):
+        stamps = pd.DatetimeIndex(ds[start:start + chunk_size].view('datetime64[ns]')).strftime('%Y-%m-%d %H:%M:%S')
+        yield [{'ds': d, 'yhat': v} for d, v in zip(stamps, yhat[start:start + chunk_size].tolist())]
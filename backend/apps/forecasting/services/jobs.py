@@ -0,0 +1,164 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.forecasting.models import ForecastJob
+from apps.forecasting.services.runner import ScriptSource, load_timeseries_data, run_scripts
+from apps.timeseries.models import Timeseries
+
+logger = logging.getLogger(__name__)
+
+
+def submit_job(user, scripts: List[ScriptSource], timeseries_ids: List[int]) -> ForecastJob:
+    """
+    Ставит задание в очередь. Исходный код скриптов сохраняется в задании,
+    поэтому воркер может выполнить его на любом узле.
+    """
+    return ForecastJob.objects.create(
+        user=user,
+        scripts=[{'name': s.name, 'source': s.source.decode('utf-8')} for s in scripts],
+        timeseries_ids=list(timeseries_ids),
+    )
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale_jobs(lease: Optional[float] = None, max_attempts: Optional[int] = None) -> int:
+    """
+    Возвращает в очередь задания running, воркер которых не обновлял heartbeat_at дольше lease секунд
+    (упал или был перезапущен). Задания, исчерпавшие max_attempts попыток, завершаются ошибкой.
+    Возвращает количество возвращённых в очередь заданий.
+    """
+    lease = settings.FORECAST_JOB_LEASE if lease is None else lease
+    max_attempts = settings.FORECAST_JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    now = timezone.now()
+    stale = ForecastJob.objects.filter(status=ForecastJob.STATUS_RUNNING, heartbeat_at__lt=now - timedelta(seconds=lease))
+    stale.filter(attempts__gte=max_attempts).update(
+        status=ForecastJob.STATUS_FAILED, finished_at=now,
+        error=f'Воркер не отвечает; задание не выполнено за {max_attempts} попыток.',
+    )
+    return stale.update(status=ForecastJob.STATUS_QUEUED, worker='', started_at=None, heartbeat_at=None)
+
+
+def claim_next_job(worker: Optional[str] = None) -> Optional[ForecastJob]:
+    """
+    Забирает самое старое задание из очереди. Строки, заблокированные другими воркерами,
+    пропускаются (SKIP LOCKED), поэтому воркеры на разных узлах не получают одно задание дважды.
+    Перед этим в очередь возвращаются задания упавших воркеров (requeue_stale_jobs).
+    """
+    requeued = requeue_stale_jobs()
+    if requeued:
+        logger.warning('Возвращено в очередь заданий без heartbeat: %s', requeued)
+    with transaction.atomic():
+        job = (ForecastJob.objects
+               .select_for_update(skip_locked=True)
+               .filter(status=ForecastJob.STATUS_QUEUED)
+               .order_by('created_at')
+               .first())
+        if job is None:
+            return None
+        job.status = ForecastJob.STATUS_RUNNING
+        job.worker = worker or worker_name()
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at', 'attempts'])
+    return job
+
+
+def owned(job: ForecastJob):
+    """
+    Задание, пока оно выполняется воркером, который его забрал (аренда не перехвачена).
+    """
+    return ForecastJob.objects.filter(pk=job.pk, status=ForecastJob.STATUS_RUNNING, worker=job.worker)
+
+
+@contextmanager
+def heartbeat(job: ForecastJob, interval: Optional[float] = None):
+    """
+    Пока выполняется блок, фоновый поток каждые interval секунд обновляет heartbeat_at задания.
+    """
+    interval = settings.FORECAST_JOB_HEARTBEAT if interval is None else interval
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                if not owned(job).update(heartbeat_at=timezone.now()):
+                    logger.warning('Задание %s передано другому воркеру', job.pk)
+                    return
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'heartbeat-{job.pk}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute_job(job: ForecastJob) -> ForecastJob:
+    """
+    Выполняет задание: прогоняет скрипты по всем рядам, записывает ForecastRun/ForecastMetric
+    и сохраняет результаты в формате ответа BenchmarkView.
+    Результат записывается, только если задание всё ещё за этим воркером: если аренда истекла
+    и задание забрал другой воркер, его результат не перезаписывается.
+    """
+    scripts = [ScriptSource(s['name'], s['source'].encode('utf-8')) for s in job.scripts]
+    results = {}
+    try:
+        with heartbeat(job):
+            for ts_id in job.timeseries_ids:
+                try:
+                    selected_ts = Timeseries.objects.get(id=ts_id, author=job.user)
+                except Timeseries.DoesNotExist:
+                    results[str(ts_id)] = [{'error': 'Неверный timeseries_id.'}]
+                    continue
+                data = load_timeseries_data(selected_ts)
+                if data.empty:
+                    results[str(ts_id)] = [{'error': 'Временной ряд не содержит данных.'}]
+                    continue
+                results[str(ts_id)] = run_scripts(scripts, data, selected_ts, job.user, None)
+        job.status = ForecastJob.STATUS_DONE
+        job.result = results
+    except Exception as e:
+        logger.exception('Задание %s завершилось с ошибкой', job.pk)
+        job.status = ForecastJob.STATUS_FAILED
+        job.error = str(e)
+        job.result = results
+    job.finished_at = timezone.now()
+    if not owned(job).update(status=job.status, result=job.result, error=job.error, finished_at=job.finished_at):
+        logger.warning('Результат задания %s не записан: задание передано другому воркеру', job.pk)
+    return job
+
+
+def run_worker(poll_interval: float = 1.0, max_jobs: Optional[int] = None, should_stop=None) -> int:
+    """
+    Цикл воркера: забирает и выполняет задания, пока очередь не пуста, затем ждёт poll_interval секунд.
+    Возвращает количество выполненных заданий.
+    """
+    name = worker_name()
+    done = 0
+    while not (should_stop and should_stop()):
+        if max_jobs is not None and done >= max_jobs:
+            break
+        job = claim_next_job(name)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        logger.info('Воркер %s выполняет задание %s', name, job.pk)
+        execute_job(job)
+        done += 1
+    return done
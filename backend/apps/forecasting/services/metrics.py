@@ -0,0 +1,112 @@
+"""
+Метрики точности прогноза, вычисляемые векторно на NumPy.
+
+Факт и прогноз сопоставляются по int64-меткам времени (наносекунды с эпохи) сортированным
+соединением, без форматирования дат в строки и без pd.merge.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+METRIC_NAMES = ['MAE', 'RMSE', 'R2', 'MAPE', 'sMAPE', 'MASE']
+# Метрики, для которых большее значение лучше; для остальных лучше меньшее
+HIGHER_IS_BETTER = {'R2'}
+
+
+def to_int64_timestamps(values) -> np.ndarray:
+    """
+    Приводит метки времени (строки, datetime, datetime64) к int64-наносекундам UTC.
+    """
+    stamps = pd.to_datetime(pd.Series(values), format='mixed')
+    if stamps.dt.tz is not None:
+        stamps = stamps.dt.tz_convert('UTC').dt.tz_localize(None)
+    return stamps.to_numpy(dtype='datetime64[ns]').view('i8')
+
+
+def align(actual_ds: np.ndarray, actual_y: np.ndarray,
+          forecast_ds: np.ndarray, forecast_yhat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Сопоставляет факт и прогноз по совпадающим меткам времени.
+    Если в прогнозе метка повторяется, используется последнее значение.
+
+    Возвращает пары (y, yhat) в порядке возрастания времени.
+    """
+    actual_order = np.argsort(actual_ds, kind='stable')
+    actual_ds, actual_y = actual_ds[actual_order], actual_y[actual_order]
+
+    forecast_order = np.argsort(forecast_ds, kind='stable')
+    forecast_ds, forecast_yhat = forecast_ds[forecast_order], forecast_yhat[forecast_order]
+    if len(forecast_ds):
+        keep = np.append(forecast_ds[1:] != forecast_ds[:-1], True)
+        forecast_ds, forecast_yhat = forecast_ds[keep], forecast_yhat[keep]
+
+    pos = np.searchsorted(forecast_ds, actual_ds)
+    pos_clipped = np.minimum(pos, max(len(forecast_ds) - 1, 0))
+    matched = (pos < len(forecast_ds)) & (forecast_ds[pos_clipped] == actual_ds) if len(forecast_ds) else np.zeros(len(actual_ds), bool)
+    return actual_y[matched], forecast_yhat[pos_clipped[matched]]
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+def compute_metrics(y: np.ndarray, yhat: np.ndarray, history: Optional[np.ndarray] = None) -> Dict[str, Optional[float]]:
+    """
+    Считает MAE, RMSE, R2, MAPE, sMAPE и MASE за один проход по массивам ошибок.
+
+    Параметры:
+      - y, yhat: сопоставленные факт и прогноз
+      - history: ряд фактических значений в порядке времени для знаменателя MASE
+        (средняя абсолютная ошибка наивного прогноза на один шаг); по умолчанию — y
+    Возвращает:
+      - Словарь метрик; неопределённые значения (деление на ноль) — None.
+        MAPE и sMAPE — в процентах, точки с нулевым знаменателем пропускаются.
+    """
+    y = np.asarray(y, dtype='float64')
+    yhat = np.asarray(yhat, dtype='float64')
+    n = len(y)
+    if n == 0:
+        return {name: None for name in METRIC_NAMES}
+
+    err = y - yhat
+    abs_err = np.abs(err)
+    abs_y = np.abs(y)
+    mae = abs_err.mean()
+    sse = np.dot(err, err)
+    centered = y - y.mean()
+    sst = np.dot(centered, centered)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nonzero = abs_y > 0
+        mape = (abs_err[nonzero] / abs_y[nonzero]).mean() * 100 if nonzero.any() else np.nan
+        denom = abs_y + np.abs(yhat)
+        positive = denom > 0
+        smape = (2 * abs_err[positive] / denom[positive]).mean() * 100 if positive.any() else np.nan
+        r2 = 1 - sse / sst if sst > 0 else np.nan
+        history = y if history is None else np.asarray(history, dtype='float64')
+        scale = np.abs(np.diff(history)).mean() if len(history) > 1 else np.nan
+        mase = mae / scale if scale > 0 else np.nan
+
+    return {
+        'MAE': _finite_or_none(mae),
+        'RMSE': _finite_or_none(np.sqrt(sse / n)),
+        'R2': _finite_or_none(r2),
+        'MAPE': _finite_or_none(mape),
+        'sMAPE': _finite_or_none(smape),
+        'MASE': _finite_or_none(mase),
+    }
+
+
+def score_forecast(actual_ds: np.ndarray, actual_y: np.ndarray,
+                   forecast_ds: np.ndarray, forecast_yhat: np.ndarray,
+                   history: Optional[np.ndarray] = None) -> Tuple[int, Dict[str, Optional[float]]]:
+    """
+    Сопоставляет прогноз с фактом и считает метрики.
+    Возвращает (число сопоставленных точек, метрики); MASE нормируется по history
+    (по умолчанию — по всей истории факта).
+    """
+    y, yhat = align(actual_ds, actual_y, forecast_ds, forecast_yhat)
+    if history is None:
+        history = actual_y[np.argsort(actual_ds, kind='stable')]
+    return len(y), compute_metrics(y, yhat, history)
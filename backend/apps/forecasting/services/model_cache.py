@@ -0,0 +1,168 @@
+"""
+Дисковый кэш обученных моделей Prophet.
+
+Модель сериализуется в JSON (prophet.serialize.model_to_json) и хранится в файле
+<ключ>.json, ключ — SHA-256 от (ряд, версия ряда, гиперпараметры). Кэш вытесняет
+давно не использованные записи (LRU по времени изменения файла), когда превышено
+число записей или суммарный размер на диске.
+
+Для каждой пары (ряд, гиперпараметры) запоминается последняя обученная модель:
+после добавления точек версия ряда меняется, и новая модель обучается с параметрами
+предыдущей в качестве начального приближения (warm start).
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+
+# Ограничения кэша по умолчанию: число моделей и суммарный размер файлов
+MODEL_CACHE_MAX_ENTRIES = 500
+MODEL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ModelCache:
+    """
+    Кэш записей {'model': JSON модели, 'fit_time': секунды обучения} в каталоге directory.
+    Счётчики попаданий и промахов — свои в каждом процессе, файлы — общие.
+    """
+    def __init__(self, directory: str, max_entries: int = MODEL_CACHE_MAX_ENTRIES,
+                 max_bytes: int = MODEL_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.fit_time_saved = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(series: str, version, params: dict) -> str:
+        return _digest(series, version, params)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.json')
+
+    def _read(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._path(name), encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(self._path(name))  # отметка использования для LRU
+        except OSError:
+            pass
+        return entry
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Запись по ключу или None; учитывается в счётчиках попаданий и промахов.
+        """
+        entry = self._read(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.fit_time_saved += entry.get('fit_time', 0.0)
+        return entry
+
+    def record_saving(self, seconds: float) -> None:
+        """
+        Учитывает время, сэкономленное без попадания в кэш (например, за счёт warm start).
+        """
+        with self._lock:
+            self.fit_time_saved += seconds
+
+    def latest(self, series: str, params: dict) -> Optional[dict]:
+        """
+        Последняя сохранённая модель ряда с теми же гиперпараметрами (для warm start).
+        """
+        try:
+            with open(self._path(f'latest-{_digest(series, params)}'), encoding='utf-8') as file:
+                key = file.read().strip()
+        except OSError:
+            return None
+        return self._read(key)
+
+    def put(self, key: str, entry: dict, series: Optional[str] = None, params: Optional[dict] = None) -> None:
+        """
+        Сохраняет запись; если указан ряд, она становится последней моделью ряда.
+        Запись идёт во временный файл с последующим переименованием, чтобы другие процессы
+        не прочитали файл наполовину.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, self._path(key))
+        if series is not None:
+            pointer = self._path(f'latest-{_digest(series, params)}')
+            with open(f'{pointer}.{os.getpid()}.tmp', 'w', encoding='utf-8') as file:
+                file.write(key)
+            os.replace(f'{pointer}.{os.getpid()}.tmp', pointer)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Удаляет самые давно использованные модели, пока кэш не уложится в ограничения.
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith('.json') and not item.name.startswith('latest-'):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        if os.path.isdir(self.directory):
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith('.json'):
+                        os.remove(item.path)
+        with self._lock:
+            self.hits = self.misses = 0
+            self.fit_time_saved = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'fit_time_saved': self.fit_time_saved,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_default_cache: Optional[ModelCache] = None
+
+
+def default_cache() -> ModelCache:
+    """
+    Кэш процесса с каталогом и ограничениями из settings (PROPHET_MODEL_CACHE_*).
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache(
+            settings.PROPHET_MODEL_CACHE_DIR,
+            getattr(settings, 'PROPHET_MODEL_CACHE_MAX_ENTRIES', MODEL_CACHE_MAX_ENTRIES),
+            getattr(settings, 'PROPHET_MODEL_CACHE_MAX_BYTES', MODEL_CACHE_MAX_BYTES),
+        )
+    return _default_cache
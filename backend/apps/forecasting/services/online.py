@@ -0,0 +1,102 @@
+"""
+Онлайн-оценка сохранённых прогнозов по фактам, поступающим после запуска.
+
+Для каждого запуска в ForecastRun.online_stats хранятся накопленные суммы по сопоставленным точкам:
+n, abs_err (Σ|y - ŷ|), sq_err (Σ(y - ŷ)²), y (Σy), y_sq (Σy²) и actual_until — последний учтённый факт.
+По ним MAE, RMSE и R2 пересчитываются за O(1), без повторного запуска скриптов и без чтения истории ряда.
+"""
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from apps.forecasting.models import ForecastAccuracy, ForecastRun
+from apps.forecasting.services.forecast_storage import decode_forecast
+from apps.forecasting.services.metrics import align
+
+SUM_KEYS = ('n', 'abs_err', 'sq_err', 'y', 'y_sq')
+
+
+def _datetime(value: int):
+    return pd.Timestamp(value, unit='ns', tz='UTC').to_pydatetime()
+
+
+def online_metrics(stats: dict) -> Dict[str, Optional[float]]:
+    """
+    MAE, RMSE и R2 по накопленным суммам (None, если метрика не определена).
+    """
+    n = stats.get('n', 0)
+    if not n:
+        return {'MAE': None, 'RMSE': None, 'R2': None}
+    total = stats['y_sq'] - stats['y'] ** 2 / n
+    return {
+        'MAE': stats['abs_err'] / n,
+        'RMSE': math.sqrt(stats['sq_err'] / n),
+        'R2': 1 - stats['sq_err'] / total if total > 0 else None,
+    }
+
+
+def accumulate(stats: dict, y: np.ndarray, yhat: np.ndarray, actual_until: int) -> dict:
+    """
+    Добавляет к суммам новые пары (факт, прогноз).
+    """
+    err = y - yhat
+    stats = {key: stats.get(key, 0) for key in SUM_KEYS}
+    stats['n'] += int(len(y))
+    stats['abs_err'] += float(np.abs(err).sum())
+    stats['sq_err'] += float((err ** 2).sum())
+    stats['y'] += float(y.sum())
+    stats['y_sq'] += float((y ** 2).sum())
+    stats['actual_until'] = _datetime(actual_until).isoformat()
+    return stats
+
+
+def rescore_runs(timeseries, ds: np.ndarray, y: np.ndarray) -> int:
+    """
+    Учитывает новые факты ряда (ds — int64-наносекунды, по возрастанию) в прогнозах,
+    которые покрывают их по времени. Возвращает число обновлённых запусков.
+    """
+    if not len(ds):
+        return 0
+    runs = (
+        ForecastRun.objects.filter(
+            timeseries=timeseries,
+            forecast_data__isnull=False,
+            forecast_start__lte=_datetime(ds[-1]),
+            forecast_end__gte=_datetime(ds[0]),
+        )
+        .only('id', 'forecast_data', 'online_stats')
+    )
+    updated, snapshots = [], []
+    for run in runs.iterator(chunk_size=100):
+        forecast_ds, forecast_yhat = decode_forecast(bytes(run.forecast_data))
+        matched_y, matched_yhat = align(ds, y, forecast_ds, forecast_yhat)
+        if not len(matched_y):
+            continue
+        run.online_stats = accumulate(run.online_stats, matched_y, matched_yhat, ds[-1])
+        metrics = online_metrics(run.online_stats)
+        updated.append(run)
+        snapshots.append(ForecastAccuracy(
+            run=run, actual_until=_datetime(ds[-1]), points=run.online_stats['n'],
+            mae=metrics['MAE'], rmse=metrics['RMSE'], r2=metrics['R2'],
+        ))
+    ForecastRun.objects.bulk_update(updated, ['online_stats'], batch_size=500)
+    ForecastAccuracy.objects.bulk_create(snapshots, batch_size=500)
+    return len(updated)
+
+
+def rescore_on_append(sender, timeseries, ds, y, **kwargs) -> None:
+    """
+    Обработчик сигнала timeseries.signals.points_appended.
+    """
+    rescore_runs(timeseries, ds, y)
+
+
+def run_bounds(forecast_ds: np.ndarray) -> dict:
+    """
+    Поля forecast_start/forecast_end для ForecastRun по меткам прогноза.
+    """
+    if not len(forecast_ds):
+        return {}
+    return {'forecast_start': _datetime(forecast_ds.min()), 'forecast_end': _datetime(forecast_ds.max())}
@@ -0,0 +1,72 @@
+"""
+Кэш результатов прогнозирования для повторных запусков того же скрипта на тех же данных.
+
+Ключ — хэш исходного кода скрипта, хэш содержимого набора данных и параметры запуска.
+Срок жизни и максимальное число записей задаются в settings.CACHES для алиаса
+settings.FORECAST_RESULT_CACHE. Скрипты с DETERMINISTIC = False в кэш не попадают; признак читается
+при проверке скрипта в песочнице и хранится в ScriptValidation, веб-процесс код скрипта не выполняет.
+"""
+import hashlib
+import json
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.forecasting.models import ScriptValidation
+from apps.forecasting.services.executor import ScriptSource
+from apps.forecasting.services.script_cache import script_hash
+
+KEY_PREFIX = 'forecast-result'
+
+
+def _cache():
+    return caches[getattr(settings, 'FORECAST_RESULT_CACHE', 'default')]
+
+
+def dataset_hash(ds: np.ndarray, y: np.ndarray) -> str:
+    """
+    SHA-256 содержимого набора данных (int64-наносекунды и float64-значения).
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(ds, dtype='<i8').tobytes())
+    digest.update(np.ascontiguousarray(y, dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def result_key(source_hash: str, data_hash: str, params: Optional[dict] = None) -> str:
+    params_hash = hashlib.sha256(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{source_hash}:{data_hash}:{params_hash}'
+
+
+def get_result(script: ScriptSource, data_hash: str, params: Optional[dict] = None) -> Optional[dict]:
+    """
+    Возвращает сохранённый результат с пометкой cached=True или None, если его нет.
+    """
+    stored = _cache().get(result_key(script_hash(script.source), data_hash, params))
+    if stored is None:
+        return None
+    return {'script': script.name, **stored, 'cached': True}
+
+
+def is_deterministic(source_hash: str) -> bool:
+    """
+    Скрипт объявил себя детерминированным (по ScriptValidation, см. runner.ensure_verdicts);
+    непроверенный скрипт считается недетерминированным.
+    """
+    return ScriptValidation.objects.filter(script_hash=source_hash, deterministic=True).exists()
+
+
+def store_result(script: ScriptSource, data_hash: str, result: dict, params: Optional[dict] = None) -> bool:
+    """
+    Сохраняет успешный результат детерминированного скрипта. Возвращает True, если результат сохранён.
+    """
+    source_hash = script_hash(script.source)
+    if 'error' in result or result.get('cached') or not is_deterministic(source_hash):
+        return False
+    _cache().set(
+        result_key(source_hash, data_hash, params),
+        {key: result[key] for key in ('forecast', 'metrics', 'folds') if key in result},
+    )
+    return True
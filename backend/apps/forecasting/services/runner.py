@@ -0,0 +1,297 @@
+import os
+import socket
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from apps.forecasting.models import BacktestFold, ForecastRun, ForecastMetric, ScriptValidation
+from apps.forecasting.services import result_cache
+from apps.forecasting.services.forecast_storage import encode_forecast, forecast_to_arrays
+from apps.forecasting.services.online import run_bounds
+from apps.forecasting.services.executor import (
+    ScriptSource, dataset_arrays, inspect_script, prepare_data, run_task, sandboxed, shared_datasets,
+)
+from apps.forecasting.services.sandbox import SandboxError, default_limits, default_pool
+from apps.forecasting.services.script_cache import script_hash
+from apps.timeseries.utils.storage import query_points
+
+
+def read_uploaded_scripts(files) -> List[ScriptSource]:
+    """
+    Считывает загруженные файлы скриптов в память, чтобы их можно было выполнять повторно
+    и передавать в другие процессы.
+    """
+    scripts = []
+    for file in files:
+        file.seek(0)
+        scripts.append(ScriptSource(file.name, file.read()))
+    return scripts
+
+
+def load_timeseries_data(selected_ts, query: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Загружает сохранённый временной ряд в формате, который ожидает execute_script.
+    query (timeseries.utils.resample.parse_point_query) ограничивает диапазон и задаёт передискретизацию.
+    """
+    return prepare_data(*query_points(selected_ts, query))
+
+
+def ensure_verdicts(scripts: List[ScriptSource]) -> Dict[str, Optional[str]]:
+    """
+    Возвращает результаты проверки на соответствие шаблону по хэшу исходного кода
+    (None — проверка пройдена, иначе сообщение об ошибке).
+    Непроверенные скрипты проверяются один раз в процессе песочницы (inspect_script), результат
+    и признак DETERMINISTIC сохраняются в ScriptValidation.
+    Сохраняются только результаты самой проверки: если процесс песочницы упал или проверка
+    остановлена ограничениями, вердикт действует только для этого вызова и скрипт будет проверен снова.
+    """
+    hashes = {script_hash(script.source): script for script in scripts}
+    verdicts, known = {}, set()
+    for v in ScriptValidation.objects.filter(script_hash__in=hashes):
+        verdicts[v.script_hash] = None if v.passed else v.error
+        if v.deterministic is not None:
+            known.add(v.script_hash)
+    for key, script in hashes.items():
+        if key in known:
+            continue
+        try:
+            error, deterministic = default_pool().run(inspect_script, script, limits=default_limits())
+        except SandboxError as e:
+            verdicts.setdefault(key, str(e))
+            continue
+        ScriptValidation.objects.update_or_create(
+            script_hash=key, defaults={'passed': error is None, 'error': error or '', 'deterministic': deterministic}
+        )
+        verdicts[key] = error
+    return verdicts
+
+
+def save_result(result: dict, selected_ts, user, csv_file_name=None, backtest: Optional[dict] = None):
+    """
+    Сохраняет результат выполнения скрипта как ForecastRun с метриками и прогнозом.
+    Для результата бэктеста (backtest — параметры, result['folds'] — фолды) сохраняются и фолды.
+    Результаты с ошибкой не сохраняются, кроме остановленных песочницей (см. is_recorded).
+    """
+    runs = save_results([(result, selected_ts, csv_file_name)], user, backtest)
+    return runs[0] if runs else None
+
+
+def is_recorded(result: dict) -> bool:
+    """
+    Результат сохраняется в ForecastRun: успешный или остановленный (status timeout, oom, cancelled).
+    """
+    return 'error' not in result or bool(result.get('status'))
+
+
+def run_fields(result: dict) -> Tuple[dict, dict, list]:
+    """
+    Поля ForecastRun по результату, дополнительные метрики (для ForecastMetric) и фолды бэктеста.
+    Для остановленного запуска — статус, ошибка и время до остановки.
+    """
+    if 'error' in result:
+        return {
+            'status': result['status'],
+            'error': result['error'],
+            'duration': result.get('metrics', {}).get('duration'),
+        }, {}, []
+    metrics = {n: v for n, v in result['metrics'].items() if v is not None}
+    forecast_ds, forecast_yhat = forecast_to_arrays(result['forecast'])
+    fields = {
+        'status': ForecastRun.STATUS_DONE,
+        'forecast_data': encode_forecast(forecast_ds, forecast_yhat),
+        **run_bounds(forecast_ds),
+        **{field: metrics.pop(name) for name, field in ForecastRun.METRIC_FIELDS.items() if name in metrics},
+    }
+    return fields, metrics, result.get('folds') or []
+
+
+def save_results(items: List[tuple], user, backtest: Optional[dict] = None, batch_size: int = 500) -> List[ForecastRun]:
+    """
+    Сохраняет пачку результатов (результат, временной ряд, имя CSV) через bulk_create:
+    по одному INSERT на каждые batch_size строк ForecastRun, ForecastMetric и BacktestFold.
+    Результаты с ошибкой пропускаются (кроме остановленных песочницей). Возвращает созданные запуски.
+    """
+    runs, extra = [], []
+    for result, selected_ts, csv_file_name in items:
+        if not is_recorded(result):
+            continue
+        fields, metrics, folds = run_fields(result)
+        runs.append(ForecastRun(
+            user=user,
+            timeseries=selected_ts,
+            script_name=result['script'],
+            csv_file_name=csv_file_name,
+            backtest=backtest,
+            **fields
+        ))
+        extra.append((metrics, folds))
+    ForecastRun.objects.bulk_create(runs, batch_size=batch_size)
+    save_details(runs, extra, batch_size)
+    return runs
+
+
+def save_details(runs: List[ForecastRun], extra: List[tuple], batch_size: int = 500) -> None:
+    """
+    Дополнительные метрики и фолды запусков; extra — пары (метрики, фолды) в порядке runs.
+    """
+    ForecastMetric.objects.bulk_create(
+        [ForecastMetric(run=run, name=n, value=v) for run, (metrics, _) in zip(runs, extra) for n, v in metrics.items()],
+        batch_size=batch_size,
+    )
+    BacktestFold.objects.bulk_create(
+        [fold_record(run, fold) for run, (_, folds) in zip(runs, extra) for fold in folds],
+        batch_size=batch_size,
+    )
+
+
+def dispatcher_identity() -> str:
+    """
+    Хост и pid процесса, отправляющего задачи в песочницу (ForecastRun.sandbox_host).
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def start_run(script: ScriptSource, selected_ts, user, csv_file_name=None) -> ForecastRun:
+    """
+    Запись выполняющегося запуска: по ней запуск можно отменить (ForecastRunCancelView),
+    пока песочница выполняет скрипт. Процесс, выполняющий запуск, опрашивает статус записи
+    и сам останавливает свой рабочий процесс песочницы, когда запуск помечен cancelled.
+    """
+    return ForecastRun.objects.create(
+        user=user, timeseries=selected_ts, script_name=script.name, csv_file_name=csv_file_name,
+        status=ForecastRun.STATUS_RUNNING,
+    )
+
+
+def finish_run(run: ForecastRun, result: dict) -> dict:
+    """
+    Завершает запись start_run по результату: успешный или остановленный запуск сохраняется,
+    запись запуска с обычной ошибкой удаляется. Если запуск тем временем отменён, возвращает
+    результат со статусом cancelled. Статус меняется только у записи в состоянии running,
+    поэтому отмена и завершение не перезаписывают друг друга.
+    """
+    pending = ForecastRun.objects.filter(pk=run.pk, status=ForecastRun.STATUS_RUNNING)
+    if not is_recorded(result):
+        if pending.delete()[0]:
+            return result
+    else:
+        fields, metrics, folds = run_fields(result)
+        if pending.update(sandbox_pid=None, sandbox_host='', **fields):
+            save_details([run], [(metrics, folds)])
+            return result
+    duration = result.get('metrics', {}).get('duration')
+    ForecastRun.objects.filter(pk=run.pk).update(sandbox_pid=None, sandbox_host='', duration=duration)
+    return {'script': result['script'], 'error': 'Запуск отменён.', 'status': ForecastRun.STATUS_CANCELLED,
+            'metrics': {'duration': duration}}
+
+
+class GridRuns:
+    """
+    Записи выполняющихся пар (набор данных, скрипт) бенчмарка или пакетного прогноза — параметр runs
+    функций executor.iter_grid и run_grid. Для пар, которые будут выполняться, start создаёт записи
+    со статусом running одним bulk_create; cancelled одним запросом возвращает пары, отменённые через
+    ForecastRunCancelView, и процесс, выполняющий запрос, сам останавливает их задачи в песочнице.
+    finish завершает запись пары по результату (finish_run); пары без записи (ошибка проверки,
+    результат из кэша) сохраняются как раньше, через save_result.
+
+    Параметры:
+      - scripts: скрипты по номеру в паре
+      - sources: ключ набора -> (временной ряд или None, имя CSV или None)
+      - backtest: параметры бэктеста для записей
+    """
+
+    def __init__(self, scripts: List[ScriptSource], sources: Dict[str, tuple], user, backtest: Optional[dict] = None):
+        self.scripts = scripts
+        self.sources = sources
+        self.user = user
+        self.backtest = backtest
+        self.runs: Dict[Tuple[str, int], ForecastRun] = {}
+
+    def start(self, pairs: List[Tuple[str, int]]) -> None:
+        host = dispatcher_identity()
+        runs = [
+            ForecastRun(
+                user=self.user, timeseries=self.sources[key][0], csv_file_name=self.sources[key][1],
+                script_name=self.scripts[index].name, backtest=self.backtest,
+                status=ForecastRun.STATUS_RUNNING, sandbox_host=host,
+            )
+            for key, index in pairs
+        ]
+        ForecastRun.objects.bulk_create(runs)
+        self.runs.update(zip(pairs, runs))
+
+    def cancelled(self) -> List[Tuple[str, int]]:
+        pairs = {run.pk: pair for pair, run in self.runs.items()}
+        if not pairs:
+            return []
+        stopped = ForecastRun.objects.filter(pk__in=list(pairs), status=ForecastRun.STATUS_CANCELLED)
+        return [pairs[pk] for pk in stopped.values_list('pk', flat=True)]
+
+    def finish(self, key: str, index: int, result: dict) -> dict:
+        run = self.runs.pop((key, index), None)
+        if run is not None:
+            return finish_run(run, result)
+        selected_ts, csv_file_name = self.sources[key]
+        save_result(result, selected_ts, self.user, csv_file_name, self.backtest)
+        return result
+
+
+def fold_record(run: ForecastRun, fold: dict) -> BacktestFold:
+    """
+    Строка BacktestFold по результату фолда из services.backtest.aggregate_folds.
+    """
+    metrics = fold.get('metrics', {})
+    stamps = {name: pd.Timestamp(fold[name], tz='UTC').to_pydatetime() for name in ('train_start', 'test_start', 'test_end')}
+    return BacktestFold(
+        run=run, fold=fold['fold'], error=fold.get('error', ''), **stamps,
+        **{field: metrics.get(name) for name, field in ForecastRun.METRIC_FIELDS.items()}
+    )
+
+
+def cached_results(scripts: List[ScriptSource], data_hashes: Dict[str, str], params: Optional[dict] = None) -> Dict[tuple, dict]:
+    """
+    Ищет в кэше результаты для всех пар (ключ набора данных, номер скрипта).
+    Возвращает найденные результаты в формате параметра known функции run_grid.
+    """
+    known = {}
+    for key, data_hash in data_hashes.items():
+        for index, script in enumerate(scripts):
+            result = result_cache.get_result(script, data_hash, params)
+            if result is not None:
+                known[(key, index)] = result
+    return known
+
+
+def run_scripts(scripts: List[ScriptSource], data: pd.DataFrame, selected_ts, user, csv_file_name=None,
+                use_cache: bool = False, params: Optional[dict] = None) -> list:
+    """
+    Последовательно выполняет скрипты на одном наборе данных, сохраняет ForecastRun/ForecastMetric
+    и возвращает список результатов (прогноз и метрики либо ошибка) в порядке скриптов.
+    При use_cache результаты берутся из кэша (с пометкой cached) и сохраняются в него.
+    Каждый скрипт выполняется с ограничениями песочницы (settings FORECAST_RUN_*); пока он выполняется,
+    запуск виден со статусом running и может быть отменён.
+    """
+    verdicts = ensure_verdicts(scripts)
+    data_hash = result_cache.dataset_hash(*dataset_arrays(data)) if use_cache else None
+    results = []
+    with shared_datasets({'data': dataset_arrays(data)}) as paths:
+        for script in scripts:
+            error = verdicts[script_hash(script.source)]
+            result = result_cache.get_result(script, data_hash, params) if use_cache and not error else None
+            if result is not None or error:
+                result = result or {'script': script.name, 'error': error}
+                save_result(result, selected_ts, user, csv_file_name)
+                results.append(result)
+                continue
+            run = start_run(script, selected_ts, user, csv_file_name)
+            pending = ForecastRun.objects.filter(pk=run.pk, status=ForecastRun.STATUS_RUNNING)
+            result = sandboxed(
+                run_task, script, *paths['data'], True,
+                on_start=lambda pid: pending.update(sandbox_pid=pid, sandbox_host=dispatcher_identity()),
+                should_cancel=lambda: not pending.exists(),
+            )
+            result = finish_run(run, result)
+            if use_cache:
+                result_cache.store_result(script, data_hash, result, params)
+            results.append(result)
+    return results
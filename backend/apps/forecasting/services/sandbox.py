@@ -0,0 +1,395 @@
+"""
+Пул изолированных процессов для выполнения пользовательских скриптов.
+
+Процессы создаются через forkserver: сервер один раз импортирует тяжёлые библиотеки
+(PRELOAD_MODULES), и каждый рабочий процесс — его форк с уже загруженными модулями,
+поэтому запуск скрипта не платит за импорт pandas, statsmodels или prophet.
+Задача (функция и аргументы) передаётся процессу через канал (Pipe), результат
+возвращается тем же каналом. Падение скрипта или утечка памяти затрагивают только
+рабочий процесс: он заменяется новым, веб-процесс продолжает работу.
+Рабочие процессы запускаются по мере надобности: новый — только когда все запущенные заняты,
+но не больше size, поэтому простаивающий процесс Django или воркер очереди не держит процессов пула.
+
+Рабочий процесс перезапускается после max_tasks задач или когда его RSS превышает max_rss_mb.
+Функция report (если задана) вызывается в рабочем процессе после каждой задачи; её словарь
+счётчиков приходит вместе с ответом, и пул суммирует счётчики всех процессов (report_stats).
+
+Для каждой задачи можно задать ограничения RunLimits:
+  - timeout: время выполнения в секундах; по его истечении процесс убивается (SandboxTimeout);
+  - cpu_seconds: процессорное время задачи (RLIMIT_CPU, SIGXCPU прерывает задачу — SandboxTimeout);
+  - memory_mb: прирост адресного пространства (RLIMIT_AS; MemoryError — SandboxMemoryError).
+После превышения ограничения процесс заменяется новым.
+
+Задачу можно отменить только из процесса, который её отправил: run опрашивает should_cancel
+(например, флаг отмены в БД) каждые cancel_poll секунд и при отмене сам завершает свой рабочий
+процесс (SandboxCancelled). Сигналы процессам пула извне не посылаются.
+"""
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import threading
+import timeit
+from collections import namedtuple
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+# Модули, импортируемые сервером forkserver до создания рабочих процессов
+PRELOAD_MODULES = [
+    'numpy', 'pandas', 'sklearn', 'statsmodels.api', 'prophet',
+    'apps.forecasting.services.executor',
+]
+SANDBOX_MAX_TASKS = 200
+SANDBOX_MAX_RSS_MB = 1024
+
+# Ограничения одной задачи; None — без ограничения
+RunLimits = namedtuple('RunLimits', ['timeout', 'cpu_seconds', 'memory_mb'], defaults=(None, None, None))
+
+STATUS_TIMEOUT = 'timeout'
+STATUS_OOM = 'oom'
+STATUS_CANCELLED = 'cancelled'
+# Период опроса should_cancel в секундах
+CANCEL_POLL_SECONDS = 1.0
+
+
+class SandboxError(Exception):
+    """
+    Задача не выполнена: функция вызвала исключение или рабочий процесс аварийно завершился.
+    status — причина для записи в ForecastRun (None для обычной ошибки), elapsed — секунды до остановки,
+    exitcode — код завершения упавшего процесса (-9 после kill).
+    """
+    status = None
+
+    def __init__(self, message: str, elapsed: Optional[float] = None, exitcode: Optional[int] = None):
+        super().__init__(message)
+        self.elapsed = elapsed
+        self.exitcode = exitcode
+
+
+class SandboxTimeout(SandboxError):
+    status = STATUS_TIMEOUT
+
+
+class SandboxMemoryError(SandboxError):
+    status = STATUS_OOM
+
+
+class SandboxCancelled(SandboxError):
+    status = STATUS_CANCELLED
+
+
+class CpuTimeExceeded(BaseException):
+    """
+    Исчерпано процессорное время задачи. Наследует BaseException, чтобы пользовательский
+    код с except Exception не мог его перехватить.
+    """
+
+
+def _raise_cpu_time_exceeded(signum, frame):
+    raise CpuTimeExceeded()
+
+
+def _set_soft_limit(kind: int, soft: int) -> None:
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(kind, (soft, hard))
+
+
+def _apply_limits(limits: Optional[RunLimits]) -> None:
+    """
+    Устанавливает мягкие RLIMIT_CPU и RLIMIT_AS относительно текущего потребления процесса:
+    процесс переиспользуется, а жёсткие ограничения нельзя поднять обратно.
+    """
+    if limits is None:
+        return
+    if limits.cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _set_soft_limit(resource.RLIMIT_CPU, int(usage.ru_utime + usage.ru_stime + limits.cpu_seconds) + 1)
+    if limits.memory_mb:
+        _set_soft_limit(resource.RLIMIT_AS, vm_bytes() + int(limits.memory_mb * 1024 * 1024))
+
+
+def _reset_limits() -> None:
+    for kind in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _, hard = resource.getrlimit(kind)
+        resource.setrlimit(kind, (hard, hard))
+
+
+def vm_bytes() -> int:
+    """
+    Текущий размер адресного пространства процесса в байтах.
+    """
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def rss_mb() -> float:
+    """
+    Текущий RSS процесса в мегабайтах (пиковый, если /proc недоступен).
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(conn, max_tasks: int, max_rss_mb: float, report: Optional[Callable[[], dict]] = None) -> None:
+    """
+    Цикл рабочего процесса: принимает (функция, аргументы, ограничения),
+    отвечает (статус, результат, завершаюсь ли, счётчики report).
+    """
+    signal.signal(signal.SIGXCPU, _raise_cpu_time_exceeded)
+    tasks = 0
+    while True:
+        try:
+            func, args, limits = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            _apply_limits(limits)
+            reply = ('ok', func(*args))
+        except CpuTimeExceeded:
+            reply = (STATUS_TIMEOUT, f'Превышено процессорное время ({limits.cpu_seconds} с).')
+        except MemoryError:
+            reply = (STATUS_OOM, f'Превышен лимит памяти ({limits.memory_mb} МБ).' if limits and limits.memory_mb
+                     else 'Недостаточно памяти.')
+        except BaseException as e:
+            reply = ('error', f'{type(e).__name__}: {e}')
+        finally:
+            _reset_limits()
+        tasks += 1
+        retire = reply[0] in (STATUS_TIMEOUT, STATUS_OOM) or tasks >= max_tasks or rss_mb() > max_rss_mb
+        snapshot = report() if report is not None else None
+        try:
+            conn.send((*reply, retire, snapshot))
+        except Exception as e:
+            conn.send(('error', f'Результат нельзя передать из процесса: {e}', retire, snapshot))
+        if retire:
+            return
+
+
+class SandboxWorker:
+    def __init__(self, context, max_tasks: int, max_rss_mb: float, report: Optional[Callable[[], dict]] = None):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, max_tasks, max_rss_mb, report), daemon=True)
+        self.report: Optional[dict] = None  # последние счётчики report
+        self.process.start()
+        child.close()
+
+    def call(self, func, args: tuple, limits: Optional[RunLimits] = None,
+             should_cancel: Optional[Callable[[], bool]] = None, cancel_poll: float = CANCEL_POLL_SECONDS) -> tuple:
+        """
+        Выполняет задачу и возвращает ответ процесса. Если ответа нет за limits.timeout секунд
+        или should_cancel() вернула True, процесс завершается, а ответ — (timeout или cancelled, сообщение).
+        """
+        self.conn.send((func, args, limits))
+        timeout = limits.timeout if limits is not None else None
+        deadline = timeit.default_timer() + timeout if timeout else None
+        while True:
+            wait = None if deadline is None else max(deadline - timeit.default_timer(), 0)
+            if should_cancel is not None:
+                wait = cancel_poll if wait is None else min(wait, cancel_poll)
+            if self.conn.poll(wait):
+                return self.conn.recv()
+            if deadline is not None and timeit.default_timer() >= deadline:
+                reply = (STATUS_TIMEOUT, f'Превышено время выполнения ({timeout} с).', True, None)
+                break
+            if should_cancel is not None and should_cancel():
+                reply = (STATUS_CANCELLED, 'Запуск отменён.', True, None)
+                break
+        self.process.kill()
+        return reply
+
+    def stop(self) -> None:
+        self.conn.close()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class SandboxPool:
+    """
+    Пул не больше чем из size рабочих процессов, общий для всех потоков процесса Django.
+    Процесс создаётся, когда задаче не хватило свободного, и затем переиспользуется между запросами.
+    report — функция уровня модуля, возвращающая счётчики рабочего процесса; счётчики из cumulative
+    накапливаются и после замены процесса, остальные суммируются только по работающим процессам.
+    """
+    def __init__(self, size: int, max_tasks: int = SANDBOX_MAX_TASKS, max_rss_mb: float = SANDBOX_MAX_RSS_MB,
+                 preload=PRELOAD_MODULES, report: Optional[Callable[[], dict]] = None, cumulative=()):
+        self.size = size
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self.preload = list(preload)
+        self.tasks = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.killed = 0
+        self.report = report
+        self.cumulative = tuple(cumulative)
+        self._retired_report: Dict[str, float] = {}
+        self._idle: 'queue.Queue[SandboxWorker]' = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._context = None
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._context is not None:
+                return
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(self.preload)
+            else:
+                context = multiprocessing.get_context('spawn')
+            self._context = context
+
+    def _acquire(self) -> SandboxWorker:
+        """
+        Свободный рабочий процесс; если свободных нет и запущено меньше size — новый,
+        иначе ожидает освобождения.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._workers) < self.size:
+                worker = SandboxWorker(self._context, self.max_tasks, self.max_rss_mb, self.report)
+                self._workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def _replace(self, worker: SandboxWorker) -> SandboxWorker:
+        worker.stop()
+        fresh = SandboxWorker(self._context, self.max_tasks, self.max_rss_mb, self.report)
+        with self._lock:
+            self._workers[self._workers.index(worker)] = fresh
+            for key in self.cumulative:
+                if worker.report and key in worker.report:
+                    self._retired_report[key] = self._retired_report.get(key, 0) + worker.report[key]
+        return fresh
+
+    def run(self, func, *args, limits: Optional[RunLimits] = None, on_start: Optional[Callable[[int], None]] = None,
+            should_cancel: Optional[Callable[[], bool]] = None, cancel_poll: float = CANCEL_POLL_SECONDS):
+        """
+        Выполняет func(*args) в свободном рабочем процессе и возвращает результат.
+        func и аргументы должны сериализоваться pickle (функция — на уровне модуля).
+        on_start(pid) вызывается перед отправкой задачи (например, чтобы записать pid для диагностики).
+        should_cancel вызывается перед отправкой задачи и каждые cancel_poll секунд, пока задача выполняется;
+        если она вернула True, задача не запускается или рабочий процесс завершается — вызывается SandboxCancelled.
+        Вызывает SandboxTimeout или SandboxMemoryError при превышении ограничений limits
+        и SandboxError, если функция завершилась исключением или процесс упал.
+        """
+        if should_cancel is not None and should_cancel():
+            raise SandboxCancelled('Запуск отменён.', 0.0)
+        self._start()
+        worker = self._acquire()
+        start_time = timeit.default_timer()
+        exitcode = None
+        try:
+            if on_start is not None:
+                on_start(worker.process.pid)
+            try:
+                reply = worker.call(func, args, limits, should_cancel, cancel_poll)
+            except (EOFError, OSError):
+                worker.process.join(timeout=1)
+                exitcode = worker.process.exitcode
+                reply = ('crash', f'Процесс выполнения скрипта аварийно завершился (код {exitcode}).', True, None)
+            status, payload, retire, snapshot = reply
+            if snapshot is not None:
+                worker.report = snapshot
+            with self._lock:
+                self.tasks += 1
+                self.recycled += retire and status == 'ok'
+                self.crashed += status == 'crash'
+                self.killed += status in (STATUS_TIMEOUT, STATUS_OOM, STATUS_CANCELLED)
+            if retire:
+                worker = self._replace(worker)
+        finally:
+            self._idle.put(worker)
+        elapsed = timeit.default_timer() - start_time
+        if status == STATUS_TIMEOUT:
+            raise SandboxTimeout(payload, elapsed)
+        if status == STATUS_OOM:
+            raise SandboxMemoryError(payload, elapsed)
+        if status == STATUS_CANCELLED:
+            raise SandboxCancelled(payload, elapsed)
+        if status != 'ok':
+            raise SandboxError(payload, elapsed, exitcode)
+        return payload
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle = queue.Queue()
+            self._context = None
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': self.size,
+                'started': len(self._workers),
+                'tasks': self.tasks,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'killed': self.killed,
+                'max_tasks': self.max_tasks,
+                'max_rss_mb': self.max_rss_mb,
+            }
+
+    def report_stats(self) -> Dict[str, float]:
+        """
+        Сумма последних счётчиков report по рабочим процессам (и накопленных cumulative по заменённым).
+        """
+        with self._lock:
+            total = dict(self._retired_report)
+            for worker in self._workers:
+                for key, value in (worker.report or {}).items():
+                    total[key] = total.get(key, 0) + value
+            total['workers'] = sum(1 for worker in self._workers if worker.report is not None)
+        return total
+
+
+def default_limits() -> RunLimits:
+    """
+    Ограничения запуска пользовательского скрипта из settings (FORECAST_RUN_*; 0 — без ограничения).
+    """
+    return RunLimits(
+        getattr(settings, 'FORECAST_RUN_TIMEOUT', 0) or None,
+        getattr(settings, 'FORECAST_RUN_CPU_SECONDS', 0) or None,
+        getattr(settings, 'FORECAST_RUN_MEMORY_MB', 0) or None,
+    )
+
+
+_default_pool: Optional[SandboxPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool(size: Optional[int] = None) -> SandboxPool:
+    """
+    Пул процесса с параметрами из settings (FORECAST_SANDBOX_*); размер по умолчанию —
+    FORECAST_SANDBOX_WORKERS (0 — число ядер). size задаёт размер пула при его создании:
+    воркеры очереди заданий создают пул размера FORECAST_JOB_SANDBOX_WORKERS.
+    Рабочие процессы сообщают счётчики своего реестра скомпилированных скриптов (script_cache).
+    """
+    from apps.forecasting.services.script_cache import CUMULATIVE_STATS, registry_stats
+
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SandboxPool(
+                size or getattr(settings, 'FORECAST_SANDBOX_WORKERS', 0) or os.cpu_count() or 1,
+                getattr(settings, 'FORECAST_SANDBOX_MAX_TASKS', SANDBOX_MAX_TASKS),
+                getattr(settings, 'FORECAST_SANDBOX_MAX_RSS_MB', SANDBOX_MAX_RSS_MB),
+                getattr(settings, 'FORECAST_SANDBOX_PRELOAD', PRELOAD_MODULES),
+                report=registry_stats,
+                cumulative=CUMULATIVE_STATS,
+            )
+    return _default_pool
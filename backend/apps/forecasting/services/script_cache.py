@@ -0,0 +1,102 @@
+"""
+Реестр скомпилированных скриптов прогнозирования.
+
+Скрипты идентифицируются SHA-256 исходного кода; в реестре хранится объект кода,
+поэтому повторный запуск того же скрипта (на другом наборе данных или в новом запросе)
+не требует временных файлов, импорта и повторной компиляции. Реестр свой в каждом процессе;
+скрипты компилируются в процессах песочницы, и их счётчики собирает пул (registry_stats).
+"""
+import hashlib
+import threading
+import types
+from collections import OrderedDict
+from typing import Dict
+
+# Ограничения реестра: число скриптов и суммарный размер их исходного кода
+SCRIPT_CACHE_MAX_ENTRIES = 256
+SCRIPT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Счётчики, которые накапливаются за время жизни процесса (остальные — текущее состояние)
+CUMULATIVE_STATS = ('hits', 'misses')
+
+
+def script_hash(source: bytes) -> str:
+    return hashlib.sha256(source).hexdigest()
+
+
+class ScriptRegistry:
+    """
+    LRU-кэш объектов кода, ключ — SHA-256 исходного кода.
+    Записи вытесняются, когда превышено число записей или суммарный размер исходников.
+    """
+    def __init__(self, max_entries: int = SCRIPT_CACHE_MAX_ENTRIES, max_bytes: int = SCRIPT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # hash -> (код, размер исходника)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_code(self, source: bytes, name: str = '<script>') -> types.CodeType:
+        """
+        Возвращает объект кода для исходника, компилируя его только при промахе.
+        Ошибки компиляции (SyntaxError) пробрасываются и не кэшируются.
+        """
+        key = script_hash(source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        code = compile(source, name, 'exec')
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (code, len(source))
+                self._size += len(source)
+                self._evict()
+        return code
+
+    def load_module(self, source: bytes, name: str = '<script>') -> types.ModuleType:
+        """
+        Создаёт новый экземпляр модуля из кэшированного объекта кода.
+        Каждый вызов получает собственное пространство имён, поэтому запуски не влияют друг на друга.
+        """
+        code = self.get_code(source, name)
+        module = types.ModuleType(f'forecast_script_{script_hash(source)[:16]}')
+        module.__file__ = name
+        exec(code, module.__dict__)
+        return module
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._size -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+
+registry = ScriptRegistry()
+
+
+def registry_stats() -> Dict[str, int]:
+    """
+    Счётчики реестра текущего процесса; вызывается в рабочих процессах песочницы (SandboxPool report).
+    """
+    return registry.stats()
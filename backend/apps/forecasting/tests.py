@@ -40,3 +40,734 @@ def test_update_and_delete_timeseries(auth_client):
     del_resp = auth_client.delete(reverse('timeseries-detail', args=[ts_id]))
     assert del_resp.status_code == 204
 
+NAIVE_SCRIPT = b'''
+def forecast(data):
+    return {'forecast': [
+        {'ds': d.strftime('%Y-%m-%d %H:%M:%S'), 'yhat': float(v)} for d, v in zip(data['ds'], data['y'])
+    ]}
+'''
+
+def make_script(name='naive.py', source=NAIVE_SCRIPT):
+    file = io.BytesIO(source)
+    file.name = name
+    return file
+
+@pytest.fixture
+def series(auth_client):
+    file = io.BytesIO(b'ds,y\n2021-01-01,10\n2021-01-02,15\n2021-01-03,12\n2021-01-04,18\n')
+    file.name = 'series.csv'
+    resp = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart')
+    assert resp.status_code == 201
+    return resp.json()['id']
+
+@pytest.mark.django_db
+def test_job_submit_claim_and_status(auth_client, series):
+    from apps.forecasting.models import ForecastRun
+    from apps.forecasting.services.jobs import claim_next_job, execute_job
+    resp = auth_client.post(reverse('forecast-jobs'), {
+        'scripts': [make_script()], 'timeseries_ids': str(series)
+    }, format='multipart')
+    assert resp.status_code == 202
+    job_id = resp.json()['job_id']
+    assert auth_client.get(reverse('forecast-job-detail', args=[job_id])).json()['status'] == 'queued'
+
+    job = claim_next_job('test-worker')
+    assert job.id == job_id and job.status == 'running'
+    assert claim_next_job('test-worker') is None
+    execute_job(job)
+
+    status_resp = auth_client.get(reverse('forecast-job-detail', args=[job_id])).json()
+    assert status_resp['status'] == 'done'
+    assert status_resp['result'][str(series)][0]['metrics']['MAE'] == 0
+    assert ForecastRun.objects.filter(timeseries_id=series).count() == 1
+
+@pytest.mark.django_db
+def test_stale_running_jobs_are_requeued_then_failed(auth_client, series, settings):
+    from datetime import timedelta
+    from django.utils import timezone
+    from apps.forecasting.models import ForecastJob
+    from apps.forecasting.services.jobs import claim_next_job, execute_job
+    settings.FORECAST_JOB_MAX_ATTEMPTS = 2
+    auth_client.post(reverse('forecast-jobs'), {'scripts': [make_script()], 'timeseries_ids': str(series)}, format='multipart')
+    expire = lambda: ForecastJob.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+    lost = claim_next_job('crashed-worker')
+    assert claim_next_job('other-worker') is None
+    expire()
+    job = claim_next_job('other-worker')
+    assert job.pk == lost.pk and job.attempts == 2
+    # Воркер, потерявший аренду, не перезаписывает задание
+    execute_job(lost)
+    assert ForecastJob.objects.get(pk=job.pk).status == 'running'
+
+    expire()
+    assert claim_next_job('third-worker') is None
+    failed = ForecastJob.objects.get(pk=job.pk)
+    assert failed.status == 'failed' and 'попыток' in failed.error
+
+@pytest.mark.django_db
+def test_benchmark_grid_runs_in_parallel_and_keeps_order(auth_client, series):
+    from apps.forecasting.models import ForecastRun
+    csv_file = io.BytesIO(b'when,value\n2021-01-01,1\n2021-01-02,2\n')
+    csv_file.name = 'extra.csv'
+    broken = make_script('broken.py', b'def forecast(data):\n    raise RuntimeError("boom")\n')
+    resp = auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script('a.py'), broken, make_script('c.py')],
+        'timeseries_ids': str(series),
+        'data_files': [csv_file],
+        'selected_csv_columns': json.dumps({'extra.csv': {'date': 'when', 'numeric': 'value'}}),
+        'max_parallelism': '2',
+    }, format='multipart')
+    assert resp.status_code == 200
+    results = resp.json()['results']
+    assert list(results) == [str(series), 'extra.csv']
+    for key in results:
+        assert [r['script'] for r in results[key]] == ['a.py', 'broken.py', 'c.py']
+        assert 'error' in results[key][1]
+    runs = ForecastRun.objects.order_by('id')
+    assert [(r.timeseries_id, r.script_name) for r in runs] == [
+        (series, 'a.py'), (series, 'c.py'), (None, 'a.py'), (None, 'c.py')
+    ]
+
+def test_script_registry_reuses_compiled_code_and_evicts():
+    from apps.forecasting.services.script_cache import ScriptRegistry
+    reg = ScriptRegistry(max_entries=2)
+    first = reg.load_module(b'X = []\n', 'a.py')
+    second = reg.load_module(b'X = []\n', 'a.py')
+    assert first is not second and first.X is not second.X
+    assert (reg.hits, reg.misses) == (1, 1)
+    reg.get_code(b'Y = 1\n')
+    reg.get_code(b'Z = 2\n')
+    assert reg.stats()['entries'] == 2
+    reg.get_code(b'X = []\n')
+    assert reg.misses == 4
+
+@pytest.mark.django_db
+def test_forecast_run_from_csv_uses_script_cache(auth_client):
+    from apps.forecasting.services.script_cache import registry
+    registry.clear()
+    before = auth_client.get(reverse('script-cache-stats')).json()
+    for _ in range(2):
+        csv_file = io.BytesIO(b'when,value\n2021-01-01 06:00:00,1\n2021-01-01 18:00:00,3\n')
+        csv_file.name = 'hourly.csv'
+        resp = auth_client.post(reverse('forecast-run'), {
+            'scripts': [make_script()], 'data_file': csv_file,
+            'date_column': 'when', 'numeric_column': 'value',
+        }, format='multipart')
+        assert resp.status_code == 200
+        assert resp.json()['results'][0]['metrics']['MAE'] == 0
+    stats = auth_client.get(reverse('script-cache-stats')).json()
+    # Скрипт проверяется и выполняется только в процессах песочницы, веб-процесс его не компилирует;
+    # счётчики — сумма по рабочим процессам: одна компиляция на процесс, остальные обращения — попадания
+    assert (registry.hits, registry.misses) == (0, 0)
+    assert stats['sandbox']['tasks'] - before['sandbox']['tasks'] == 3
+    hits, misses = stats.get('hits', 0) - before.get('hits', 0), stats.get('misses', 0) - before.get('misses', 0)
+    assert hits + misses == 3 and misses <= stats['workers'] and stats['entries'] >= 1
+
+@pytest.mark.django_db
+def test_template_check_runs_once_per_script_hash(auth_client, series, monkeypatch):
+    from apps.forecasting.models import ScriptValidation
+    from apps.forecasting.services import runner
+    bad = b'def forecast(data):\n    return {"forecast": []}\n'
+    post = lambda: auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script('a.py'), make_script('bad.py', bad)],
+        'timeseries_ids': str(series), 'max_parallelism': '1',
+    }, format='multipart').json()['results'][str(series)]
+    first = post()
+    assert 'metrics' in first[0] and 'шаблону' in first[1]['error']
+    assert sorted(ScriptValidation.objects.values_list('passed', flat=True)) == [False, True]
+
+    def fail(script):
+        raise AssertionError('проверка должна браться из ScriptValidation')
+    monkeypatch.setattr(runner, 'inspect_script', fail)
+    second = post()
+    assert 'metrics' in second[0] and second[1]['error'] == first[1]['error']
+
+@pytest.mark.django_db
+def test_resource_failures_during_check_are_not_persisted(settings):
+    from apps.forecasting.models import ScriptValidation
+    from apps.forecasting.services.executor import ScriptSource
+    from apps.forecasting.services.runner import ensure_verdicts
+    from apps.forecasting.services.script_cache import script_hash
+    settings.FORECAST_RUN_MEMORY_MB = 256
+    hungry = ScriptSource('hungry.py', NAIVE_SCRIPT + b'BLOB = bytearray(8 * 1024 ** 3)\n')
+    crashing = ScriptSource('exit.py', NAIVE_SCRIPT + b'import os\nos._exit(3)\n')
+    verdicts = ensure_verdicts([hungry, crashing])
+    assert 'лимит памяти' in verdicts[script_hash(hungry.source)]
+    assert 'аварийно' in verdicts[script_hash(crashing.source)]
+    # Ни нехватка памяти, ни падение процесса не становятся постоянным вердиктом для хэша скрипта
+    assert not ScriptValidation.objects.exists()
+
+def test_metrics_align_on_timestamps_and_match_sklearn():
+    import numpy as np
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from apps.forecasting.services.metrics import score_forecast
+    hour = 3600 * 10 ** 9
+    actual_ds = np.arange(6) * hour  # почасовые данные в пределах одних суток
+    actual_y = np.array([1.0, 2.0, 4.0, 3.0, 5.0, 6.0])
+    forecast_ds = np.array([5, 4, 3, 2, 1, 0, 7]) * hour  # в обратном порядке и с точкой в будущем
+    forecast_yhat = np.array([5.5, 5.0, 3.5, 3.0, 2.0, 1.5, 9.0])
+    matched, metrics = score_forecast(actual_ds, actual_y, forecast_ds, forecast_yhat)
+    assert matched == 6
+    yhat = forecast_yhat[:6][::-1]
+    assert np.isclose(metrics['MAE'], mean_absolute_error(actual_y, yhat))
+    assert np.isclose(metrics['RMSE'], np.sqrt(mean_squared_error(actual_y, yhat)))
+    assert np.isclose(metrics['R2'], r2_score(actual_y, yhat))
+    assert np.isclose(metrics['MASE'], metrics['MAE'] / np.abs(np.diff(actual_y)).mean())
+    assert metrics['MAPE'] > 0 and metrics['sMAPE'] > 0
+
+@pytest.mark.django_db
+def test_result_cache_is_opt_in_and_skips_nondeterministic(auth_client, series, monkeypatch):
+    from django.core.cache import caches
+    from apps.forecasting.services import runner
+    from apps.forecasting.services.script_cache import registry
+    caches['forecast_results'].clear()
+    registry.clear()
+    random_script = NAIVE_SCRIPT + b'\nDETERMINISTIC = False\n'
+    post = lambda **extra: auth_client.post(reverse('benchmark'), dict({
+        'scripts': [make_script('a.py'), make_script('rand.py', random_script)],
+        'timeseries_ids': str(series), 'max_parallelism': '1',
+    }, **extra), format='multipart').json()['results'][str(series)]
+    assert not any(r.get('cached') for r in post())
+    first = post(use_cache='true')
+    assert not any(r.get('cached') for r in first)
+
+    calls = []
+    execute = runner.sandboxed
+    monkeypatch.setattr(runner, 'sandboxed', lambda func, script, *a, **kw: calls.append(script.name) or execute(func, script, *a, **kw))
+    second = post(use_cache='true')
+    assert second[0]['cached'] and second[0]['forecast'] == first[0]['forecast']
+    assert not second[1].get('cached')
+
+    resp = auth_client.post(reverse('forecast-run'), {
+        'scripts': [make_script('a.py'), make_script('rand.py', random_script)],
+        'timeseries_id': series, 'use_cache': 'true',
+    }, format='multipart').json()['results']
+    assert resp[0]['cached'] and calls == ['rand.py']
+    # DETERMINISTIC читается при проверке в песочнице, веб-процесс код скриптов не выполняет
+    assert registry.stats()['misses'] == 0
+
+def test_forecast_storage_roundtrip_is_compact():
+    import numpy as np
+    from apps.forecasting.services.forecast_storage import HEADER, decode_forecast, encode_forecast
+    day = 86400 * 10 ** 9
+    ds = np.datetime64('2021-01-01', 'ns').astype('i8') + np.arange(365) * day
+    blob = encode_forecast(ds, np.arange(365, dtype='float64'))
+    assert len(blob) == HEADER.size + 364 + 365 * 4  # однобайтовые шаги и float32 без потерь
+    back_ds, back_y = decode_forecast(blob)
+    assert np.array_equal(back_ds, ds) and np.array_equal(back_y, np.arange(365))
+    irregular = np.array([5, 1, 2], dtype='i8') * day + 7
+    values = np.array([0.1, 0.2, 0.3])
+    back_ds, back_y = decode_forecast(encode_forecast(irregular, values))
+    assert np.array_equal(back_ds, np.sort(irregular)) and np.array_equal(back_y, values[[1, 2, 0]])
+
+@pytest.mark.django_db
+def test_forecast_run_output_is_served_from_storage(auth_client, series):
+    from apps.forecasting.models import ForecastRun
+    from apps.forecasting.services.forecast_storage import decode_forecast
+    results = auth_client.post(reverse('forecast-run'), {
+        'scripts': [make_script()], 'timeseries_id': series,
+    }, format='multipart').json()['results']
+    run = ForecastRun.objects.get()
+    resp = auth_client.get(reverse('forecast-run-output', args=[run.id]))
+    assert resp.status_code == 200
+    body = json.loads(b''.join(resp.streaming_content))
+    assert body['script_name'] == 'naive.py' and body['forecast'] == results[0]['forecast']
+    raw = auth_client.get(reverse('forecast-run-output', args=[run.id]), HTTP_ACCEPT='application/octet-stream')
+    assert len(decode_forecast(raw.content)[0]) == 4
+
+@pytest.mark.django_db
+def test_benchmark_streams_ndjson_lines(auth_client, series):
+    from apps.forecasting.models import ForecastRun
+    resp = auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script('a.py'), make_script('b.py')],
+        'timeseries_ids': f'{series},999999', 'max_parallelism': '2',
+    }, format='multipart', HTTP_ACCEPT='application/x-ndjson')
+    assert resp.status_code == 200 and resp['Content-Type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+    assert lines[0] == {'dataset': '999999', 'error': 'Неверный timeseries_id.'}
+    assert sorted((l['dataset'], l['script']) for l in lines[1:]) == [(str(series), 'a.py'), (str(series), 'b.py')]
+    assert all(l['metrics']['MAE'] == 0 for l in lines[1:])
+    assert ForecastRun.objects.count() == 2
+
+@pytest.mark.django_db
+def test_benchmark_results_paginate_and_aggregate(auth_client, series):
+    from django.contrib.auth.models import User
+    from apps.forecasting.models import ForecastRun
+    user = User.objects.get(username='tsuser')
+    for i, (script, mae) in enumerate([('a.py', 1.0), ('a.py', 3.0), ('b.py', 2.0)]):
+        ForecastRun.objects.create(user=user, timeseries_id=series, script_name=script, mae=mae, r2=i / 10)
+    first = auth_client.get(reverse('benchmark-results'), {'page_size': 2}).json()
+    assert [r['script_name'] for r in first['results']] == ['b.py', 'a.py'] and first['next']
+    second = auth_client.get(first['next']).json()
+    assert len(second['results']) == 1 and second['next'] is None
+
+    summary = auth_client.get(reverse('benchmark-results'), {'group_by': 'script_name'}).json()['results']
+    a = summary[0]
+    assert a['group'] == 'a.py' and a['runs'] == 2
+    assert a['metrics']['MAE'] == {'mean': 2.0, 'min': 1.0, 'max': 3.0}
+    assert a['best_value'] == 1.0
+    csv_runs = [ForecastRun.objects.create(user=user, csv_file_name='x.csv', script_name='c.py', mae=4.0, r2=r2)
+                for r2 in (0.4, 0.5)]
+    best_r2 = auth_client.get(reverse('benchmark-results'), {'group_by': 'timeseries', 'rank_by': 'R2'}).json()['results']
+    assert best_r2[0]['best_value'] == 0.2 and best_r2[0]['timeseries_name'] == 's'
+    # Запуски по CSV-файлам образуют группу без ряда, и у неё тоже есть лучший запуск
+    assert best_r2[1]['group'] is None and best_r2[1]['runs'] == 2
+    assert (best_r2[1]['best_run'], best_r2[1]['best_value']) == (csv_runs[1].pk, 0.5)
+    assert auth_client.get(reverse('benchmark-results'), {'group_by': 'user'}).status_code == 400
+
+@pytest.mark.django_db
+def test_forecast_run_metric_queries_use_indexes(auth_client, series):
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from apps.forecasting.models import ForecastRun
+    if connection.vendor != 'postgresql':
+        pytest.skip('EXPLAIN проверяется только на PostgreSQL')
+    user = User.objects.get(username='tsuser')
+    auth_client.post(reverse('forecast-run'), {'scripts': [make_script()], 'timeseries_id': series}, format='multipart')
+    run = ForecastRun.objects.get()
+    assert run.mae == 0 and run.metrics.count() == 0  # метрики легли в колонки
+    assert {m['name'] for m in auth_client.get(reverse('benchmark-results')).json()['results'][0]['metrics']} >= {'MAE', 'RMSE', 'duration'}
+
+    other = auth_client.post(reverse('timeseries-list'), {
+        'name': 'other', 'data_file': make_script('o.csv', b'ds,y\n2021-01-01,1\n'), 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart').json()['id']
+    ForecastRun.objects.bulk_create([ForecastRun(user=user, timeseries_id=other, script_name='x.py', rmse=i) for i in range(2000)])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE forecasting_forecastrun')
+        # На маленькой таблице планировщик выбирает seq scan, запрещаем его для проверки плана
+        cursor.execute('SET enable_seqscan = off')
+    rmse_plan = ForecastRun.objects.filter(user=user, timeseries_id=series).order_by('created_at').values('created_at', 'rmse').explain()
+    assert 'Index Only Scan using forecastrun_user_ts_created' in rmse_plan
+    page_plan = ForecastRun.objects.filter(user=user).order_by('-created_at', '-id').explain()
+    assert 'forecastrun_user_created' in page_plan
+
+@pytest.mark.django_db
+def test_forecast_run_uses_requested_range(auth_client, series):
+    resp = auth_client.post(reverse('forecast-run'), {
+        'scripts': [make_script()], 'timeseries_id': series, 'start': '2021-01-02', 'end': '2021-01-04',
+    }, format='multipart').json()['results'][0]
+    assert [p['ds'][:10] for p in resp['forecast']] == ['2021-01-02', '2021-01-03']
+    bench = auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script()], 'timeseries_ids': str(series), 'freq': '2D', 'agg': 'max', 'max_parallelism': '1',
+    }, format='multipart').json()['results'][str(series)][0]
+    assert [p['yhat'] for p in bench['forecast']] == [15.0, 18.0]
+    assert auth_client.post(reverse('forecast-run'), {
+        'scripts': [make_script()], 'timeseries_id': series, 'freq': 'bogus',
+    }, format='multipart').status_code == 400
+
+FUTURE_SCRIPT = b'''
+import pandas as pd
+
+def forecast(data):
+    last = data['ds'].max()
+    future = pd.date_range(last + pd.Timedelta(days=1), periods=3, freq='D')
+    history = [{'ds': d.strftime('%Y-%m-%d'), 'yhat': float(v)} for d, v in zip(data['ds'], data['y'])]
+    return {'forecast': history + [{'ds': d.strftime('%Y-%m-%d'), 'yhat': 20.0} for d in future]}
+'''
+
+@pytest.mark.django_db
+def test_appended_actuals_rescore_stored_forecasts(auth_client, series):
+    from apps.forecasting.models import ForecastRun
+    auth_client.post(reverse('forecast-run'), {
+        'scripts': [make_script('future.py', FUTURE_SCRIPT)], 'timeseries_id': series,
+    }, format='multipart')
+    run = ForecastRun.objects.get()
+    assert run.forecast_end.date().isoformat() == '2021-01-07'
+    append = lambda points: auth_client.post(reverse('timeseries-append', args=[series]), {'points': points}, format='json')
+    append([{'ds': '2021-01-05', 'y': 22}, {'ds': '2021-01-06', 'y': 16}])
+    append([{'ds': '2021-01-07', 'y': 20}, {'ds': '2021-01-10', 'y': 1}])
+    accuracy = auth_client.get(reverse('forecast-run-accuracy', args=[run.id])).json()
+    assert accuracy['points'] == 3
+    assert accuracy['metrics']['MAE'] == pytest.approx(2.0)
+    assert accuracy['metrics']['RMSE'] == pytest.approx((20 / 3) ** 0.5)
+    assert accuracy['metrics']['R2'] == pytest.approx(1 - 20 / (22 ** 2 + 16 ** 2 + 20 ** 2 - 58 ** 2 / 3))
+    assert [h['points'] for h in accuracy['history']] == [2, 3]
+
+LAST_VALUE_SCRIPT = b'''
+import pandas as pd
+
+def forecast(data):
+    future = pd.date_range(data['ds'].max() + pd.Timedelta(days=1), periods=2, freq='D')
+    return {'forecast': [{'ds': d.strftime('%Y-%m-%d'), 'yhat': float(data['y'].iloc[-1])} for d in future]}
+'''
+
+@pytest.mark.django_db
+def test_benchmark_rolling_origin_backtest(auth_client):
+    from apps.forecasting.models import BacktestFold, ForecastRun
+    from apps.forecasting.services.backtest import BacktestSpec, fold_bounds
+    assert fold_bounds(10, BacktestSpec('sliding', 2, 2, 3, 3)) == [(1, 4, 6), (3, 6, 8), (5, 8, 10)]
+    with pytest.raises(ValueError):
+        fold_bounds(5, BacktestSpec('expanding', 2, 2, 3, None))
+
+    csv_file = io.BytesIO(b'ds,y\n' + b''.join(b'2021-01-%02d,%d\n' % (i + 1, i) for i in range(10)))
+    csv_file.name = 'long.csv'
+    resp = auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script('last.py', LAST_VALUE_SCRIPT)],
+        'data_files': [csv_file],
+        'selected_csv_columns': json.dumps({'long.csv': {'date': 'ds', 'numeric': 'y'}}),
+        'backtest': 'expanding', 'horizon': '2', 'folds': '3', 'max_parallelism': '2',
+    }, format='multipart')
+    assert resp.status_code == 200
+    result = resp.json()['results']['long.csv'][0]
+    # Каждый фолд прогнозирует последним значением обучающего участка: ошибки 1 и 2
+    assert [fold['test_start'] for fold in result['folds']] == ['2021-01-05 00:00:00', '2021-01-07 00:00:00', '2021-01-09 00:00:00']
+    assert all(fold['train_start'] == '2021-01-01 00:00:00' for fold in result['folds'])
+    assert result['metrics']['MAE'] == pytest.approx(1.5)
+    assert [p['yhat'] for p in result['forecast']] == [3.0, 3.0, 5.0, 5.0, 7.0, 7.0]
+
+    run = ForecastRun.objects.get()
+    assert run.backtest['mode'] == 'expanding' and run.mae == pytest.approx(1.5)
+    assert list(BacktestFold.objects.filter(run=run).values_list('fold', 'mae')) == [(0, 1.5), (1, 1.5), (2, 1.5)]
+    assert auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script()], 'timeseries_ids': '1', 'backtest': 'sliding', 'horizon': '2',
+    }, format='multipart').status_code == 400
+
+def test_sandbox_tasks_map_shared_dataset_files():
+    import os
+    import numpy as np
+    from apps.forecasting.services.executor import ScriptSource, run_task, shared_datasets
+    from apps.forecasting.services.sandbox import SandboxPool
+    ds = np.arange(10, dtype='i8') * 86_400 * 10 ** 9
+    y = np.arange(10, dtype='float64')
+    script = ScriptSource('last.py', LAST_VALUE_SCRIPT)
+    pool = SandboxPool(1)
+    try:
+        with shared_datasets({'long.csv': (ds, y)}) as paths:
+            # Процессу передаются только пути к файлам набора, а не сами массивы
+            assert all(isinstance(path, str) and os.path.exists(path) for path in paths['long.csv'])
+            result = pool.run(run_task, script, *paths['long.csv'], True, 0, (0, 4, 6))
+        assert not any(os.path.exists(path) for path in paths['long.csv'])
+    finally:
+        pool.shutdown()
+    assert result['forecast'] == run_task(script, ds, y, True, 0, (0, 4, 6))['forecast']
+    assert result['test_start'] == '1970-01-05 00:00:00' and result['metrics']['MAE'] == pytest.approx(1.5)
+
+def test_baselines_fit_a_batch_of_series():
+    import numpy as np
+    from apps.forecasting.services.forecast import BASELINES, forecast_batch
+    t = np.arange(28, dtype='float64')
+    Y = np.stack([10 + 2 * t, 5 + 3 * np.tile([0, 1, 2, 3, 2, 1, 0], 4)])
+    for name, model in BASELINES.items():
+        fitted, future = model(Y, 7, 7)
+        assert fitted.shape == Y.shape and future.shape == (2, 7)
+    assert BASELINES['drift'](Y, 2, 7)[1][0].tolist() == [66.0, 68.0]
+    assert BASELINES['seasonal_naive'](Y, 7, 7)[1][1].tolist() == Y[1, -7:].tolist()
+    assert BASELINES['holt'](Y, 2, 1)[1][0] == pytest.approx([66.0, 68.0])
+
+    ds = np.arange(28, dtype='int64') * 86_400 * 10 ** 9
+    outputs = forecast_batch('holt_winters', [(ds, Y[1]), (ds[:5], Y[1, :5])], horizon=3)
+    future_ds, yhat = outputs[0]
+    assert future_ds[-1] == ds[-1] + 3 * 86_400 * 10 ** 9
+    assert yhat[-3:] == pytest.approx(Y[1, :3], abs=1e-6)
+    assert isinstance(outputs[1], str)
+
+    # Календарные месяцы: будущие даты строятся по частоте ряда, а не по медианному шагу
+    import pandas as pd
+    months = pd.date_range('2021-01-31', periods=12, freq='ME').to_numpy(dtype='datetime64[ns]').view('i8')
+    future_ds, _ = forecast_batch('naive', [(months, t[:12])], horizon=2)[0]
+    assert pd.DatetimeIndex(future_ds[-2:]).strftime('%Y-%m-%d').tolist() == ['2022-01-31', '2022-02-28']
+
+@pytest.mark.django_db
+def test_benchmark_backtest_of_builtin_model_on_monthly_series(auth_client):
+    csv_file = io.BytesIO(b'ds,y\n' + b''.join(b'2021-%02d-01,%d\n' % (i + 1, i) for i in range(12)))
+    csv_file.name = 'monthly.csv'
+    resp = auth_client.post(reverse('benchmark'), {
+        'models': 'naive', 'data_files': [csv_file],
+        'selected_csv_columns': json.dumps({'monthly.csv': {'date': 'ds', 'numeric': 'y'}}),
+        'backtest': 'expanding', 'horizon': '2', 'folds': '3',
+    }, format='multipart')
+    assert resp.status_code == 200
+    result = resp.json()['results']['monthly.csv'][0]
+    # Прогноз фолда совпадает по датам с началами месяцев отложенного участка
+    assert 'error' not in result and result['metrics']['MAE'] == pytest.approx(1.5)
+    assert [fold['test_start'] for fold in result['folds']] == ['2021-07-01 00:00:00', '2021-09-01 00:00:00', '2021-11-01 00:00:00']
+
+@pytest.mark.django_db
+def test_benchmark_series_model_without_date_overlap_is_a_pair_error(auth_client, monkeypatch):
+    import numpy as np
+    from apps.forecasting.services import forecast
+
+    def shifted(ds, y, horizon, step, key=None):
+        # Прогноз на полшага позже каждой даты: ни одна дата не совпадает с фактами
+        future = ds[-1] + step * np.arange(1, horizon + 1)
+        return np.concatenate([ds, future]) + step // 2, np.zeros(len(ds) + horizon), {'model_cache_hit': 0.0}
+
+    monkeypatch.setitem(forecast.SERIES_MODELS, 'prophet', shifted)
+    csv_file = io.BytesIO(b'ds,y\n' + b''.join(b'2021-01-%02d,%d\n' % (i + 1, i) for i in range(10)))
+    csv_file.name = 'long.csv'
+    resp = auth_client.post(reverse('benchmark'), {
+        'models': 'prophet', 'data_files': [csv_file],
+        'selected_csv_columns': json.dumps({'long.csv': {'date': 'ds', 'numeric': 'y'}}),
+        'backtest': 'expanding', 'horizon': '2', 'folds': '3',
+    }, format='multipart')
+    assert resp.status_code == 200
+    result = resp.json()['results']['long.csv'][0]
+    assert 'не пересекается по датам' in result['error']
+    assert all('не пересекается' in fold['error'] for fold in result['folds'])
+
+def test_ets_grid_search_in_chunks_matches_single_pass(monkeypatch):
+    import numpy as np
+    from apps.forecasting.services import forecast
+    rng = np.random.default_rng(0)
+    Y = 10 + np.tile(np.sin(np.arange(7)), 6) + rng.normal(size=(5, 42))
+    expected = forecast.holt_winters(Y, 7, 7)
+    # Порции по одному ряду и нескольким наборам параметров дают тот же выбор параметров
+    monkeypatch.setattr(forecast, 'ETS_CHUNK_BYTES', 8 * (7 + 6) * 50)
+    fitted, future = forecast.holt_winters(Y, 7, 7)
+    assert np.allclose(fitted, expected[0], equal_nan=True) and np.allclose(future, expected[1])
+
+@pytest.mark.django_db
+def test_benchmark_runs_builtin_models_next_to_scripts(auth_client, series):
+    from apps.forecasting.models import ForecastRun
+    resp = auth_client.post(reverse('benchmark'), {
+        'scripts': [make_script()], 'timeseries_ids': str(series), 'models': 'naive,drift', 'horizon': '2',
+        'max_parallelism': '1',
+    }, format='multipart')
+    assert resp.status_code == 200
+    naive, drift = resp.json()['results'][str(series)][1:]
+    assert naive['script'] == 'naive' and naive['metrics']['MAE'] == pytest.approx((5 + 3 + 6) / 3)
+    assert [p['ds'] for p in drift['forecast'][-2:]] == ['2021-01-05 00:00:00', '2021-01-06 00:00:00']
+    assert drift['forecast'][-1]['yhat'] == pytest.approx(18 + 2 * 8 / 3)
+    assert sorted(ForecastRun.objects.values_list('script_name', flat=True)) == ['drift', 'naive', 'naive.py']
+    assert auth_client.post(reverse('benchmark'), {
+        'timeseries_ids': str(series), 'models': 'oracle',
+    }, format='multipart').status_code == 400
+
+def test_prophet_models_are_cached_and_warm_started(tmp_path):
+    import os
+    import pandas as pd
+    from apps.forecasting.services.forecast import forecast_timeseries
+    from apps.forecasting.services.model_cache import ModelCache
+    cache = ModelCache(str(tmp_path), max_entries=2)
+    frame = pd.DataFrame({'ds': pd.date_range('2021-01-01', periods=40, freq='D'), 'y': [float(i % 7) for i in range(40)]})
+
+    cold = forecast_timeseries(frame, periods=3, series_key='ts-1', version=1, cache=cache)['metrics']
+    hit = forecast_timeseries(frame, periods=3, series_key='ts-1', version=1, cache=cache)['metrics']
+    assert cold['model_cache_hit'] == 0 and hit['model_cache_hit'] == 1
+    assert hit['fit_time'] == 0 and hit['fit_time_saved'] == pytest.approx(cold['fit_time'])
+    assert hit['MAE'] == pytest.approx(cold['MAE'])
+
+    longer = pd.concat([frame, pd.DataFrame({'ds': pd.date_range('2021-02-10', periods=2, freq='D'), 'y': [5.0, 6.0]})])
+    warm = forecast_timeseries(longer, periods=3, series_key='ts-1', version=2, cache=cache)['metrics']
+    assert warm['model_cache_hit'] == 0 and warm['warm_start'] == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+    forecast_timeseries(frame, periods=3, series_key='ts-2', version=1, cache=cache, n_changepoints=5)
+    models = [name for name in os.listdir(tmp_path) if not name.startswith('latest-')]
+    assert len(models) == 2
+
+@pytest.mark.django_db
+def test_benchmark_prophet_reuses_cached_model_per_series_version(auth_client, series, settings, tmp_path, monkeypatch):
+    from apps.forecasting.models import ForecastMetric
+    from apps.forecasting.services import model_cache
+    settings.PROPHET_MODEL_CACHE_DIR = str(tmp_path)
+    monkeypatch.setattr(model_cache, '_default_cache', None)
+    run = lambda: auth_client.post(reverse('benchmark'), {
+        'timeseries_ids': str(series), 'models': 'prophet', 'horizon': '2',
+    }, format='multipart').json()['results'][str(series)][0]['metrics']
+
+    cold, hit = run(), run()
+    assert (cold['model_cache_hit'], hit['model_cache_hit']) == (0, 1) and hit['fit_time'] == 0
+    auth_client.post(reverse('timeseries-append', args=[series]), {'points': [{'ds': '2021-01-05', 'y': 20}]}, format='json')
+    warm = run()
+    assert warm['model_cache_hit'] == 0 and warm['warm_start'] == 1
+    # Показатели кэша сохраняются вместе с запуском
+    assert sorted(ForecastMetric.objects.filter(name='model_cache_hit').values_list('value', flat=True)) == [0, 0, 1]
+    stats = auth_client.get(reverse('model-cache-stats')).json()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+BATCH_SCRIPT = NAIVE_SCRIPT + b'''
+CALLS = []
+
+def forecast_batch(frames):
+    CALLS.append(len(frames))
+    return {key: forecast(frame) for key, frame in frames.items()}
+'''
+
+@pytest.mark.django_db
+def test_batch_forecast_loads_series_once_and_bulk_writes(auth_client, series, django_assert_max_num_queries):
+    from apps.forecasting.models import ForecastMetric, ForecastRun
+    ids = [series]
+    for name in ('store-2', 'store-3'):
+        file = io.BytesIO(b'ds,y\n2021-01-01,1\n2021-01-02,3\n2021-01-03,5\n')
+        file.name = f'{name}.csv'
+        ids.append(auth_client.post(reverse('timeseries-list'), {
+            'name': name, 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+        }, format='multipart').json()['id'])
+
+    with django_assert_max_num_queries(12):
+        resp = auth_client.post(reverse('forecast-batch'), {'search': 'store', 'model': 'drift', 'horizon': '1'}, format='json')
+    assert resp.status_code == 200
+    assert resp.json()['count'] == 2
+    assert resp.json()['results'][str(ids[1])]['forecast'][-1]['yhat'] == pytest.approx(7.0)
+
+    resp = auth_client.post(reverse('forecast-batch'), {
+        'script': make_script('batch.py', BATCH_SCRIPT), 'timeseries_ids': ','.join(map(str, ids)),
+    }, format='multipart')
+    results = resp.json()['results']
+    assert list(results) == [str(i) for i in ids] and all(r['metrics']['MAE'] == 0 for r in results.values())
+    assert ForecastRun.objects.filter(script_name='batch.py').count() == 3
+    assert ForecastMetric.objects.count() == 0
+    assert auth_client.post(reverse('forecast-batch'), {'model': 'drift'}, format='json').status_code == 400
+
+def test_sandbox_isolates_crashes_and_recycles_workers():
+    import os
+    from apps.forecasting.services.sandbox import SandboxError, SandboxPool
+    pool = SandboxPool(1, max_tasks=2, preload=['numpy', 'pandas'])
+    try:
+        # Процессы запускаются только при первой задаче
+        assert pool.stats()['started'] == 0
+        pids = [pool.run(os.getpid) for _ in range(3)]
+        # Процесс заменяется после двух задач
+        assert pids[0] == pids[1] != pids[2] and os.getpid() not in pids
+        with pytest.raises(SandboxError, match='аварийно'):
+            pool.run(os._exit, 3)
+        assert pool.run(os.getpid) != pids[2]
+        assert pool.stats()['recycled'] == 1 and pool.stats()['crashed'] == 1
+    finally:
+        pool.shutdown()
+
+def test_sandbox_pool_starts_workers_on_demand():
+    import os
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from apps.forecasting.services.sandbox import SandboxPool
+    pool = SandboxPool(3, preload=[])
+    try:
+        # Последовательные задачи обходятся одним процессом
+        assert len({pool.run(os.getpid) for _ in range(3)}) == 1 and pool.stats()['started'] == 1
+        with ThreadPoolExecutor(max_workers=5) as threads:
+            list(threads.map(lambda _: pool.run(time.sleep, 0.5), range(5)))
+        # Одновременных задач больше размера пула: процессов не больше size
+        assert pool.stats()['started'] == 3
+    finally:
+        pool.shutdown()
+
+LIMITED_SCRIPTS = {
+    'sleepy.py': b'import time\n',
+    'spinner.py': b'',
+    'hungry.py': b'',
+}
+LIMITED_BODIES = {
+    'sleepy.py': '        time.sleep(60)\n',
+    'spinner.py': '        while True:\n            pass\n',
+    'hungry.py': '        blob = bytearray(8 * 1024 ** 3)\n',
+}
+
+def limited_script(name):
+    # На тестовых данных шаблона (2 точки) скрипт отрабатывает сразу, на ряде — превышает ограничение
+    source = LIMITED_SCRIPTS[name] + (
+        'def forecast(data):\n'
+        '    if len(data) > 2:\n' + LIMITED_BODIES[name] +
+        "    return {'forecast': [{'ds': str(d), 'yhat': 1.0} for d in data['ds']]}\n"
+    ).encode()
+    return make_script(name, source)
+
+@pytest.mark.django_db
+def test_forecast_run_limits_record_timeout_and_oom(auth_client, series, settings):
+    from apps.forecasting.models import ForecastRun
+    settings.FORECAST_RUN_TIMEOUT = 3
+    settings.FORECAST_RUN_CPU_SECONDS = 1
+    settings.FORECAST_RUN_MEMORY_MB = 256
+    resp = auth_client.post(reverse('forecast-run'), {
+        'scripts': [limited_script(name) for name in LIMITED_SCRIPTS] + [make_script()], 'timeseries_id': series,
+    }, format='multipart')
+    assert resp.status_code == 200
+    results = resp.json()['results']
+    assert [r.get('status') for r in results] == ['timeout', 'timeout', 'oom', None]
+    assert 'процессорное время' in results[1]['error'] and 'MAE' in results[3]['metrics']
+    runs = {run.script_name: run for run in ForecastRun.objects.all()}
+    assert {name: run.status for name, run in runs.items()} == {
+        'sleepy.py': 'timeout', 'spinner.py': 'timeout', 'hungry.py': 'oom', 'naive.py': 'done',
+    }
+    assert 2.5 < runs['sleepy.py'].duration < 10 and runs['spinner.py'].duration < 3
+    assert runs['hungry.py'].error.startswith('Превышен лимит памяти') and runs['naive.py'].sandbox_pid is None
+    # Остановленные запуски не попадают в сводку по метрикам
+    summary = auth_client.get(reverse('benchmark-results'), {'group_by': 'script_name'}).json()['results']
+    assert [group['group'] for group in summary] == ['naive.py']
+
+@pytest.mark.django_db(transaction=True)
+def test_cancel_running_forecast_stops_sandbox_worker_in_dispatching_process(auth_client, series):
+    import os
+    import threading
+    import time
+    from django.db import connection
+    from apps.forecasting.models import ForecastRun
+    from apps.forecasting.services.runner import dispatcher_identity
+    seen = {}
+
+    def cancel():
+        # Отмена приходит в другой поток со своим соединением, как запрос в другой процесс
+        client = APIClient()
+        client.force_login(User.objects.get(username='tsuser'))
+        running = ForecastRun.objects.filter(status=ForecastRun.STATUS_RUNNING, sandbox_pid__isnull=False)
+        deadline = time.monotonic() + 30
+        while not running.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        run = running.get()
+        seen.update(pid=run.sandbox_pid, host=run.sandbox_host,
+                    response=client.post(reverse('forecast-run-cancel', args=[run.pk])))
+        connection.close()
+
+    thread = threading.Thread(target=cancel)
+    thread.start()
+    started = time.monotonic()
+    resp = auth_client.post(reverse('forecast-run'), {
+        'scripts': [limited_script('sleepy.py')], 'timeseries_id': series,
+    }, format='multipart')
+    thread.join()
+    # Скрипт спит 60 с: процесс, выполняющий запуск, сам останавливает рабочий процесс песочницы
+    assert time.monotonic() - started < 20
+    assert seen['response'].status_code == 202 and seen['response'].json()['status'] == 'cancelled'
+    assert seen['host'] == dispatcher_identity()
+    with pytest.raises(ProcessLookupError):
+        os.kill(seen['pid'], 0)
+    result = resp.json()['results'][0]
+    assert result['status'] == 'cancelled' and result['error'] == 'Запуск отменён.'
+    run = ForecastRun.objects.get()
+    assert run.status == 'cancelled' and run.sandbox_pid is None and run.sandbox_host == ''
+    assert auth_client.post(reverse('forecast-run-cancel', args=[run.pk])).status_code == 409
+    assert auth_client.post(reverse('forecast-run-cancel', args=[run.pk + 1])).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cancel_running_benchmark_pair_stops_its_sandbox_task(auth_client, series):
+    import threading
+    import time
+    from django.db import connection
+    from apps.forecasting.models import ForecastRun
+    from apps.forecasting.services.runner import dispatcher_identity
+    seen = {}
+
+    def cancel():
+        client = APIClient()
+        client.force_login(User.objects.get(username='tsuser'))
+        running = ForecastRun.objects.filter(status=ForecastRun.STATUS_RUNNING, script_name='sleepy.py')
+        deadline = time.monotonic() + 30
+        while not running.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        run = running.get()
+        seen.update(host=run.sandbox_host, response=client.post(reverse('forecast-run-cancel', args=[run.pk])))
+        connection.close()
+
+    thread = threading.Thread(target=cancel)
+    thread.start()
+    started = time.monotonic()
+    resp = auth_client.post(reverse('benchmark'), {
+        'scripts': [limited_script('sleepy.py'), make_script('a.py')],
+        'timeseries_ids': str(series),
+        'max_parallelism': '2',
+    }, format='multipart')
+    thread.join()
+    # Задачу отменённой пары останавливает процесс, выполняющий бенчмарк; остальные пары завершаются как обычно
+    assert time.monotonic() - started < 20
+    assert seen['response'].status_code == 202 and seen['host'] == dispatcher_identity()
+    sleepy, fast = resp.json()['results'][str(series)]
+    assert sleepy['status'] == 'cancelled' and sleepy['error'] == 'Запуск отменён.'
+    assert 'error' not in fast
+    runs = {r.script_name: r for r in ForecastRun.objects.all()}
+    assert runs['sleepy.py'].status == 'cancelled' and runs['sleepy.py'].sandbox_host == ''
+    assert runs['a.py'].status == 'done'
@@ -1,11 +1,23 @@
 from django.urls import path
-from .views import ForecastRunView, ForecastTemplateView, BenchmarkView, BenchmarkResultsView, GetCsvColumnsView
+from .views import (
+    ForecastRunView, ForecastTemplateView, BenchmarkView, BenchmarkResultsView, GetCsvColumnsView,
+    ForecastJobView, ForecastJobDetailView, ScriptCacheStatsView, ForecastRunOutputView,
+    ForecastRunAccuracyView, ForecastBatchView, ForecastRunCancelView, ModelCacheStatsView,
+)
 
 
 urlpatterns = [
     path('run/', ForecastRunView.as_view(), name='forecast-run'),
     path('template/', ForecastTemplateView.as_view(), name='forecast-template'),
     path('benchmark/', BenchmarkView.as_view(), name='benchmark'),
+    path('batch/', ForecastBatchView.as_view(), name='forecast-batch'),
     path('benchmark-results/', BenchmarkResultsView.as_view(), name='benchmark-results'),
     path('get_csv_columns/', GetCsvColumnsView.as_view(), name='get_csv_columns'),
+    path('jobs/', ForecastJobView.as_view(), name='forecast-jobs'),
+    path('jobs/<int:pk>/', ForecastJobDetailView.as_view(), name='forecast-job-detail'),
+    path('script-cache/', ScriptCacheStatsView.as_view(), name='script-cache-stats'),
+    path('model-cache/', ModelCacheStatsView.as_view(), name='model-cache-stats'),
+    path('runs/<int:pk>/forecast/', ForecastRunOutputView.as_view(), name='forecast-run-output'),
+    path('runs/<int:pk>/accuracy/', ForecastRunAccuracyView.as_view(), name='forecast-run-accuracy'),
+    path('runs/<int:pk>/cancel/', ForecastRunCancelView.as_view(), name='forecast-run-cancel'),
 ]
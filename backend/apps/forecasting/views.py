@@ -1,22 +1,58 @@
 from rest_framework import viewsets, permissions
-from django.http import HttpResponse
-from .models import ForecastRun, ForecastMetric
-from .serializers import ForecastRunSerializer, ForecastMetricSerializer
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from .models import ForecastRun, ForecastMetric, ForecastJob, ForecastAccuracy
+from .serializers import ForecastRunSerializer, ForecastMetricSerializer, ForecastJobSerializer
+from .pagination import BenchmarkResultsPagination
+from .renderers import BinaryRenderer, NDJSONRenderer, ndjson_line
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import generics
 from rest_framework.permissions import AllowAny
-import os, io, tempfile, importlib.util, uuid
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+import os
 import pandas as pd
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import numpy as np
-import timeit, tracemalloc
 from apps.timeseries.models import Timeseries
-from datetime import datetime
+from apps.timeseries.utils.storage import load_many, points_to_frame, query_points
+from apps.timeseries.utils.resample import apply_point_query, parse_point_query
+from apps.timeseries.utils.csv_loader import read_series_csv, CsvValidationError
+from .services.runner import (
+    read_uploaded_scripts, load_timeseries_data, ensure_verdicts, run_scripts, save_result, save_results, cached_results, GridRuns,
+)
+from .services import result_cache
+from .services.executor import (
+    prepare_data, dataset_arrays, iter_grid, run_grid, run_models, default_parallelism, supports_batch, execute_script_batch,
+    sandboxed, sandbox_failure,
+)
+from .services.sandbox import SandboxError, default_limits, default_pool as sandbox_pool
+from .services.forecast import DEFAULT_HORIZON, MODELS
+from .services.model_cache import default_cache as model_cache
+from .services.script_cache import script_hash
+from .services.jobs import submit_job
+from .services.forecast_storage import iter_forecast_records
+from .services.aggregation import GROUP_FIELDS, aggregate_runs
+from .services.online import online_metrics
+from .services.backtest import parse_backtest
 import json
 
 
+def use_result_cache(request) -> bool:
+    """
+    Кэш результатов включается явно параметром use_cache=true.
+    """
+    return str(request.data.get('use_cache', '')).lower() in ('1', 'true', 'yes')
+
+
+def model_series_keys(series: dict, query: dict) -> dict:
+    """
+    Ключи кэша моделей Prophet по ключу набора: ('timeseries:<pk>', версия ряда).
+    Если точки ограничены или передискретизированы запросом, параметры запроса входят в идентификатор.
+    """
+    suffix = json.dumps({k: v for k, v in query.items() if v is not None}, sort_keys=True) if any(query.values()) else ''
+    return {key: (f'timeseries:{ts.pk}{suffix}', ts.version) for key, ts in series.items() if ts is not None}
+
 
 class ForecastRunViewSet(viewsets.ModelViewSet):
     queryset = ForecastRun.objects.all()
@@ -29,12 +65,19 @@ class ForecastMetricViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 class BenchmarkResultsView(generics.ListAPIView):
+    """
+    Запуски пользователя с метриками, постранично (курсор, параметр page_size).
+    С параметром group_by=script_name|timeseries|csv_file_name вместо запусков возвращается
+    сводка по группам, посчитанная в базе: среднее, минимум и максимум метрик и лучший запуск
+    по метрике rank_by (по умолчанию MAE).
+    """
     serializer_class = ForecastRunSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = BenchmarkResultsPagination
 
     def get_queryset(self):
         # Извлекаем все запуски пользователя с их метриками
-        queryset = ForecastRun.objects.filter(user=self.request.user).prefetch_related('metrics')
+        queryset = ForecastRun.objects.filter(user=self.request.user).select_related('timeseries').prefetch_related('metrics')
         
         # Добавляем возможность фильтрации (опционально)
         timeseries_id = self.request.query_params.get('timeseries_id', None)
@@ -43,6 +86,24 @@ class BenchmarkResultsView(generics.ListAPIView):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        group_by = request.query_params.get('group_by')
+        if not group_by:
+            return super().list(request, *args, **kwargs)
+        if group_by not in GROUP_FIELDS:
+            return Response({'error': f'group_by должен быть одним из: {", ".join(GROUP_FIELDS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        rank_by = request.query_params.get('rank_by', 'MAE')
+        if rank_by not in ForecastRun.METRIC_FIELDS:
+            return Response({'error': f'rank_by должен быть одним из: {", ".join(ForecastRun.METRIC_FIELDS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        runs = ForecastRun.objects.filter(user=request.user, status=ForecastRun.STATUS_DONE)
+        timeseries_id = request.query_params.get('timeseries_id')
+        if timeseries_id:
+            runs = runs.filter(timeseries_id=timeseries_id)
+        return Response({'group_by': group_by, 'rank_by': rank_by, 'results': aggregate_runs(runs, group_by, rank_by)},
+                        status=status.HTTP_200_OK)
+
 class GetCsvColumnsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -87,52 +148,19 @@ class ForecastRunView(APIView):
 
         if not scripts:
             return Response({'error': 'Требуются скрипты для прогнозирования.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            query = parse_point_query(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         selected_ts = None
 
         if ts_id:
             try:
                 selected_ts = Timeseries.objects.get(id=ts_id)
-                data = pd.DataFrame(selected_ts.data)
-                date_col = selected_ts.date_column
-                numeric_col = selected_ts.numeric_column
-                
-                if not date_col or not numeric_col:
-                    return Response({'error': 'Не указаны столбцы для дат и значений.'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Проверка существования столбцов
-                if date_col not in data.columns:
-                    return Response({
-                        'error': f"Столбец дат '{date_col}' не найден во временном ряду.",
-                        'requirements': f"Доступные столбцы: {list(data.columns)}"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                if numeric_col not in data.columns:
-                    return Response({
-                        'error': f"Столбец значений '{numeric_col}' не найден во временном ряду.",
-                        'requirements': f"Доступные столбцы: {list(data.columns)}"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Валидация столбца дат
-                try:
-                    data['ds'] = pd.to_datetime(data[date_col])
-                except Exception as e:
-                    return Response({
-                        'error': f"Ошибка в столбце дат '{date_col}': {str(e)}",
-                        'requirements': "Требуемый формат: YYYY-MM-DD, YYYY-MM-DD HH:MM:SS и т.д."
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Валидация числового столбца
-                try:
-                    data['y'] = data[numeric_col].astype(float)
-                except Exception as e:
-                    return Response({
-                        'error': f"Ошибка в столбце значений '{numeric_col}': {str(e)}",
-                        'requirements': "Столбец должен содержать только числовые значения"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                data['ds_str'] = data['ds'].dt.strftime("%Y-%m-%d")
-                
+                data = load_timeseries_data(selected_ts, query)
+                if data.empty:
+                    return Response({'error': 'Временной ряд не содержит данных.'}, status=status.HTTP_400_BAD_REQUEST)
             except Timeseries.DoesNotExist:
                 return Response({'error': 'Временной ряд не найден.'}, status=status.HTTP_404_NOT_FOUND)
         else:
@@ -142,165 +170,84 @@ class ForecastRunView(APIView):
                 return Response({'error': 'Необходимо указать date_column и numeric_column для CSV.'}, status=status.HTTP_400_BAD_REQUEST)
             
             try:
-                content = csv_file.read().decode('utf-8')
-                data = pd.read_csv(io.StringIO(content))
-                
-                # Проверка существования столбцов
-                if date_column not in data.columns:
-                    return Response({
-                        'error': f"Столбец дат '{date_column}' не найден в CSV-файле.",
-                        'requirements': f"Доступные столбцы: {list(data.columns)}"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                if numeric_column not in data.columns:
-                    return Response({
-                        'error': f"Столбец значений '{numeric_column}' не найден в CSV-файле.",
-                        'requirements': f"Доступные столбцы: {list(data.columns)}"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Валидация столбца дат
-                try:
-                    data['ds'] = pd.to_datetime(data[date_column])
-                except Exception as e:
-                    return Response({
-                        'error': f"Ошибка в столбце дат '{date_column}': {str(e)}",
-                        'requirements': "Требуемый формат: YYYY-MM-DD, YYYY-MM-DD HH:MM:SS и т.д."
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Валидация числового столбца
-                try:
-                    data['y'] = data[numeric_column].astype(float)
-                except Exception as e:
-                    return Response({
-                        'error': f"Ошибка в столбце значений '{numeric_column}': {str(e)}",
-                        'requirements': "Столбец должен содержать только числовые значения"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                    
-                data['ds_str'] = data['ds'].dt.strftime("%Y-%m-%d")
-                
+                data = prepare_data(*apply_point_query(*dataset_arrays(read_series_csv(csv_file, date_column, numeric_column)), query))
+            except CsvValidationError as e:
+                return Response({
+                    'error': str(e),
+                    'requirements': "Столбец дат в формате YYYY-MM-DD, YYYY-MM-DD HH:MM:SS и т.д., столбец значений — только числа"
+                }, status=status.HTTP_400_BAD_REQUEST)
             except Exception as e:
                 return Response({'error': f'Ошибка обработки CSV: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
-        results = []
-        for script in scripts:
-            tmp = None  # Инициализируем tmp заранее
-            try:
-                tracemalloc.start()
-                start_time = timeit.default_timer()
-
-                # Создание временного файла для скрипта
-                tmp = tempfile.NamedTemporaryFile(suffix='.py', delete=False)
-                tmp.write(script.read())
-                tmp.seek(0)
-                spec = importlib.util.spec_from_file_location('mod', tmp.name)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-
-                # Проверка наличия функции forecast
-                if not hasattr(module, 'forecast'):
-                    raise ValueError('Нет функции forecast.')
-
-                # Проверка соответствия шаблону на тестовых данных
-                test_data = pd.DataFrame({
-                    'ds': [datetime(2023, 1, 1), datetime(2023, 1, 2)],
-                    'y': [100.0, 110.0]
-                })
-                test_output = module.forecast(test_data.copy())
-                if not isinstance(test_output, dict) or 'forecast' not in test_output:
-                    raise ValueError("Функция должна возвращать словарь с ключом 'forecast'.")
-                forecast_output = test_output['forecast']
-                if not isinstance(forecast_output, list) or not forecast_output:
-                    raise ValueError("Ключ 'forecast' должен содержать непустой список.")
-                for item in forecast_output:
-                    if not isinstance(item, dict) or 'ds' not in item or 'yhat' not in item:
-                        raise ValueError("Каждый элемент прогноза должен быть словарем с ключами 'ds' и 'yhat'.")
-                    if not isinstance(item['ds'], str):
-                        raise ValueError("Поле 'ds' должно быть строкой, конвертируемой в datetime.")
-                    try:
-                        pd.to_datetime(item['ds'])
-                    except ValueError:
-                        raise ValueError("Поле 'ds' должно быть валидной строкой datetime (например, 'YYYY-MM-DD').")
-                    if not isinstance(item['yhat'], (int, float)):
-                        raise ValueError("Поле 'yhat' должно быть числом (int или float).")
-
-                # Выполнение прогноза на реальных данных
-                out = module.forecast(data.copy())
-                if not isinstance(out, dict) or 'forecast' not in out:
-                    raise ValueError("Функция должна возвращать словарь с ключом 'forecast'.")
-                forecast_output = out['forecast']
-                if not isinstance(forecast_output, list) or not all(isinstance(i, dict) and 'ds' in i and 'yhat' in i for i in forecast_output):
-                    raise ValueError("Неверный формат прогноза.")
-
-                # Обработка результатов
-                forecast_df = pd.DataFrame(forecast_output)
-                forecast_df['ds'] = pd.to_datetime(forecast_df['ds'])
-                forecast_df['ds_str'] = forecast_df['ds'].dt.strftime("%Y-%m-%d")
-                merged = pd.merge(data, forecast_df, on='ds_str', how='inner')
-                mae = mean_absolute_error(merged['y'].astype(float), merged['yhat'].astype(float))
-                rmse = np.sqrt(mean_squared_error(merged['y'].astype(float), merged['yhat'].astype(float)))
-                r2 = r2_score(merged['y'].astype(float), merged['yhat'].astype(float))
-
-                duration = timeit.default_timer() - start_time
-                current, peak = tracemalloc.get_traced_memory()
-                tracemalloc.stop()
-
-                # Сохранение результатов в базу
-                run = ForecastRun.objects.create(
-                    user=request.user,
-                    timeseries=selected_ts if ts_id else None,  # Используем selected_ts только если ts_id указан
-                    script_name=script.name,
-                    csv_file_name=csv_file.name if csv_file else None
-                )
-                metrics = [
-                    ('MAE', mae), ('RMSE', rmse), ('R2', r2),
-                    ('duration', duration), ('memory_peak_mb', peak / 1024 / 1024)
-                ]
-                ForecastMetric.objects.bulk_create([ForecastMetric(run=run, name=n, value=v) for n, v in metrics])
-
-                results.append({
-                    'script': script.name,
-                    'forecast': forecast_output,
-                    'metrics': dict(metrics)
-                })
-            except Exception as e:
-                # Очистка ресурсов и запись ошибки
-                tracemalloc.stop()
-                if tmp:  # Проверяем, был ли tmp создан
-                    tmp.close()
-                    try:
-                        os.remove(tmp.name)
-                    except FileNotFoundError:
-                        pass  # Игнорируем, если файл уже удален
-                results.append({
-                    'script': script.name,
-                    'error': str(e)
-                })
-                continue  # Продолжаем обработку следующего скрипта
-            finally:
-                if tmp:  # Очистка в finally только если tmp существует
-                    tmp.close()
-                    try:
-                        os.remove(tmp.name)
-                    except FileNotFoundError:
-                        pass  # Игнорируем, если файл уже удален
-
+        results = run_scripts(read_uploaded_scripts(scripts), data, selected_ts, request.user,
+                              csv_file.name if not ts_id and csv_file else None,
+                              use_cache=use_result_cache(request))
         return Response({'results': results}, status=status.HTTP_200_OK)
     
 
 class BenchmarkView(APIView):
+    """
+    Бенчмарк: все скрипты на всех выбранных рядах и CSV-файлах.
+    Пары (набор данных, скрипт) выполняются на пуле процессов; параметр max_parallelism
+    ограничивает число процессов. Результаты и записи в базу идут в исходном порядке.
+    С use_cache=true пары, уже посчитанные ранее на тех же данных, берутся из кэша результатов.
+    Параметры start, end, freq и agg ограничивают и передискретизируют все наборы данных (см. timeseries.utils.resample).
+
+    С заголовком Accept: application/x-ndjson ответ передаётся потоком: по строке
+    {'dataset', 'script', ...} на каждую пару сразу после её завершения, без сборки всех результатов в памяти.
+
+    С backtest=expanding|sliding (и horizon, step, folds, window) каждая пара оценивается бэктестом
+    со скользящим началом прогноза (services/backtest.py): фолды выполняются параллельно, метрики
+    пары — средние по фолдам, в результате есть список folds с метриками каждого фолда.
+
+    Параметр models — встроенные модели через запятую (services.forecast.MODELS: naive, drift, ses, prophet, ...);
+    они запускаются рядом с загруженными скриптами, их результаты идут после результатов скриптов.
+    Базовая модель считается одним векторным вызовом по всем наборам; horizon — число точек прогноза вперёд.
+    Prophet обучается по каждому ряду и переиспользует модели из кэша по ряду и его версии.
+
+    Пока пары со скриптами выполняются в песочнице, их запуски видны со статусом running
+    и могут быть отменены (ForecastRunCancelView); отменённая пара получает статус cancelled.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
 
     def post(self, request, *args, **kwargs):
-        scripts = request.FILES.getlist('scripts')
+        scripts = read_uploaded_scripts(request.FILES.getlist('scripts'))
+        models = [name for name in request.data.get('models', '').split(',') if name]
         timeseries_ids = request.data.get('timeseries_ids', '').split(',')
         csv_files = request.FILES.getlist('data_files')
         selected_csv_columns = json.loads(request.data.get('selected_csv_columns', '{}'))
         results = {}
 
-        if not scripts:
-            return Response({'error': 'Требуются скрипты.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not scripts and not models:
+            return Response({'error': 'Требуются скрипты или встроенные модели.'}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = [name for name in models if name not in MODELS]
+        if unknown:
+            return Response({'error': f'Неизвестные модели: {", ".join(unknown)}. Доступны: {", ".join(MODELS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
         if not timeseries_ids and not csv_files:
             return Response({'error': 'Требуется timeseries_id или CSV-файл.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            max_parallelism = int(request.data.get('max_parallelism') or getattr(settings, 'FORECAST_MAX_PARALLELISM', 0) or default_parallelism())
+            if max_parallelism < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'max_parallelism должен быть положительным целым числом.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            query = parse_point_query(request.data)
+            backtest = parse_backtest(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            horizon = int(request.data.get('horizon') or DEFAULT_HORIZON)
+            if horizon < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'horizon должен быть положительным целым числом.'}, status=status.HTTP_400_BAD_REQUEST)
+        backtest_params = backtest._asdict() if backtest else None
+
+        # Наборы данных для запуска: ключ результата -> (данные, временной ряд, имя CSV)
+        datasets = {}
 
         # Обработка временных рядов из базы
         for ts_id in timeseries_ids:
@@ -309,17 +256,12 @@ class BenchmarkView(APIView):
             try:
                 ts_id_int = int(ts_id)
                 selected_ts = Timeseries.objects.get(id=ts_id_int)
-                data = pd.DataFrame(selected_ts.data)
-                date_col = selected_ts.date_column
-                numeric_col = selected_ts.numeric_column
-                if not date_col or not numeric_col:
-                    results[str(ts_id_int)] = [{'error': 'Не указаны столбцы.'}]
+                data = points_to_frame(*query_points(selected_ts, query))
+                if data.empty:
+                    results[str(ts_id_int)] = [{'error': 'Временной ряд не содержит данных.'}]
                     continue
-                data['ds'] = pd.to_datetime(data[date_col])
-                data['y'] = data[numeric_col].astype(float)
-                data['ds_str'] = data['ds'].dt.strftime("%Y-%m-%d %H:%M:%S")
-                ts_results = self.run_forecast_for_data(scripts, data, selected_ts, request.user, None)
-                results[str(ts_id_int)] = ts_results
+                results[str(ts_id_int)] = None
+                datasets[str(ts_id_int)] = (data, selected_ts, None)
             except (ValueError, Timeseries.DoesNotExist):
                 results[str(ts_id)] = [{'error': 'Неверный timeseries_id.'}]
 
@@ -333,124 +275,259 @@ class BenchmarkView(APIView):
                 results[file_name] = [{'error': 'Не указаны столбцы для дат и значений.'}]
                 continue
             try:
-                content = csv_file.read().decode('utf-8')
-                data = pd.read_csv(io.StringIO(content))
-                # Валидация столбца с датами
-                try:
-                    data['ds'] = pd.to_datetime(data[date_column])
-                except ValueError:
-                    results[file_name] = [{'error': f"Столбец '{date_column}' не содержит даты."}]
-                    continue
-
-                try:
-                    data['y'] = data[numeric_column].astype(float)
-                except ValueError:
-                    results[file_name] = [{'error': f"Столбец '{numeric_column}' содержит нечисловые значения."}]
-                    continue
-                data['ds_str'] = data['ds'].dt.strftime("%Y-%m-%d %H:%M:%S")
-                ts_results = self.run_forecast_for_data(scripts, data, None, request.user, csv_file.name)
-                results[file_name] = ts_results
+                data = points_to_frame(*apply_point_query(*dataset_arrays(read_series_csv(csv_file, date_column, numeric_column)), query))
+                results[file_name] = None
+                datasets[file_name] = (data, None, file_name)
+            except CsvValidationError as e:
+                results[file_name] = [{'error': str(e)}]
             except Exception as e:
                 results[file_name] = [{'error': f'Ошибка CSV: {str(e)}'}]
 
+        verdicts = ensure_verdicts(scripts) if datasets else {}
+        use_cache = use_result_cache(request)
+        data_hashes = {key: result_cache.dataset_hash(*dataset_arrays(d[0])) for key, d in datasets.items()} if use_cache else {}
+        known = cached_results(scripts, data_hashes, backtest_params) if use_cache else {}
+        frames = {key: d[0] for key, d in datasets.items()}
+        series_keys = model_series_keys({key: d[1] for key, d in datasets.items()}, query)
+        runs = GridRuns(scripts, {key: d[1:] for key, d in datasets.items()}, request.user, backtest_params)
+
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            def stream():
+                for key, result in results.items():
+                    if result is not None:
+                        yield ndjson_line({'dataset': key, **result[0]})
+                for key, index, result in iter_grid(scripts, frames, max_parallelism, verdicts, known, backtest, runs):
+                    result = runs.finish(key, index, result)
+                    if use_cache:
+                        result_cache.store_result(scripts[index], data_hashes[key], result, backtest_params)
+                    yield ndjson_line({'dataset': key, **result})
+                for key, _, result in run_models(models, frames, horizon, backtest, series_keys):
+                    _, selected_ts, csv_file_name = datasets[key]
+                    save_result(result, selected_ts, request.user, csv_file_name, backtest_params)
+                    yield ndjson_line({'dataset': key, **result})
+            return StreamingHttpResponse(stream(), content_type=NDJSONRenderer.media_type)
+
+        grid = run_grid(scripts, frames, max_parallelism, verdicts, known, backtest, runs)
+        for key in datasets:
+            for script, result in zip(scripts, grid[key]):
+                if use_cache:
+                    result_cache.store_result(script, data_hashes[key], result, backtest_params)
+            results[key] = grid[key] + [None] * len(models)
+        for key, index, result in run_models(models, frames, horizon, backtest, series_keys):
+            _, selected_ts, csv_file_name = datasets[key]
+            save_result(result, selected_ts, request.user, csv_file_name, backtest_params)
+            results[key][len(scripts) + index] = result
+
         return Response({'results': results}, status=status.HTTP_200_OK)
 
-    def run_forecast_for_data(self, scripts, data, selected_ts, user, csv_file_name=None):
-        results = []
-        for script in scripts:
-            tracemalloc.start()
-            start_time = timeit.default_timer()
-            script.seek(0)
-            tmp = tempfile.NamedTemporaryFile(suffix='.py', delete=False)
-            tmp.write(script.read())
-            tmp.seek(0)
-            module_name = f'mod_{uuid.uuid4().hex}'
-            spec = importlib.util.spec_from_file_location(module_name, tmp.name)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-
-            if not hasattr(module, 'forecast'):
-                tracemalloc.stop()
-                tmp.close()
-                os.remove(tmp.name)
-                results.append({'script': script.name, 'error': 'Функция forecast отсутствует.'})
-                continue
 
-            try:
-                test_data = pd.DataFrame({'ds': [datetime(2023, 1, 1), datetime(2023, 1, 2)], 'y': [100.0, 110.0]})
-                test_output = module.forecast(test_data.copy())
-                if not isinstance(test_output, dict) or 'forecast' not in test_output:
-                    raise ValueError("Функция должна возвращать словарь с ключом 'forecast'.")
-                forecast_output = test_output['forecast']
-                if not isinstance(forecast_output, list) or not forecast_output:
-                    raise ValueError("Ключ 'forecast' должен содержать непустой список.")
-                for item in forecast_output:
-                    if not isinstance(item, dict) or 'ds' not in item or 'yhat' not in item:
-                        raise ValueError("Каждый элемент должен быть словарем с 'ds' и 'yhat'.")
-                    if not isinstance(item['ds'], str):
-                        raise ValueError("Поле 'ds' должно быть строкой.")
-                    try:
-                        pd.to_datetime(item['ds'])
-                    except ValueError:
-                        raise ValueError("Поле 'ds' должно быть валидной датой.")
-                    if not isinstance(item['yhat'], (int, float)):
-                        raise ValueError("Поле 'yhat' должно быть числом.")
-            except Exception as e:
-                tracemalloc.stop()
-                tmp.close()
-                os.remove(tmp.name)
-                results.append({'script': script.name, 'error': f'Скрипт не соответствует шаблону: {str(e)}'})
-                continue
+class ForecastBatchView(APIView):
+    """
+    Прогноз одним запросом для многих рядов пользователя одним скриптом (файл script)
+    или встроенной моделью (model, см. services.forecast.MODELS).
+
+    Ряды задаются списком timeseries_ids или фильтром: search (подстрока имени) и is_reference.
+    Все ряды загружаются одним запросом (timeseries.utils.storage.load_many), скрипт проверяется
+    на соответствие шаблону один раз. Встроенная модель и скрипт с функцией forecast_batch получают
+    все ряды одним вызовом (словарь id -> DataFrame); скрипт только с forecast выполняется
+    по ряду на задачу, как в бенчмарке. Пользовательский код выполняется в процессах песочницы.
+    Запуски встроенной модели и метрики записываются через bulk_create; запуски скрипта создаются
+    одним bulk_create со статусом running до выполнения и могут быть отменены, как в бенчмарке.
+    Параметры start, end, freq, agg, horizon и max_parallelism — как у BenchmarkView.
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
+    def post(self, request, *args, **kwargs):
+        scripts = read_uploaded_scripts(request.FILES.getlist('script'))
+        model = request.data.get('model') or None
+        if len(scripts) + bool(model) != 1:
+            return Response({'error': 'Требуется ровно один скрипт (script) или встроенная модель (model).'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if model and model not in MODELS:
+            return Response({'error': f'Неизвестная модель: {model}. Доступны: {", ".join(MODELS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Timeseries.objects.filter(author=request.user)
+        ids = request.data.get('timeseries_ids')
+        search = request.data.get('search')
+        is_reference = request.data.get('is_reference')
+        if ids:
             try:
-                out = module.forecast(data.copy())
-                if not isinstance(out, dict) or 'forecast' not in out:
-                    raise ValueError("Функция должна возвращать словарь с ключом 'forecast'.")
-                forecast_output = out['forecast']
-                if not isinstance(forecast_output, list) or not all(isinstance(i, dict) and 'ds' in i and 'yhat' in i for i in forecast_output):
-                    raise ValueError("Неверный формат прогноза.")
-            except Exception as e:
-                tracemalloc.stop()
-                tmp.close()
-                os.remove(tmp.name)
-                results.append({'script': script.name, 'error': f'Ошибка прогноза: {str(e)}'})
-                continue
+                ids = [int(i) for i in (ids.split(',') if isinstance(ids, str) else ids) if str(i)]
+            except (TypeError, ValueError):
+                return Response({'error': 'Неверный timeseries_id.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(pk__in=ids)
+        elif search or is_reference not in (None, ''):
+            if search:
+                queryset = queryset.filter(name__icontains=search)
+            if is_reference not in (None, ''):
+                queryset = queryset.filter(is_reference=str(is_reference).lower() in ('1', 'true', 'yes'))
+        else:
+            return Response({'error': 'Требуется timeseries_ids или фильтр search / is_reference.'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-            forecast_df = pd.DataFrame(forecast_output)
-            forecast_df['ds'] = pd.to_datetime(forecast_df['ds'])
-            forecast_df['ds_str'] = forecast_df['ds'].dt.strftime("%Y-%m-%d %H:%M:%S")
-            merged = pd.merge(data, forecast_df, on='ds_str', how='inner')
-            mae = mean_absolute_error(merged['y'].astype(float), merged['yhat'].astype(float))
-            rmse = np.sqrt(mean_squared_error(merged['y'].astype(float), merged['yhat'].astype(float)))
-            r2 = r2_score(merged['y'].astype(float), merged['yhat'].astype(float))
-
-            duration = timeit.default_timer() - start_time
-            current, peak = tracemalloc.get_traced_memory()
-            tracemalloc.stop()
-            tmp.close()
-            os.remove(tmp.name)
-
-            run = ForecastRun.objects.create(
-                user=user,
-                timeseries=selected_ts,
-                script_name=script.name,
-                csv_file_name=csv_file_name
-            )
-            metrics = [
-                ('MAE', mae), ('RMSE', rmse), ('R2', r2),
-                ('duration', duration), ('memory_peak_mb', peak / 1024 / 1024)
-            ]
-            ForecastMetric.objects.bulk_create([ForecastMetric(run=run, name=n, value=v) for n, v in metrics])
-
-            normalized_forecast = [
-                {'ds': pd.to_datetime(item['ds']).strftime('%Y-%m-%d %H:%M:%S'), 'yhat': float(item['yhat'])}
-                for item in forecast_output
-            ]
-
-            results.append({
-                'script': script.name,
-                'forecast': normalized_forecast,
-                'metrics': dict(metrics)
-            })
-
-        return results
\ No newline at end of file
+        try:
+            query = parse_point_query(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            horizon = int(request.data.get('horizon') or DEFAULT_HORIZON)
+            max_parallelism = int(request.data.get('max_parallelism') or getattr(settings, 'FORECAST_MAX_PARALLELISM', 0) or default_parallelism())
+            if horizon < 1 or max_parallelism < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'horizon и max_parallelism должны быть положительными целыми числами.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        series = {str(ts.pk): ts for ts in queryset.order_by('pk')}
+        points = load_many(list(series.values()), query)
+        results = {key: {'error': 'Временной ряд не содержит данных.'} for key, ts in series.items() if not len(points[ts.pk][0])}
+        frames = {key: prepare_data(*points[ts.pk]) for key, ts in series.items() if key not in results}
+
+        if model:
+            results.update((key, result) for key, _, result in run_models([model], frames, horizon,
+                                                                          series_keys=model_series_keys(series, query)))
+            save_results([(results[key], ts, None) for key, ts in series.items()], request.user)
+        else:
+            # Запуски скрипта видны со статусом running и могут быть отменены, пока выполняются в песочнице
+            runs = GridRuns(scripts, {key: (ts, None) for key, ts in series.items()}, request.user)
+            verdicts = ensure_verdicts(scripts)
+            batch = frames and not verdicts[script_hash(scripts[0].source)] and sandboxed(supports_batch, scripts[0]) is True
+            if batch:
+                runs.start([(key, 0) for key in frames])
+                try:
+                    results.update(sandbox_pool().run(execute_script_batch, scripts[0], frames, True, limits=default_limits(),
+                                                      should_cancel=lambda: bool(runs.cancelled())))
+                except SandboxError as e:
+                    results.update((key, sandbox_failure(scripts[0].name, e)) for key in frames)
+                results.update((key, runs.finish(key, 0, results[key])) for key in frames)
+            else:
+                results.update((key, runs.finish(key, index, result))
+                               for key, index, result in iter_grid(scripts, frames, max_parallelism, verdicts, runs=runs))
+        return Response({'count': len(series), 'results': {key: results[key] for key in series}}, status=status.HTTP_200_OK)
+
+
+class ForecastJobView(APIView):
+    """
+    Асинхронный запуск прогнозирования: задание ставится в очередь и сразу возвращается его id.
+    Выполняют задания воркеры (manage.py run_forecast_workers).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        scripts = read_uploaded_scripts(request.FILES.getlist('scripts'))
+        if not scripts:
+            return Response({'error': 'Требуются скрипты.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            timeseries_ids = [int(i) for i in request.data.get('timeseries_ids', '').split(',') if i]
+        except ValueError:
+            return Response({'error': 'Неверный timeseries_id.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not timeseries_ids:
+            return Response({'error': 'Требуется timeseries_ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            job = submit_job(request.user, scripts, timeseries_ids)
+        except UnicodeDecodeError:
+            return Response({'error': 'Скрипт должен быть в кодировке UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'job_id': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+class ForecastJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ForecastJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ForecastJob.objects.filter(user=self.request.user)
+
+
+class ScriptCacheStatsView(APIView):
+    """
+    Счётчики реестров скомпилированных скриптов рабочих процессов песочницы этого процесса Django
+    (попадания, промахи, размер — сумма по процессам; workers — число отчитавшихся процессов)
+    и пула песочницы (sandbox: задачи, перезапуски, падения и остановки по ограничениям рабочих процессов).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        pool = sandbox_pool()
+        return Response({**pool.report_stats(), 'sandbox': pool.stats()}, status=status.HTTP_200_OK)
+
+
+class ModelCacheStatsView(APIView):
+    """
+    Счётчики кэша обученных моделей Prophet этого процесса (попадания, промахи, сэкономленное
+    время обучения) и его ограничения.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(model_cache().stats(), status=status.HTTP_200_OK)
+
+
+class ForecastRunOutputView(APIView):
+    """
+    Сохранённый прогноз запуска без повторного выполнения скрипта.
+    По умолчанию отдаётся потоком JSON {'id', 'script_name', 'forecast': [{'ds', 'yhat'}, ...]};
+    с заголовком Accept: application/octet-stream — исходные байты формата forecast_storage.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [JSONRenderer, BinaryRenderer]
+
+    def get(self, request, pk):
+        run = ForecastRun.objects.filter(user=request.user, pk=pk).values('id', 'script_name', 'forecast_data').first()
+        if run is None:
+            return Response({'error': 'Запуск не найден.'}, status=status.HTTP_404_NOT_FOUND)
+        if run['forecast_data'] is None:
+            return Response({'error': 'Для запуска не сохранён прогноз.'}, status=status.HTTP_404_NOT_FOUND)
+        blob = bytes(run['forecast_data'])
+        if request.accepted_renderer.format == BinaryRenderer.format:
+            return Response(blob)
+
+        def stream():
+            yield json.dumps({'id': run['id'], 'script_name': run['script_name']})[:-1] + ', "forecast": ['
+            for index, chunk in enumerate(iter_forecast_records(blob)):
+                yield (',' if index else '') + json.dumps(chunk)[1:-1]
+            yield ']}'
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
+
+class ForecastRunAccuracyView(APIView):
+    """
+    Онлайн-точность запуска по фактам, поступившим после него: текущие MAE/RMSE/R2
+    по накопленным суммам и история снимков после каждой порции фактов.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        run = ForecastRun.objects.filter(user=request.user, pk=pk).only('id', 'online_stats').first()
+        if run is None:
+            return Response({'error': 'Запуск не найден.'}, status=status.HTTP_404_NOT_FOUND)
+        history = ForecastAccuracy.objects.filter(run=run).order_by('actual_until').values(
+            'actual_until', 'points', 'mae', 'rmse', 'r2'
+        )
+        return Response({
+            'id': run.id,
+            'points': run.online_stats.get('n', 0),
+            'actual_until': run.online_stats.get('actual_until'),
+            'metrics': online_metrics(run.online_stats),
+            'history': list(history),
+        }, status=status.HTTP_200_OK)
+
+
+class ForecastRunCancelView(APIView):
+    """
+    Отмена выполняющегося запуска (статус running): запуск помечается cancelled. Процесс, выполняющий
+    запуск (на любом хосте), видит отмену при очередном опросе и сам завершает свой рабочий процесс песочницы.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        run = ForecastRun.objects.filter(user=request.user, pk=pk).only('id').first()
+        if run is None:
+            return Response({'error': 'Запуск не найден.'}, status=status.HTTP_404_NOT_FOUND)
+        cancelled = ForecastRun.objects.filter(pk=pk, status=ForecastRun.STATUS_RUNNING).update(
+            status=ForecastRun.STATUS_CANCELLED, error='Запуск отменён.'
+        )
+        run = ForecastRun.objects.only('status').get(pk=pk)
+        if not cancelled:
+            return Response({'error': 'Запуск уже завершён.', 'status': run.status}, status=status.HTTP_409_CONFLICT)
+        return Response({'id': run.id, 'status': run.status}, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,88 @@
+import numpy as np
+from django.db import migrations, models
+
+# Формат колоночного хранения на момент миграции: метки времени — int64 (наносекунды с эпохи),
+# значения — float64, little-endian. Кодирование повторено здесь, а не импортировано из
+# utils/storage.py, чтобы изменения приложения не меняли историческую миграцию.
+DS_DTYPE = np.dtype('<i8')
+Y_DTYPE = np.dtype('<f8')
+
+
+def encode_points(ds, y):
+    ds = np.ascontiguousarray(np.asarray(ds).astype('datetime64[ns]').view('i8'), dtype=DS_DTYPE)
+    y = np.ascontiguousarray(y, dtype=Y_DTYPE)
+    order = np.argsort(ds, kind='stable')
+    return ds[order].tobytes(), y[order].tobytes()
+
+
+def decode_points(ds_bytes, y_bytes):
+    if not ds_bytes or not y_bytes:
+        return np.empty(0, dtype=DS_DTYPE), np.empty(0, dtype=Y_DTYPE)
+    return np.frombuffer(ds_bytes, dtype=DS_DTYPE), np.frombuffer(y_bytes, dtype=Y_DTYPE)
+
+
+def convert_json_to_columnar(apps, schema_editor):
+    import pandas as pd
+
+    Timeseries = apps.get_model('timeseries', 'Timeseries')
+    for ts in Timeseries.objects.exclude(data__isnull=True).iterator(chunk_size=50):
+        date_col = ts.date_column
+        numeric_col = ts.numeric_column
+        if not ts.data or not date_col or not numeric_col:
+            continue
+        frame = pd.DataFrame(ts.data)
+        if date_col not in frame.columns or numeric_col not in frame.columns:
+            continue
+        try:
+            ds = pd.to_datetime(frame[date_col]).to_numpy(dtype='datetime64[ns]')
+            y = frame[numeric_col].astype(float).to_numpy()
+        except (ValueError, TypeError):
+            continue
+        ts.ds_values, ts.y_values = encode_points(ds, y)
+        ts.save(update_fields=['ds_values', 'y_values'])
+
+
+def convert_columnar_to_json(apps, schema_editor):
+    # Обратное преобразование: точки из колоночных полей снова записываются в JSON data
+    # в формате загрузки CSV (список записей со столбцами дат и значений).
+    import pandas as pd
+
+    Timeseries = apps.get_model('timeseries', 'Timeseries')
+    for ts in Timeseries.objects.exclude(ds_values__isnull=True).iterator(chunk_size=50):
+        ds, y = decode_points(ts.ds_values, ts.y_values)
+        if not len(ds):
+            continue
+        dates = pd.DatetimeIndex(ds)
+        date_format = '%Y-%m-%d' if (dates == dates.normalize()).all() else '%Y-%m-%d %H:%M:%S'
+        date_col = ts.date_column or 'ds'
+        numeric_col = ts.numeric_column or 'y'
+        ts.data = [
+            {date_col: stamp, numeric_col: float(value)}
+            for stamp, value in zip(dates.strftime(date_format), y)
+        ]
+        ts.save(update_fields=['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0003_timeseries_date_column_timeseries_numeric_column'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='ds_values',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='y_values',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(convert_json_to_columnar, convert_columnar_to_json),
+        migrations.RemoveField(
+            model_name='timeseries',
+            name='data',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_hypertable(apps, schema_editor):
+    # Гипертаблица создаётся только там, где доступно расширение TimescaleDB;
+    # на обычном PostgreSQL таблица остаётся обычной с тем же ключом (timeseries_id, ts).
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS timescaledb')
+        cursor.execute(
+            "SELECT create_hypertable('timeseries_timeseriespoint', 'ts', "
+            "chunk_time_interval => INTERVAL '30 days', if_not_exists => TRUE, migrate_data => TRUE)"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0004_timeseries_columnar_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='storage',
+            field=models.CharField(choices=[('columnar', 'Колоночные поля'), ('hypertable', 'Гипертаблица TimescaleDB')], default='columnar', editable=False, max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TimeseriesPoint',
+            fields=[
+                ('pk', models.CompositePrimaryKey('timeseries_id', 'ts', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('ts', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('timeseries', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='points', to='timeseries.timeseries')),
+            ],
+        ),
+        migrations.RunPython(create_hypertable, migrations.RunPython.noop),
+    ]
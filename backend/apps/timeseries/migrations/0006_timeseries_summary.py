@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:30
+
+import numpy as np
+import pandas as pd
+from django.db import migrations, models
+
+# Сводка ряда в формате на момент миграции (utils/summary.py). Чтение точек и расчёт сводки
+# повторены здесь, а не импортированы из приложения, чтобы его изменения не меняли историческую миграцию.
+FREQ_SAMPLE_SIZE = 1000
+GAP_FACTOR = 1.5
+DAY_NS = 24 * 60 * 60 * 10 ** 9
+
+
+def read_points(schema_editor, table: str, ts):
+    if ts.storage == 'hypertable':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT (EXTRACT(EPOCH FROM ts) * 1000000)::bigint, value FROM {table} '
+                'WHERE timeseries_id = %s ORDER BY ts', [ts.pk]
+            )
+            rows = cursor.fetchall()
+        ds = np.array([row[0] for row in rows], dtype='<i8') * 1000
+        return ds, np.array([row[1] for row in rows], dtype='<f8')
+    if not ts.ds_values or not ts.y_values:
+        return np.empty(0, dtype='<i8'), np.empty(0, dtype='<f8')
+    return np.frombuffer(ts.ds_values, dtype='<i8'), np.frombuffer(ts.y_values, dtype='<f8')
+
+
+def summarize(ds: np.ndarray, y: np.ndarray) -> dict:
+    if not len(ds):
+        return {'count': 0}
+    step = freq = None
+    gaps = 0
+    if len(ds) > 1:
+        deltas, counts = np.unique(np.diff(ds), return_counts=True)
+        # Самый частый интервал; при равенстве — меньший (np.unique сортирует по возрастанию)
+        step = int(deltas[np.argmax(counts)])
+        gaps = int(counts[deltas > GAP_FACTOR * step].sum())
+    if step:
+        sample = ds[:FREQ_SAMPLE_SIZE]
+        freq = pd.infer_freq(pd.DatetimeIndex(sample)) if len(sample) >= 3 else None
+        if freq is None and step % DAY_NS == 0:
+            freq = 'D' if step == DAY_NS else f'{step // DAY_NS}D'
+        freq = freq or pd.tseries.frequencies.to_offset(pd.Timedelta(step)).freqstr
+    return {
+        'count': len(ds),
+        'start': pd.Timestamp(int(ds[0])).isoformat(),
+        'end': pd.Timestamp(int(ds[-1])).isoformat(),
+        'freq': freq,
+        'step_ns': step,
+        'min': float(y.min()),
+        'max': float(y.max()),
+        'mean': float(y.sum()) / len(ds),
+        'gaps': gaps,
+    }
+
+
+def backfill_summaries(apps, schema_editor):
+    Timeseries = apps.get_model('timeseries', 'Timeseries')
+    table = apps.get_model('timeseries', 'TimeseriesPoint')._meta.db_table
+    for ts in Timeseries.objects.iterator(chunk_size=50):
+        ts.summary = summarize(*read_points(schema_editor, table, ts))
+        ts.save(update_fields=['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0005_timeseriespoint_hypertable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeseries', '0006_timeseries_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,10 +1,25 @@
 from django.db import models
 
+STORAGE_COLUMNAR = 'columnar'
+STORAGE_HYPERTABLE = 'hypertable'
+STORAGE_CHOICES = [
+    (STORAGE_COLUMNAR, 'Колоночные поля'),
+    (STORAGE_HYPERTABLE, 'Гипертаблица TimescaleDB'),
+]
+
 class Timeseries(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     is_reference = models.BooleanField(default=False)
-    data = models.JSONField(null=True, blank=True)  # Хранит весь DataFrame как список словарей
+    # Колоночное хранение точек: int64-метки времени (нс) и float64-значения (см. utils/storage.py)
+    ds_values = models.BinaryField(null=True, blank=True, editable=False)
+    y_values = models.BinaryField(null=True, blank=True, editable=False)
+    # Где лежат точки ряда: в колоночных полях модели или в гипертаблице TimeseriesPoint
+    storage = models.CharField(max_length=20, choices=STORAGE_CHOICES, default=STORAGE_COLUMNAR, editable=False)
+    # Сводка, вычисляемая при загрузке: count, start, end, freq, step_ns, min, max, mean, gaps (см. utils/summary.py)
+    summary = models.JSONField(default=dict, blank=True, editable=False)
+    # Увеличивается при каждом изменении точек; входит в ключи кэшей, построенных по точкам ряда
+    version = models.PositiveIntegerField(default=0, editable=False)
     date_column = models.CharField(max_length=255, blank=True, null=True)  # Имя столбца с датами
     numeric_column = models.CharField(max_length=255, blank=True, null=True)  # Имя столбца с числами
     created_at = models.DateTimeField(auto_now_add=True)
@@ -15,3 +30,14 @@ class Timeseries(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class TimeseriesPoint(models.Model):
+    """
+    Точка временного ряда. Таблица превращается в гипертаблицу TimescaleDB по столбцу ts,
+    первичный ключ (timeseries_id, ts) обслуживает выборки по диапазону времени.
+    """
+    pk = models.CompositePrimaryKey('timeseries_id', 'ts')
+    timeseries = models.ForeignKey(Timeseries, on_delete=models.CASCADE, related_name='points', db_index=False)
+    ts = models.DateTimeField()
+    value = models.FloatField()
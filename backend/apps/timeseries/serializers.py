@@ -1,11 +1,29 @@
 from rest_framework import serializers
 from .models import Timeseries
+from .utils.storage import load_points, points_to_records
 
 class TimeseriesSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Timeseries.
     Описывает поля, используемые для загрузки и отображения данных.
+    Точки ряда хранятся в колоночном виде и отдаются в поле 'data' списком словарей.
+    """
+    data = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Timeseries
+        exclude = ['ds_values', 'y_values']
+
+    def get_data(self, obj):
+        ds, y = load_points(obj)
+        return points_to_records(ds, y, obj.date_column, obj.numeric_column)
+
+
+class TimeseriesListSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор списка рядов: только метаданные и сводка, без точек.
+    Точки отдаются в детальном представлении и через /api/timeseries/{id}/data/.
     """
     class Meta:
         model = Timeseries
-        fields = '__all__'
+        exclude = ['ds_values', 'y_values']
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Отправляется после дописывания точек в конец ряда (utils/storage.append_points)
+# внутри той же транзакции. Аргументы: timeseries, ds (int64-наносекунды), y (float64).
+points_appended = Signal()
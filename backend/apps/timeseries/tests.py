@@ -38,4 +38,214 @@ def test_update_and_delete_timeseries(auth_client):
     assert update.status_code == 200
     # Удалить
     del_resp = auth_client.delete(reverse('timeseries-detail', args=[ts_id]))
-    assert del_resp.status_code == 204
\ No newline at end of file
+    assert del_resp.status_code == 204
+
+def test_columnar_storage_roundtrip():
+    from apps.timeseries.utils.storage import encode_points, decode_points, points_to_frame
+    import numpy as np
+    ds = np.array(['2021-01-01', '2021-01-02T12:00'], dtype='datetime64[ns]')
+    ds_bytes, y_bytes = encode_points(ds, [1.5, 2.5])
+    ds_arr, y_arr = decode_points(ds_bytes, y_bytes)
+    frame = points_to_frame(ds_arr, y_arr)
+    assert list(frame.columns) == ['ds', 'y']
+    assert frame['ds'].iloc[1] == ds[1]
+    assert frame['y'].tolist() == [1.5, 2.5]
+    # Без копирования: значения ссылаются на исходный буфер
+    assert np.shares_memory(frame['y'].to_numpy(), y_arr)
+
+@pytest.mark.django_db
+def test_upload_stores_columnar_points(auth_client):
+    csv_content = 'date,value\n2021-01-01,10\n2021-01-02,15'
+    file = io.BytesIO(csv_content.encode())
+    file.name = 'series.csv'
+    resp = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'date', 'numeric_column': 'value'
+    }, format='multipart')
+    assert resp.status_code == 201
+    detail = auth_client.get(reverse('timeseries-detail', args=[resp.json()['id']]))
+    assert detail.json()['data'] == [{'date': '2021-01-01', 'value': 10.0}, {'date': '2021-01-02', 'value': 15.0}]
+
+@pytest.mark.django_db
+def test_hypertable_copy_ingest_and_range_read(auth_client, settings):
+    from django.db import connection
+    if connection.vendor != 'postgresql':
+        pytest.skip('COPY доступен только в PostgreSQL')
+    from apps.timeseries.models import Timeseries, TimeseriesPoint
+    from apps.timeseries.utils.storage import load_points
+    import numpy as np
+    settings.TIMESERIES_STORAGE_BACKEND = 'hypertable'
+    csv_content = 'ds,y\n2021-01-03 00:00:00,3\n2021-01-01 00:00:00,1\n2021-01-02 06:30:00,2'
+    file = io.BytesIO(csv_content.encode())
+    file.name = 'series.csv'
+    resp = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart')
+    assert resp.status_code == 201
+    ts = Timeseries.objects.get(id=resp.json()['id'])
+    assert ts.storage == 'hypertable'
+    assert TimeseriesPoint.objects.filter(timeseries=ts).count() == 3
+    start = np.datetime64('2021-01-02', 'ns').view('i8')
+    ds, y = load_points(ts, start=start)
+    assert y.tolist() == [2.0, 3.0]
+    assert ds[0] == np.datetime64('2021-01-02T06:30', 'ns').view('i8')
+    detail = auth_client.get(reverse('timeseries-detail', args=[ts.id]))
+    assert detail.json()['data'][0]['ds'] == '2021-01-01 00:00:00'
+    assert auth_client.delete(reverse('timeseries-detail', args=[ts.id])).status_code == 204
+    assert not TimeseriesPoint.objects.exists()
+
+def test_iter_series_csv_reports_row_number():
+    from apps.timeseries.utils.csv_loader import iter_series_csv, CsvValidationError
+    rows = '\n'.join(f'2021-01-{d:02d},{d}' for d in range(1, 21))
+    file = io.BytesIO(('ds,y\n' + rows + '\n2021-02-01,oops\n').encode())
+    chunks = iter_series_csv(file, 'ds', 'y', chunksize=8)
+    assert [len(ds) for ds, _ in [next(chunks), next(chunks)]] == [8, 8]
+    with pytest.raises(CsvValidationError) as exc:
+        list(chunks)
+    assert exc.value.row == 22
+
+@pytest.mark.django_db
+def test_streaming_upload_rolls_back_on_error(auth_client):
+    from apps.timeseries.models import Timeseries
+    file = io.BytesIO(b'ds,y\n2021-01-01,1\n2021-01-01,2\n')
+    file.name = 'series.csv'
+    resp = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart')
+    assert resp.status_code == 400
+    assert 'Строка 3' in resp.json()['data_file']
+    assert not Timeseries.objects.exists()
+
+def test_sniff_date_format_checks_whole_sample():
+    from apps.timeseries.utils.csv_loader import sniff_date_format, read_series_csv
+    # По первому значению формат неоднозначен, выборка показывает, что день идёт первым
+    assert sniff_date_format(['01.02.2021', '13.02.2021']) == '%d.%m.%Y'
+    file = io.BytesIO(b'extra,when,value\nx,01.02.2021,1\nx,13.02.2021,2\n')
+    frame = read_series_csv(file, 'when', 'value')
+    assert list(frame.columns) == ['ds', 'y']
+    assert frame['ds'].dt.strftime('%Y-%m-%d').tolist() == ['2021-02-01', '2021-02-13']
+
+def test_summary_builder_matches_whole_series_summary():
+    import numpy as np
+    from apps.timeseries.utils.summary import SummaryBuilder, summarize
+    ds = (np.datetime64('2021-01-01', 'ns') + np.array([0, 1, 2, 3, 6, 7, 8, 12], dtype='timedelta64[D]')).view('i8')
+    y = np.arange(8, dtype='float64')
+    summary = summarize(ds, y)
+    assert summary['count'] == 8 and summary['freq'] is not None
+    assert (summary['start'], summary['end']) == ('2021-01-01T00:00:00', '2021-01-13T00:00:00')
+    assert (summary['min'], summary['max'], summary['mean']) == (0.0, 7.0, 3.5)
+    assert summary['gaps'] == 2 and summary['step_ns'] == 86400 * 10 ** 9
+    chunked = SummaryBuilder().add(ds[:3], y[:3]).add(ds[3:], y[3:])
+    assert chunked.ordered and chunked.result() == summary
+    assert not SummaryBuilder().add(ds[3:], y[3:]).add(ds[:3], y[:3]).ordered
+
+@pytest.mark.django_db
+def test_list_returns_summary_without_points(auth_client):
+    file = io.BytesIO(b'ds,y\n2021-01-01,10\n2021-01-02,15\n2021-01-04,20\n')
+    file.name = 'series.csv'
+    ts_id = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart').json()['id']
+    item = auth_client.get(reverse('timeseries-list')).json()[0]
+    assert 'data' not in item
+    assert item['summary']['count'] == 3 and item['summary']['gaps'] == 1 and item['summary']['freq'] == 'D'
+    data = auth_client.get(reverse('timeseries-data', args=[ts_id])).json()
+    assert data == [{'ds': '2021-01-01', 'y': 10.0}, {'ds': '2021-01-02', 'y': 15.0}, {'ds': '2021-01-04', 'y': 20.0}]
+
+def test_downsample_keeps_extremes_and_width():
+    import numpy as np
+    from apps.timeseries.utils.downsample import downsample
+    ds = np.arange(10_000, dtype='i8') * 60 * 10 ** 9
+    y = np.sin(np.arange(10_000) / 100.0)
+    y[4321] = 50.0  # одиночный выброс должен попасть на график
+    for method in ('lttb', 'minmax'):
+        small_ds, small_y = downsample(ds, y, 200, method)
+        assert len(small_ds) <= 200 and (np.diff(small_ds) > 0).all()
+        assert 50.0 in small_y
+    lttb_ds, _ = downsample(ds, y, 200, 'lttb')
+    assert len(lttb_ds) == 200 and lttb_ds[0] == ds[0] and lttb_ds[-1] == ds[-1]
+    assert len(downsample(ds[:5], y[:5], 200, 'lttb')[0]) == 5
+
+@pytest.mark.django_db
+def test_points_endpoint_is_cached_per_version(auth_client):
+    from apps.timeseries.models import Timeseries
+    from apps.timeseries.utils.storage import save_points
+    import numpy as np
+    ts = Timeseries.objects.create(name='big', author=User.objects.get(username='tsuser'))
+    ds = np.datetime64('2021-01-01', 'ns').view('i8') + np.arange(1000, dtype='i8') * 3600 * 10 ** 9
+    save_points(ts, ds, np.arange(1000.0), backend='columnar')
+    url = reverse('timeseries-points', args=[ts.id])
+    first = auth_client.get(url, {'width': 50, 'method': 'minmax'}).json()
+    assert first['total'] == 1000 and len(first['data']) <= 50
+    save_points(ts, ds[:10], np.arange(10.0), backend='columnar')
+    second = auth_client.get(url, {'width': 50, 'method': 'minmax'}).json()
+    assert second['total'] == 10
+    assert auth_client.get(url, {'width': 1}).status_code == 400
+    assert auth_client.get(url, {'method': 'avg'}).status_code == 400
+
+def test_resample_buckets_points_vectorized():
+    import numpy as np
+    from apps.timeseries.utils.resample import parse_point_query, apply_point_query
+    minute = 60 * 10 ** 9
+    ds = np.datetime64('2021-01-01', 'ns').view('i8') + np.array([0, 20, 40, 60, 80, 150], dtype='i8') * minute
+    y = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    query = parse_point_query({'start': '2021-01-01 00:10', 'freq': '1h', 'agg': 'mean'})
+    out_ds, out_y = apply_point_query(ds, y, query)
+    assert out_ds.tolist() == [ds[0], ds[0] + 60 * minute, ds[0] + 120 * minute]
+    assert out_y.tolist() == [2.5, 4.5, 6.0]
+    for agg, expected in [('sum', [5.0, 9.0, 6.0]), ('last', [3.0, 5.0, 6.0]), ('max', [3.0, 5.0, 6.0])]:
+        assert apply_point_query(ds, y, dict(query, agg=agg))[1].tolist() == expected
+    with pytest.raises(ValueError):
+        parse_point_query({'freq': 'MS'})
+    with pytest.raises(ValueError):
+        parse_point_query({'start': '2021-02-01', 'end': '2021-01-01'})
+
+@pytest.mark.django_db
+def test_data_endpoint_range_and_resample(auth_client):
+    file = io.BytesIO(b'ds,y\n2021-01-01,1\n2021-01-02,2\n2021-01-08,3\n2021-01-09,4\n2021-01-20,5\n')
+    file.name = 'series.csv'
+    ts_id = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart').json()['id']
+    url = reverse('timeseries-data', args=[ts_id])
+    assert [p['y'] for p in auth_client.get(url, {'start': '2021-01-02', 'end': '2021-01-09'}).json()] == [2.0, 3.0]
+    weekly = auth_client.get(url, {'end': '2021-01-20', 'freq': '7D', 'agg': 'sum'}).json()
+    assert [p['y'] for p in weekly] == [3.0, 7.0]
+    assert auth_client.get(url, {'agg': 'median', 'freq': '1D'}).status_code == 400
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('backend', ['columnar', 'hypertable'])
+def test_append_points_checks_tail_and_updates_summary(auth_client, backend, settings):
+    from django.db import connection
+    from apps.timeseries.models import Timeseries
+    from apps.timeseries.utils.storage import load_points
+    from apps.timeseries.utils.summary import summarize
+    if backend == 'hypertable' and connection.vendor != 'postgresql':
+        pytest.skip('COPY доступен только в PostgreSQL')
+    settings.TIMESERIES_STORAGE_BACKEND = backend
+    file = io.BytesIO(b'ds,y\n2021-01-01,1\n2021-01-02,2\n')
+    file.name = 'series.csv'
+    ts_id = auth_client.post(reverse('timeseries-list'), {
+        'name': 's', 'data_file': file, 'date_column': 'ds', 'numeric_column': 'y'
+    }, format='multipart').json()['id']
+    url = reverse('timeseries-append', args=[ts_id])
+    resp = auth_client.post(url, {'points': [{'ds': '2021-01-03', 'y': 3}, {'ds': '2021-01-05', 'y': 5}]}, format='json')
+    assert resp.status_code == 200 and resp.json()['appended'] == 2
+    ts = Timeseries.objects.get(id=ts_id)
+    assert ts.summary == summarize(*load_points(ts))
+    assert ts.summary['count'] == 4 and ts.summary['gaps'] == 1 and ts.summary['mean'] == 2.75
+    if connection.vendor == 'postgresql':
+        # Колоночный ряд при первом дописывании переносится в гипертаблицу
+        assert ts.storage == 'hypertable' and ts.ds_values is None
+        assert load_points(ts)[1].tolist() == [1.0, 2.0, 3.0, 5.0]
+
+    stale = auth_client.post(url, {'points': [{'ds': '2021-01-05', 'y': 6}]}, format='json')
+    assert stale.status_code == 400 and 'позже' in stale.json()['points']
+    unordered = auth_client.post(url, {'points': [{'ds': '2021-01-08', 'y': 1}, {'ds': '2021-01-07', 'y': 1}]}, format='json')
+    assert 'Точка 2' in unordered.json()['points']
+    assert Timeseries.objects.get(id=ts_id).summary['count'] == 4
+    if connection.vendor == 'postgresql':
+        # Сводка отстала от точек: нарушение ключа гипертаблицы — ошибка запроса, а не 500
+        Timeseries.objects.filter(id=ts_id).update(summary={**ts.summary, 'end': '2021-01-04T00:00:00'})
+        duplicate = auth_client.post(url, {'points': [{'ds': '2021-01-05', 'y': 6}]}, format='json')
+        assert duplicate.status_code == 400 and 'повторяющиеся' in duplicate.json()['points']
+        assert load_points(ts)[1].tolist() == [1.0, 2.0, 3.0, 5.0]
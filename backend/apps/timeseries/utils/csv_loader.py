@@ -0,0 +1,165 @@
+import importlib.util
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+from pandas.tseries.api import guess_datetime_format
+
+Points = Tuple[np.ndarray, np.ndarray]
+
+# Количество строк CSV, читаемых и проверяемых за один шаг потоковой загрузки
+CSV_CHUNK_SIZE = 100_000
+
+# Сколько значений столбца дат используется для определения формата
+DATE_SAMPLE_SIZE = 1000
+
+# Форматы, которые проверяются, если pandas не смог угадать формат по первому значению
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y/%m/%d',
+    '%d.%m.%Y',
+    '%d.%m.%Y %H:%M:%S',
+    '%d.%m.%Y %H:%M',
+    '%d/%m/%Y',
+    '%m/%d/%Y',
+]
+
+
+class CsvValidationError(ValueError):
+    """
+    Ошибка проверки CSV. Номер строки (row) считается по файлу: заголовок — строка 1.
+    """
+    def __init__(self, message: str, row: Optional[int] = None):
+        self.row = row
+        super().__init__(f"Строка {row}: {message}" if row is not None else message)
+
+
+def pyarrow_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def sniff_date_format(sample: Sequence) -> Optional[str]:
+    """
+    Определяет формат дат по выборке значений: сначала проверяется догадка pandas
+    по первому значению, затем форматы из DATE_FORMATS. Формат принимается, только если
+    по нему разбираются все значения выборки. Возвращает None, если формат не найден.
+    """
+    values = [str(v).strip() for v in sample if v is not None and str(v).strip()]
+    if not values:
+        return None
+    candidates: List[str] = []
+    guessed = guess_datetime_format(values[0])
+    if guessed:
+        candidates.append(guessed)
+    candidates += [fmt for fmt in DATE_FORMATS if fmt != guessed]
+    series = pd.Series(values)
+    for fmt in candidates:
+        if not pd.to_datetime(series, format=fmt, errors='coerce').isna().any():
+            return fmt
+    return None
+
+
+def parse_dates(values: pd.Series, date_format: Optional[str]) -> pd.Series:
+    """
+    Разбирает даты по явному формату; без формата — медленный поэлементный разбор.
+    Неразбираемые значения превращаются в NaT.
+    """
+    if is_datetime64_any_dtype(values):
+        return values
+    if date_format:
+        return pd.to_datetime(values, format=date_format, errors='coerce')
+    return pd.to_datetime(values, format='mixed', errors='coerce')
+
+
+def _first_row(mask: np.ndarray, offset: int) -> int:
+    # Номер строки в файле для первого True в маске (+2: заголовок и нумерация с единицы)
+    return offset + int(np.argmax(mask)) + 2
+
+
+def _read_header(file, date_column: str, numeric_column: str) -> None:
+    file.seek(0)
+    try:
+        columns = pd.read_csv(file, nrows=0).columns
+    except pd.errors.EmptyDataError:
+        raise CsvValidationError("CSV-файл не содержит данных.")
+    if date_column not in columns:
+        raise CsvValidationError(f"Указанный столбец с датами '{date_column}' не найден в CSV.")
+    if numeric_column not in columns:
+        raise CsvValidationError(f"Указанный числовой столбец '{numeric_column}' не найден в CSV.")
+    file.seek(0)
+
+
+def _convert_chunk(chunk: pd.DataFrame, date_column: str, numeric_column: str,
+                   date_format: Optional[str], offset: int) -> Points:
+    dates = parse_dates(chunk[date_column], date_format)
+    bad = dates.isna().to_numpy()
+    if bad.any():
+        raise CsvValidationError(
+            f"столбец '{date_column}' содержит значение, которое не является датой.", _first_row(bad, offset)
+        )
+    values = chunk[numeric_column]
+    if not is_numeric_dtype(values):
+        values = pd.to_numeric(values, errors='coerce')
+    bad = values.isna().to_numpy()
+    if bad.any():
+        raise CsvValidationError(
+            f"столбец '{numeric_column}' содержит нечисловое значение.", _first_row(bad, offset)
+        )
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    return dates.to_numpy(dtype='datetime64[ns]').view('i8'), values.to_numpy(dtype='float64')
+
+
+def iter_series_csv(file, date_column: str, numeric_column: str,
+                    chunksize: int = CSV_CHUNK_SIZE) -> Iterator[Points]:
+    """
+    Потоково читает из CSV только два выбранных столбца порциями по chunksize строк
+    и выдаёт проверенные массивы (ds — int64-наносекунды, y — float64).
+    Формат дат определяется один раз по первой порции и применяется ко всем остальным.
+
+    Повторяющиеся даты внутри порции и на стыке упорядоченных порций обнаруживаются здесь;
+    остальные повторы отклоняет хранилище при записи.
+    Вызывает CsvValidationError с номером строки при первой ошибке.
+    """
+    _read_header(file, date_column, numeric_column)
+    offset = 0
+    last_ds = None
+    date_format = None
+    reader = pd.read_csv(file, usecols=[date_column, numeric_column], chunksize=chunksize,
+                         dtype={date_column: str})
+    for chunk in reader:
+        if offset == 0:
+            date_format = sniff_date_format(chunk[date_column].iloc[:DATE_SAMPLE_SIZE].tolist())
+        ds, y = _convert_chunk(chunk, date_column, numeric_column, date_format, offset)
+        duplicated = pd.Series(ds).duplicated().to_numpy()
+        if last_ds is not None:
+            duplicated = duplicated | (ds == last_ds)
+        if duplicated.any():
+            raise CsvValidationError(f"столбец '{date_column}' содержит повторяющуюся дату.", _first_row(duplicated, offset))
+        last_ds = ds[-1]
+        offset += len(chunk)
+        yield ds, y
+
+    if offset == 0:
+        raise CsvValidationError("CSV-файл не содержит данных.")
+
+
+def read_series_csv(file, date_column: str, numeric_column: str) -> pd.DataFrame:
+    """
+    Читает CSV целиком в DataFrame с колонками 'ds' и 'y'.
+    Загружаются только два выбранных столбца; при наличии pyarrow используется его движок,
+    даты разбираются по формату, определённому по выборке.
+    Вызывает CsvValidationError с номером строки при ошибке.
+    """
+    _read_header(file, date_column, numeric_column)
+    engine = 'pyarrow' if pyarrow_available() else 'c'
+    data = pd.read_csv(file, usecols=[date_column, numeric_column], engine=engine)
+    if data.empty:
+        raise CsvValidationError("CSV-файл не содержит данных.")
+    date_format = sniff_date_format(data[date_column].iloc[:DATE_SAMPLE_SIZE].tolist())
+    ds, y = _convert_chunk(data, date_column, numeric_column, date_format, 0)
+    return pd.DataFrame({'ds': ds.view('datetime64[ns]'), 'y': y}, copy=False)
@@ -0,0 +1,78 @@
+"""
+Прореживание ряда для графиков: на экран выводится не больше width точек,
+форма кривой (пики, провалы) сохраняется.
+
+  - lttb: Largest-Triangle-Three-Buckets — из каждой корзины берётся точка,
+    образующая наибольший треугольник с соседними корзинами;
+  - minmax: из каждой корзины берутся минимум и максимум в порядке времени.
+"""
+from typing import Tuple
+
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def _bucket_bounds(n: int, buckets: int) -> np.ndarray:
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def lttb(ds: np.ndarray, y: np.ndarray, width: int) -> np.ndarray:
+    """
+    Возвращает индексы выбранных точек (width штук, первая и последняя точки ряда всегда входят).
+    """
+    n = len(ds)
+    if width >= n or width < 3:
+        return np.arange(n)
+    x = (ds - ds[0]).astype('float64')
+    # Внутренние точки делятся на width - 2 корзины, первая и последняя точки идут отдельно
+    bounds = _bucket_bounds(n - 2, width - 2) + 1
+    sums_x = np.add.reduceat(x[1:-1], bounds[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:-1], bounds[:-1] - 1)
+    sizes = np.diff(bounds)
+    # Средняя точка следующей корзины; для последней корзины — последняя точка ряда
+    next_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    next_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+
+    selected = np.empty(width, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for b in range(width - 2):
+        lo, hi = bounds[b], bounds[b + 1]
+        area = np.abs(
+            (x[prev] - next_x[b]) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (next_y[b] - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+
+def minmax(ds: np.ndarray, y: np.ndarray, width: int) -> np.ndarray:
+    """
+    Возвращает индексы минимумов и максимумов width // 2 корзин равной длины, упорядоченные по времени.
+    """
+    n = len(ds)
+    buckets = max(width // 2, 1)
+    if width >= n:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+    valid = ~np.isnan(grid).all(axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    grid = grid[valid]
+    lows = offsets + np.nanargmin(grid, axis=1)
+    highs = offsets + np.nanargmax(grid, axis=1)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def downsample(ds: np.ndarray, y: np.ndarray, width: int, method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Прореживает ряд выбранным методом, возвращает массивы (ds, y) не длиннее width.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Неизвестный метод прореживания: {method}.')
+    index = lttb(ds, y, width) if method == 'lttb' else minmax(ds, y, width)
+    return ds[index], y[index]
@@ -0,0 +1,98 @@
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+
+from apps.timeseries.models import TimeseriesPoint
+
+POINTS_TABLE = TimeseriesPoint._meta.db_table
+
+# Размер порции строк для одного COPY: ограничивает память при загрузке больших рядов
+COPY_CHUNK_SIZE = 100_000
+
+
+def _points_to_csv(timeseries_id: int, ds: np.ndarray, y: np.ndarray) -> io.StringIO:
+    stamps = np.char.add(np.datetime_as_string(ds.view('datetime64[ns]'), unit='us'), '+00')
+    buffer = io.StringIO()
+    pd.DataFrame({'timeseries_id': timeseries_id, 'ts': stamps, 'value': y}).to_csv(
+        buffer, header=False, index=False
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def copy_points(timeseries_id: int, ds: np.ndarray, y: np.ndarray, chunk_size: int = COPY_CHUNK_SIZE) -> None:
+    """
+    Загружает точки в гипертаблицу через COPY FROM STDIN порциями по chunk_size строк.
+
+    Параметры:
+      - ds: int64-метки времени (наносекунды с эпохи)
+      - y: float64-значения
+    Ошибки драйвера приводятся к исключениям django.db (нарушение ключа — IntegrityError):
+    copy_expert вызывается напрямую у курсора psycopg2, в обход обёртки Django.
+    """
+    sql = f'COPY {POINTS_TABLE} (timeseries_id, ts, value) FROM STDIN WITH (FORMAT csv)'
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        for start in range(0, len(ds), chunk_size):
+            stop = start + chunk_size
+            cursor.copy_expert(sql, _points_to_csv(timeseries_id, ds[start:stop], y[start:stop]))
+
+
+def delete_points(timeseries_id: int) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POINTS_TABLE} WHERE timeseries_id = %s', [timeseries_id])
+
+
+def _ns_to_datetime(value: int):
+    return pd.Timestamp(value, unit='ns', tz='UTC').to_pydatetime()
+
+
+def read_points(timeseries_id: int, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Читает точки ряда диапазонным сканированием по ключу (timeseries_id, ts).
+    Границы start (включительно) и end (не включительно) задаются в наносекундах с эпохи.
+    Данные выгружаются через COPY TO STDOUT и разбираются векторно.
+    """
+    return read_many([timeseries_id], start, end)[timeseries_id]
+
+
+def read_many(timeseries_ids: List[int], start: Optional[int] = None,
+              end: Optional[int] = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Читает точки нескольких рядов одним запросом (см. read_points).
+    Строки упорядочены по (timeseries_id, ts) и делятся на ряды по границам смены id.
+    Возвращает словарь id -> (ds, y); ряды без точек получают пустые массивы.
+    """
+    conditions = ['timeseries_id = ANY(%s)']
+    params = [list(timeseries_ids)]
+    if start is not None:
+        conditions.append('ts >= %s')
+        params.append(_ns_to_datetime(start))
+    if end is not None:
+        conditions.append('ts < %s')
+        params.append(_ns_to_datetime(end))
+
+    buffer = io.StringIO()
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(
+            f"SELECT timeseries_id, (EXTRACT(EPOCH FROM ts) * 1000000)::bigint, value FROM {POINTS_TABLE} "
+            f"WHERE {' AND '.join(conditions)} ORDER BY timeseries_id, ts",
+            params,
+        ).decode()
+        cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv)', buffer)
+
+    empty = (np.empty(0, dtype='<i8'), np.empty(0, dtype='<f8'))
+    points = {timeseries_id: empty for timeseries_id in timeseries_ids}
+    if not buffer.tell():
+        return points
+    buffer.seek(0)
+    frame = pd.read_csv(buffer, header=None, names=['id', 'us', 'value'],
+                        dtype={'id': 'int64', 'us': 'int64', 'value': 'float64'})
+    ids = frame['id'].to_numpy()
+    ds, y = frame['us'].to_numpy() * 1000, frame['value'].to_numpy()
+    bounds = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1], True])
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        points[int(ids[lo])] = (ds[lo:hi], y[lo:hi])
+    return points
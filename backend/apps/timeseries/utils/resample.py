@@ -0,0 +1,93 @@
+"""
+Выборка диапазона времени и передискретизация ряда.
+
+Параметры запроса:
+  - start, end: границы диапазона [start, end), любые строки, понятные pd.Timestamp;
+  - freq: шаг корзин фиксированной длины (например, '15min', '1h', '1D');
+  - agg: агрегат внутри корзины — mean, sum, last, min или max (по умолчанию mean).
+Корзины выровнены по эпохе, метка корзины — её начало.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+AGGREGATES = ('mean', 'sum', 'last', 'min', 'max')
+
+
+def _parse_timestamp(value, name: str) -> Optional[int]:
+    if value in (None, ''):
+        return None
+    try:
+        stamp = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise ValueError(f'{name}: неверная дата «{value}».')
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert('UTC').tz_localize(None)
+    return stamp.as_unit('ns').value
+
+
+def parse_point_query(params) -> dict:
+    """
+    Разбирает start, end, freq и agg из параметров запроса.
+    Возвращает словарь с этими ключами (None для отсутствующих), при ошибке вызывает ValueError.
+    """
+    start = _parse_timestamp(params.get('start'), 'start')
+    end = _parse_timestamp(params.get('end'), 'end')
+    if start is not None and end is not None and start >= end:
+        raise ValueError('start должен быть раньше end.')
+    freq = params.get('freq') or None
+    step = None
+    if freq is not None:
+        try:
+            step = pd.tseries.frequencies.to_offset(freq).nanos
+        except (ValueError, TypeError):
+            raise ValueError(f'freq: неподдерживаемая частота «{freq}» (нужен фиксированный шаг, например 1h или 1D).')
+        if step <= 0:
+            raise ValueError('freq должен быть положительным.')
+    agg = params.get('agg') or 'mean'
+    if agg not in AGGREGATES:
+        raise ValueError(f'agg должен быть одним из: {", ".join(AGGREGATES)}.')
+    return {'start': start, 'end': end, 'freq': freq, 'step': step, 'agg': agg if freq else None}
+
+
+def slice_points(ds: np.ndarray, y: np.ndarray, start: Optional[int] = None,
+                 end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Срез упорядоченных массивов по диапазону [start, end) бинарным поиском, без копирования.
+    """
+    lo = np.searchsorted(ds, start, side='left') if start is not None else 0
+    hi = np.searchsorted(ds, end, side='left') if end is not None else len(ds)
+    return ds[lo:hi], y[lo:hi]
+
+
+def resample(ds: np.ndarray, y: np.ndarray, step: int, agg: str = 'mean') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Агрегирует упорядоченный ряд по корзинам длины step наносекунд.
+    Пустые корзины не выводятся.
+    """
+    if not len(ds):
+        return ds, y
+    buckets = ds - ds % step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    if agg == 'last':
+        values = y[np.r_[starts[1:], len(y)] - 1]
+    elif agg == 'min':
+        values = np.minimum.reduceat(y, starts)
+    elif agg == 'max':
+        values = np.maximum.reduceat(y, starts)
+    else:
+        values = np.add.reduceat(y, starts)
+        if agg == 'mean':
+            values = values / np.diff(np.r_[starts, len(y)])
+    return buckets[starts], values.astype('float64')
+
+
+def apply_point_query(ds: np.ndarray, y: np.ndarray, query: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Применяет разобранный запрос (parse_point_query) к массивам, уже находящимся в памяти.
+    """
+    ds, y = slice_points(ds, y, query.get('start'), query.get('end'))
+    if query.get('step'):
+        ds, y = resample(ds, y, query['step'], query['agg'])
+    return ds, y
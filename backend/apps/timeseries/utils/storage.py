@@ -0,0 +1,242 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from apps.timeseries.models import STORAGE_COLUMNAR, STORAGE_HYPERTABLE
+from apps.timeseries.signals import points_appended
+from apps.timeseries.utils.resample import resample, slice_points
+from apps.timeseries.utils.summary import SummaryBuilder, summarize
+
+# Формат хранения: метки времени — int64 (наносекунды с эпохи), значения — float64,
+# оба массива в little-endian, чтобы байты читались без преобразований.
+DS_DTYPE = np.dtype('<i8')
+Y_DTYPE = np.dtype('<f8')
+
+
+def as_points(ds, y) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Приводит столбцы к формату хранения и упорядочивает точки по времени.
+
+    Параметры:
+      - ds: массив datetime64 или int64 (наносекунды с эпохи)
+      - y: массив значений
+    """
+    ds = np.asarray(ds)
+    if np.issubdtype(ds.dtype, np.datetime64):
+        ds = ds.astype('datetime64[ns]').view('i8')
+    ds = np.ascontiguousarray(ds, dtype=DS_DTYPE)
+    y = np.ascontiguousarray(y, dtype=Y_DTYPE)
+    if ds.shape != y.shape:
+        raise ValueError('Длины столбцов дат и значений не совпадают.')
+    if len(ds) > 1 and (np.diff(ds) < 0).any():
+        order = np.argsort(ds, kind='stable')
+        ds, y = ds[order], y[order]
+    return ds, y
+
+
+def encode_points(ds, y) -> Tuple[bytes, bytes]:
+    """
+    Кодирует столбцы временного ряда в байты для колоночного хранения.
+    Возвращает кортеж (байты меток времени, байты значений).
+    """
+    ds, y = as_points(ds, y)
+    return ds.tobytes(), y.tobytes()
+
+
+def decode_points(ds_bytes, y_bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Восстанавливает массивы из байтов без копирования (массивы только для чтения).
+    """
+    if not ds_bytes or not y_bytes:
+        return np.empty(0, dtype=DS_DTYPE), np.empty(0, dtype=Y_DTYPE)
+    return np.frombuffer(ds_bytes, dtype=DS_DTYPE), np.frombuffer(y_bytes, dtype=Y_DTYPE)
+
+
+def points_to_frame(ds: np.ndarray, y: np.ndarray) -> pd.DataFrame:
+    """
+    Собирает DataFrame с колонками 'ds' (datetime64[ns]) и 'y' (float64) поверх готовых массивов.
+    """
+    return pd.DataFrame({'ds': ds.view('datetime64[ns]'), 'y': y}, copy=False)
+
+
+def default_backend() -> str:
+    return getattr(settings, 'TIMESERIES_STORAGE_BACKEND', STORAGE_COLUMNAR)
+
+
+def save_point_chunks(timeseries, chunks: Iterable[Tuple[np.ndarray, np.ndarray]],
+                      backend: Optional[str] = None) -> int:
+    """
+    Сохраняет точки ряда, поступающие порциями, полностью заменяя прежние.
+    Модель уже должна существовать в базе (нужен первичный ключ); вызывать внутри транзакции.
+
+    Для гипертаблицы каждая порция сразу уходит в COPY, так что память ограничена размером порции.
+    Колоночные поля требуют собрать весь ряд (16 байт на точку) перед записью.
+    Повторяющиеся метки времени приводят к ValueError.
+    Попутно вычисляется сводка ряда (utils/summary.py) и сохраняется в поле summary.
+
+    Параметры:
+      - chunks: итерируемый набор пар (ds, y); ds — datetime64 или int64-наносекунды
+      - backend: 'columnar' или 'hypertable', по умолчанию TIMESERIES_STORAGE_BACKEND
+    Возвращает:
+      - Количество сохранённых точек
+    """
+    from django.db import IntegrityError
+    from apps.timeseries.utils import hypertable
+
+    backend = backend or default_backend()
+    if timeseries.storage == STORAGE_HYPERTABLE:
+        hypertable.delete_points(timeseries.pk)
+
+    count = 0
+    if backend == STORAGE_HYPERTABLE:
+        builder = SummaryBuilder()
+        try:
+            for ds, y in chunks:
+                ds, y = as_points(ds, y)
+                hypertable.copy_points(timeseries.pk, ds, y)
+                builder.add(ds, y)
+                count += len(ds)
+        except IntegrityError:
+            raise ValueError('Ряд содержит повторяющиеся даты.')
+        timeseries.ds_values = timeseries.y_values = None
+        # Порции CSV не по порядку времени: сводку считаем по записанному ряду
+        timeseries.summary = builder.result() if builder.ordered else summarize(*hypertable.read_points(timeseries.pk))
+    else:
+        parts = [as_points(ds, y) for ds, y in chunks]
+        ds, y = as_points(np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))
+        if (np.diff(ds) == 0).any():
+            raise ValueError('Ряд содержит повторяющиеся даты.')
+        timeseries.ds_values, timeseries.y_values = ds.tobytes(), y.tobytes()
+        timeseries.summary = summarize(ds, y)
+        count = len(ds)
+    timeseries.storage = backend
+    timeseries.version += 1
+    timeseries.save(update_fields=['ds_values', 'y_values', 'storage', 'summary', 'version'])
+    return count
+
+
+def append_points(timeseries, ds: np.ndarray, y: np.ndarray) -> int:
+    """
+    Дописывает упорядоченные точки в конец ряда без перезаписи истории.
+    Проверка идёт только по концу ряда из сводки: первая новая точка должна быть позже последней
+    сохранённой, иначе ValueError. Сводка обновляется по новым точкам.
+    Вызывать внутри транзакции для строки, заблокированной select_for_update: блокировка
+    делает проверку конца ряда и запись одной операцией для параллельных дописываний.
+    Если ключ гипертаблицы всё же нарушен (сводка разошлась с точками), тоже ValueError.
+
+    Для гипертаблицы это COPY только новых строк. Колоночные поля хранят ряд одним значением,
+    и дописывание к ним переписывало бы всю историю, поэтому при первом дописывании ряд
+    переносится в гипертаблицу; дальше дописываются только новые строки. Без PostgreSQL
+    (COPY недоступен) байты новых точек дописываются к колоночным полям.
+    После записи отправляется сигнал points_appended.
+    """
+    from django.db import IntegrityError, connection
+
+    ds, y = as_points(ds, y)
+    summary = timeseries.summary or summarize(*load_points(timeseries))
+    if summary.get('count') and ds[0] <= pd.Timestamp(summary['end']).value:
+        raise ValueError(f"Новые точки должны быть позже последней точки ряда ({summary['end']}).")
+    try:
+        if timeseries.storage == STORAGE_HYPERTABLE:
+            from apps.timeseries.utils import hypertable
+            hypertable.copy_points(timeseries.pk, ds, y)
+            update_fields = []
+        elif connection.vendor == 'postgresql':
+            from apps.timeseries.utils import hypertable
+            hypertable.copy_points(timeseries.pk, *decode_points(timeseries.ds_values, timeseries.y_values))
+            hypertable.copy_points(timeseries.pk, ds, y)
+            timeseries.ds_values = timeseries.y_values = None
+            timeseries.storage = STORAGE_HYPERTABLE
+            update_fields = ['ds_values', 'y_values', 'storage']
+        else:
+            timeseries.ds_values = bytes(timeseries.ds_values or b'') + ds.tobytes()
+            timeseries.y_values = bytes(timeseries.y_values or b'') + y.tobytes()
+            update_fields = ['ds_values', 'y_values']
+    except IntegrityError:
+        raise ValueError('Ряд содержит повторяющиеся даты.')
+    timeseries.summary = SummaryBuilder(summary).add(ds, y).result()
+    timeseries.version += 1
+    timeseries.save(update_fields=update_fields + ['summary', 'version'])
+    points_appended.send(sender=timeseries.__class__, timeseries=timeseries, ds=ds, y=y)
+    return len(ds)
+
+
+def save_points(timeseries, ds, y, backend: Optional[str] = None) -> int:
+    """
+    Сохраняет точки ряда одним массивом (см. save_point_chunks).
+    """
+    return save_point_chunks(timeseries, [(ds, y)], backend)
+
+
+def load_points(timeseries, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Возвращает массивы (ds, y) ряда, при необходимости ограниченные диапазоном [start, end)
+    в наносекундах с эпохи. Для гипертаблицы это диапазонное сканирование по индексу,
+    для колоночных полей — бинарный поиск и срез без копирования.
+    """
+    if timeseries.storage == STORAGE_HYPERTABLE:
+        from apps.timeseries.utils import hypertable
+        return hypertable.read_points(timeseries.pk, start, end)
+    ds, y = decode_points(timeseries.ds_values, timeseries.y_values)
+    if start is None and end is None:
+        return ds, y
+    return slice_points(ds, y, start, end)
+
+
+def query_points(timeseries, query: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Загружает только диапазон из запроса (utils/resample.parse_point_query) и при необходимости
+    агрегирует его по корзинам freq. Без запроса возвращает весь ряд.
+    """
+    query = query or {}
+    ds, y = load_points(timeseries, query.get('start'), query.get('end'))
+    if query.get('step'):
+        ds, y = resample(ds, y, query['step'], query['agg'])
+    return ds, y
+
+
+def load_many(timeseries_list, query: Optional[dict] = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Точки нескольких рядов (см. query_points) без запроса на каждый ряд: колоночные ряды
+    берутся из уже загруженных объектов, ряды в гипертаблице читаются одним запросом.
+    Возвращает словарь pk -> (ds, y).
+    """
+    query = query or {}
+    start, end = query.get('start'), query.get('end')
+    hyper = [ts.pk for ts in timeseries_list if ts.storage == STORAGE_HYPERTABLE]
+    points = {}
+    if hyper:
+        from apps.timeseries.utils import hypertable
+        points.update(hypertable.read_many(hyper, start, end))
+    for ts in timeseries_list:
+        if ts.storage != STORAGE_HYPERTABLE:
+            points[ts.pk] = slice_points(*decode_points(ts.ds_values, ts.y_values), start, end)
+    if query.get('step'):
+        points = {pk: resample(ds, y, query['step'], query['agg']) for pk, (ds, y) in points.items()}
+    return points
+
+
+def load_frame(timeseries, start: Optional[int] = None, end: Optional[int] = None) -> pd.DataFrame:
+    """
+    Возвращает временной ряд в виде DataFrame с колонками 'ds' и 'y', готовый для прогнозирования.
+    """
+    return points_to_frame(*load_points(timeseries, start, end))
+
+
+def points_to_records(ds: np.ndarray, y: np.ndarray,
+                      date_column: Optional[str] = None,
+                      numeric_column: Optional[str] = None) -> List[Dict[str, object]]:
+    """
+    Представляет точки как список словарей (формат, который ожидает фронтенд).
+    Даты без времени отдаются как 'YYYY-MM-DD', иначе как 'YYYY-MM-DD HH:MM:SS'.
+    """
+    date_column = date_column or 'ds'
+    numeric_column = numeric_column or 'y'
+    if not len(ds):
+        return []
+    day_ns = 24 * 60 * 60 * 10 ** 9
+    fmt = '%Y-%m-%d' if not (ds % day_ns).any() else '%Y-%m-%d %H:%M:%S'
+    dates = pd.DatetimeIndex(ds.view('datetime64[ns]')).strftime(fmt)
+    return [{date_column: d, numeric_column: v} for d, v in zip(dates, y.tolist())]
@@ -0,0 +1,111 @@
+"""
+Сводка временного ряда, вычисляемая один раз при загрузке: число точек, начало и конец,
+частота, минимум, максимум, среднее и число пропусков.
+
+Сводка строится по порциям точек, поэтому подходит и для потоковой записи в гипертаблицу.
+"""
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Сколько первых меток времени используется для pd.infer_freq
+FREQ_SAMPLE_SIZE = 1000
+# Интервал между соседними точками больше шага в GAP_FACTOR раз считается пропуском
+GAP_FACTOR = 1.5
+DAY_NS = 24 * 60 * 60 * 10 ** 9
+
+
+def _timestamp(value: int) -> str:
+    return pd.Timestamp(value).isoformat()
+
+
+def _step_freq(step: int) -> str:
+    """
+    Частота по шагу для нерегулярных рядов, где pd.infer_freq не срабатывает.
+    """
+    if step % DAY_NS == 0:
+        days = step // DAY_NS
+        return 'D' if days == 1 else f'{days}D'
+    return pd.tseries.frequencies.to_offset(pd.Timedelta(step)).freqstr
+
+
+class SummaryBuilder:
+    """
+    Накопитель сводки. Порции передаются в add в порядке времени и отсортированными внутри;
+    если порции пришли не по порядку, ordered становится False и сводку нужно построить заново
+    по всему ряду.
+
+    Можно продолжить ранее сохранённую сводку (summary): тогда шаг и частота берутся из неё,
+    а новые точки должны идти после её конца.
+    """
+
+    def __init__(self, summary: Optional[dict] = None):
+        summary = summary or {}
+        self.count = summary.get('count', 0)
+        self.total = summary['mean'] * self.count if self.count else 0.0
+        self.min = summary.get('min')
+        self.max = summary.get('max')
+        self.start = pd.Timestamp(summary['start']).value if self.count else None
+        self.end = pd.Timestamp(summary['end']).value if self.count else None
+        self.step = summary.get('step_ns')
+        self.freq = summary.get('freq')
+        self.gaps = summary.get('gaps', 0)
+        self.deltas = Counter()
+        self.sample = []
+        self.ordered = True
+
+    def add(self, ds: np.ndarray, y: np.ndarray) -> 'SummaryBuilder':
+        if not len(ds):
+            return self
+        diffs = np.diff(ds)
+        if self.end is not None:
+            if ds[0] <= self.end:
+                self.ordered = False
+            diffs = np.concatenate([[ds[0] - self.end], diffs])
+        values, counts = np.unique(diffs, return_counts=True)
+        self.deltas.update(dict(zip(values.tolist(), counts.tolist())))
+        if self.freq is None and len(self.sample) < FREQ_SAMPLE_SIZE:
+            self.sample.extend(ds[:FREQ_SAMPLE_SIZE - len(self.sample)].tolist())
+
+        self.count += len(ds)
+        self.total += float(y.sum())
+        low, high = float(y.min()), float(y.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.start = int(ds[0]) if self.start is None else self.start
+        self.end = int(ds[-1])
+        return self
+
+    def result(self) -> dict:
+        if not self.count:
+            return {'count': 0}
+        step = self.step
+        if step is None and self.deltas:
+            step = max(self.deltas.items(), key=lambda item: (item[1], -item[0]))[0]
+        freq = self.freq
+        if freq is None and step:
+            freq = pd.infer_freq(pd.DatetimeIndex(self.sample)) if len(self.sample) >= 3 else None
+            freq = freq or _step_freq(step)
+        gaps = self.gaps
+        if step:
+            gaps += sum(count for delta, count in self.deltas.items() if delta > GAP_FACTOR * step)
+        return {
+            'count': self.count,
+            'start': _timestamp(self.start),
+            'end': _timestamp(self.end),
+            'freq': freq,
+            'step_ns': step,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count,
+            'gaps': gaps,
+        }
+
+
+def summarize(ds: np.ndarray, y: np.ndarray) -> dict:
+    """
+    Сводка по уже упорядоченным массивам ряда.
+    """
+    return SummaryBuilder().add(ds, y).result()
@@ -1,44 +1,45 @@
-import csv
-from io import TextIOWrapper
-from typing import Tuple, List, Dict
+from typing import List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from typing import Tuple, List, Dict
 
-def parse_and_validate_csv(file, date_column: str, numeric_column: str) -> Tuple[bool, str, List[Dict[str, str]]]:
+from .csv_loader import CsvValidationError, Points, iter_series_csv
+
+
+def parse_and_validate_csv(file, date_column: str, numeric_column: str) -> Tuple[bool, str, Optional[Points]]:
+    """
+    Читает и проверяет CSV целиком. Для больших файлов используйте csv_loader.iter_series_csv
+    вместе с storage.save_point_chunks, чтобы не держать весь файл в памяти.
+    """
     try:
-        file.seek(0)
-        data = pd.read_csv(file)
-        
-        if data.empty:
-            return False, "CSV-файл не содержит данных.", []
-        
-        if date_column not in data.columns:
-            return False, f"Указанный столбец с датами '{date_column}' не найден в CSV.", []
-        if numeric_column not in data.columns:
-            return False, f"Указанный числовой столбец '{numeric_column}' не найден в CSV.", []
-        
-        # Валидация и преобразование столбца с датами
-        try:
-            data[date_column] = pd.to_datetime(data[date_column], errors='coerce')
-            if data[date_column].isnull().any():
-                return False, f"Столбец '{date_column}' содержит значения, которые не являются датами.", []
-            # Преобразуем даты в строки для сериализации
-            data[date_column] = data[date_column].dt.strftime('%Y-%m-%d')
-        except (ValueError, TypeError):
-            return False, f"Столбец '{date_column}' не может быть преобразован в даты.", []
-        
-        # Валидация и преобразование числового столбца
-        try:
-            data[numeric_column] = data[numeric_column].astype(float)
-            if data[numeric_column].isnull().any():
-                return False, f"Столбец '{numeric_column}' содержит нечисловые значения.", []
-        except ValueError:
-            return False, f"Столбец '{numeric_column}' содержит нечисловые значения.", []
-        
-        # Преобразование в список словарей
-        data_list = data.to_dict(orient='records')
-        
-        return True, "", data_list
+        chunks = list(iter_series_csv(file, date_column, numeric_column))
+        return True, "", (np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks]))
+    except CsvValidationError as e:
+        return False, str(e), None
     except Exception as e:
-        return False, f"Ошибка при обработке CSV: {str(e)}", []
\ No newline at end of file
+        return False, f"Ошибка при обработке CSV: {str(e)}", None
+
+
+def parse_point_records(records: List[dict], date_column: str = 'ds', numeric_column: str = 'y') -> Points:
+    """
+    Проверяет пакет новых точек [{date_column: дата, numeric_column: значение}, ...].
+    Точки должны идти строго по возрастанию времени. Возвращает (ds — int64-наносекунды, y — float64),
+    при ошибке вызывает ValueError с номером точки (с единицы).
+    """
+    if not isinstance(records, list) or not records:
+        raise ValueError('Требуется непустой список точек.')
+    for number, item in enumerate(records, start=1):
+        if not isinstance(item, dict) or date_column not in item or numeric_column not in item:
+            raise ValueError(f"Точка {number}: нужны поля '{date_column}' и '{numeric_column}'.")
+    dates = pd.to_datetime(pd.Series([item[date_column] for item in records]), format='mixed', errors='coerce')
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    values = pd.to_numeric(pd.Series([item[numeric_column] for item in records]), errors='coerce')
+    for mask, message in [(dates.isna(), 'значение даты не распознано'), (values.isna(), 'значение не является числом')]:
+        if mask.any():
+            raise ValueError(f'Точка {int(np.argmax(mask.to_numpy())) + 1}: {message}.')
+    ds = dates.to_numpy(dtype='datetime64[ns]').view('i8')
+    unordered = np.diff(ds) <= 0
+    if unordered.any():
+        raise ValueError(f'Точка {int(np.argmax(unordered)) + 2}: даты должны строго возрастать.')
+    return ds, values.to_numpy(dtype='float64')
@@ -1,14 +1,101 @@
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework import viewsets, permissions, serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .models import Timeseries
-from .serializers import TimeseriesSerializer
-from .utils.validators import parse_and_validate_csv
+from .serializers import TimeseriesSerializer, TimeseriesListSerializer
+from .utils.csv_loader import iter_series_csv
+from .utils.downsample import METHODS, downsample
+from .utils.resample import parse_point_query
+from .utils.storage import append_points, load_points, points_to_records, query_points, save_point_chunks
+from .utils.validators import parse_point_records
+
+# Ограничения ширины графика для /points/
+MIN_POINTS_WIDTH = 3
+MAX_POINTS_WIDTH = 100_000
+POINTS_CACHE_TIMEOUT = 60 * 60
+
 
 class TimeseriesViewSet(viewsets.ModelViewSet):
     serializer_class = TimeseriesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Timeseries.objects.filter(author=self.request.user)
+        queryset = Timeseries.objects.filter(author=self.request.user)
+        if self.action == 'list':
+            # Для списка точки не нужны, бинарные колонки не читаем
+            queryset = queryset.defer('ds_values', 'y_values')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TimeseriesListSerializer
+        return TimeseriesSerializer
+
+    @action(detail=True, methods=['get'])
+    def data(self, request, pk=None):
+        """
+        Точки ряда списком словарей {date_column: дата, numeric_column: значение}.
+        Параметры start/end ограничивают диапазон [start, end), freq и agg агрегируют точки по корзинам.
+        """
+        try:
+            query = parse_point_query(request.query_params)
+        except ValueError as e:
+            raise serializers.ValidationError({'query': str(e)})
+        ts = self.get_object()
+        ds, y = query_points(ts, query)
+        return Response(points_to_records(ds, y, ts.date_column, ts.numeric_column))
+
+    @action(detail=True, methods=['post'])
+    def append(self, request, pk=None):
+        """
+        Дописывает пакет новых точек {'points': [{date_column: дата, numeric_column: значение}, ...]}
+        в конец ряда. Проверяются только порядок внутри пакета и стык с последней точкой ряда.
+        """
+        ts = self.get_object()
+        try:
+            ds, y = parse_point_records(request.data.get('points'), ts.date_column or 'ds', ts.numeric_column or 'y')
+        except ValueError as e:
+            raise serializers.ValidationError({'points': str(e)})
+        with transaction.atomic():
+            # Блокировка строки ряда: проверка конца ряда и запись не пересекаются с другим дописыванием
+            ts = Timeseries.objects.select_for_update().get(pk=ts.pk)
+            try:
+                appended = append_points(ts, ds, y)
+            except ValueError as e:
+                raise serializers.ValidationError({'points': str(e)})
+        return Response({'appended': appended, 'summary': ts.summary})
+
+    @action(detail=True, methods=['get'])
+    def points(self, request, pk=None):
+        """
+        Прореженный ряд для графика: не больше width точек (по умолчанию 2000), method=lttb|minmax.
+        Результат кэшируется по (ряд, версия точек, width, method).
+        """
+        try:
+            width = int(request.query_params.get('width', 2000))
+        except ValueError:
+            width = 0
+        if not MIN_POINTS_WIDTH <= width <= MAX_POINTS_WIDTH:
+            raise serializers.ValidationError({'width': f'width должен быть целым числом от {MIN_POINTS_WIDTH} до {MAX_POINTS_WIDTH}.'})
+        method = request.query_params.get('method', 'lttb')
+        if method not in METHODS:
+            raise serializers.ValidationError({'method': f'method должен быть одним из: {", ".join(METHODS)}.'})
+
+        ts = self.get_object()
+        key = f'timeseries-points:{ts.pk}:{ts.version}:{width}:{method}'
+        payload = cache.get(key)
+        if payload is None:
+            ds, y = load_points(ts)
+            payload = {
+                'method': method,
+                'width': width,
+                'total': len(ds),
+                'data': points_to_records(*downsample(ds, y, width, method), ts.date_column, ts.numeric_column),
+            }
+            cache.set(key, payload, POINTS_CACHE_TIMEOUT)
+        return Response(payload)
 
     def perform_create(self, serializer):
         date_column = self.request.data.get('date_column')
@@ -21,16 +108,13 @@ class TimeseriesViewSet(viewsets.ModelViewSet):
         if not csv_file:
             raise serializers.ValidationError({'data_file': 'CSV-файл обязателен.'})
         
-        is_valid, error_msg, parsed_data = parse_and_validate_csv(csv_file, date_column, numeric_column)
-        if not is_valid:
-            raise serializers.ValidationError({'data_file': error_msg})
-        
-        serializer.save(
-            author=self.request.user,
-            data=parsed_data,
-            date_column=date_column,
-            numeric_column=numeric_column
-        )
+        with transaction.atomic():
+            instance = serializer.save(
+                author=self.request.user,
+                date_column=date_column,
+                numeric_column=numeric_column
+            )
+            self.store_csv(instance, csv_file, date_column, numeric_column)
 
     def perform_update(self, serializer):
         date_column = self.request.data.get('date_column')
@@ -40,13 +124,23 @@ class TimeseriesViewSet(viewsets.ModelViewSet):
         if csv_file:
             if not date_column or not numeric_column:
                 raise serializers.ValidationError({'columns': 'Необходимо указать столбец с датами и числовой столбец.'})
-            is_valid, error_msg, parsed_data = parse_and_validate_csv(csv_file, date_column, numeric_column)
-            if not is_valid:
-                raise serializers.ValidationError({'data_file': error_msg})
-            serializer.save(
-                data=parsed_data,
-                date_column=date_column,
-                numeric_column=numeric_column
-            )
+            with transaction.atomic():
+                instance = serializer.save(
+                    date_column=date_column,
+                    numeric_column=numeric_column
+                )
+                self.store_csv(instance, csv_file, date_column, numeric_column)
         else:
-            serializer.save()
\ No newline at end of file
+            serializer.save()
+
+    def store_csv(self, instance, csv_file, date_column, numeric_column):
+        """
+        Потоково проверяет CSV и записывает точки в хранилище порциями.
+        При ошибке транзакция вызывающего кода откатывается целиком.
+        """
+        try:
+            save_point_chunks(instance, iter_series_csv(csv_file, date_column, numeric_column))
+        except ValueError as e:
+            raise serializers.ValidationError({'data_file': str(e)})
+        except Exception as e:
+            raise serializers.ValidationError({'data_file': f"Ошибка при обработке CSV: {str(e)}"})
@@ -107,6 +107,56 @@ DATABASES = {
     }
 }
 
+# Хранилище точек временных рядов: 'hypertable' (TimescaleDB, загрузка через COPY)
+# или 'columnar' (бинарные колонки в самой модели Timeseries)
+TIMESERIES_STORAGE_BACKEND = 'hypertable'
+
+# Максимальное число процессов для параллельного бенчмарка (0 — по числу ядер)
+FORECAST_MAX_PARALLELISM = 0
+
+# Очередь заданий (services/jobs.py): воркер обновляет heartbeat выполняемого задания каждые
+# HEARTBEAT секунд; задание без сигнала дольше LEASE секунд возвращается в очередь,
+# после MAX_ATTEMPTS попыток — завершается ошибкой
+FORECAST_JOB_HEARTBEAT = 30
+FORECAST_JOB_LEASE = 120
+FORECAST_JOB_MAX_ATTEMPTS = 3
+
+# Песочница для пользовательских скриптов (services/sandbox.py): наибольшее число рабочих процессов
+# в каждом процессе Django (0 — по числу ядер) и в каждом воркере run_forecast_workers
+# (JOB_SANDBOX_WORKERS); процессы запускаются по мере надобности. Процесс перезапускается
+# после MAX_TASKS задач или при RSS больше MAX_RSS_MB
+FORECAST_SANDBOX_WORKERS = 0
+FORECAST_JOB_SANDBOX_WORKERS = 1
+FORECAST_SANDBOX_MAX_TASKS = 200
+FORECAST_SANDBOX_MAX_RSS_MB = 1024
+# Ограничения одного запуска скрипта (0 — без ограничения): время выполнения и процессорное время
+# в секундах, прирост адресного пространства в МБ. Остановленный запуск сохраняется со статусом timeout или oom
+FORECAST_RUN_TIMEOUT = 600
+FORECAST_RUN_CPU_SECONDS = 600
+FORECAST_RUN_MEMORY_MB = 2048
+
+# Кэш результатов прогнозирования (включается параметром use_cache=true в запросе).
+# TIMEOUT — срок жизни записи в секундах, MAX_ENTRIES — предельное число записей.
+# Для общего кэша между процессами замените бэкенд, например, на DatabaseCache или Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'forecast_results': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'forecast-results',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+FORECAST_RESULT_CACHE = 'forecast_results'
+
+# Дисковый кэш обученных моделей Prophet (services/model_cache.py): каталог,
+# предельное число моделей и суммарный размер файлов в байтах
+PROPHET_MODEL_CACHE_DIR = BASE_DIR / 'model_cache'
+PROPHET_MODEL_CACHE_MAX_ENTRIES = 500
+PROPHET_MODEL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,69 @@
+"""
+Бенчмарк чтения CSV временного ряда: прежний способ (pd.read_csv всего файла и
+pd.to_datetime без формата) против общего загрузчика apps.timeseries.utils.csv_loader.
+
+Запуск из каталога backend:
+    python benchmarks/csv_loading.py --rows 1000000
+"""
+import argparse
+import io
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.timeseries.utils import csv_loader  # noqa: E402
+
+
+def make_csv(rows: int, date_format: str) -> bytes:
+    stamps = pd.date_range('2000-01-01', periods=rows, freq='h').strftime(date_format)
+    frame = pd.DataFrame({
+        'ds': stamps,
+        'y': np.random.default_rng(0).normal(100, 10, rows).round(3),
+        'store': 'A',
+        'comment': 'lorem ipsum',
+    })
+    return frame.to_csv(index=False).encode()
+
+
+def load_baseline(content: bytes) -> pd.DataFrame:
+    data = pd.read_csv(io.BytesIO(content))
+    data['ds'] = pd.to_datetime(data['ds'])
+    data['y'] = data['y'].astype(float)
+    return data
+
+
+def load_shared(content: bytes) -> pd.DataFrame:
+    return csv_loader.read_series_csv(io.BytesIO(content), 'ds', 'y')
+
+
+def load_chunked(content: bytes) -> int:
+    return sum(len(ds) for ds, _ in csv_loader.iter_series_csv(io.BytesIO(content), 'ds', 'y'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'pyarrow: {"да" if csv_loader.pyarrow_available() else "нет"}, строк: {args.rows}')
+    for date_format in ['%Y-%m-%d %H:%M:%S', '%d.%m.%Y %H:%M']:
+        content = make_csv(args.rows, date_format)
+        print(f'\nФормат дат {date_format!r}:')
+        for name, loader in [('прежний', load_baseline), ('общий загрузчик', load_shared),
+                             ('потоковый загрузчик', load_chunked)]:
+            try:
+                best = min(timeit.repeat(lambda: loader(content), number=1, repeat=args.repeat))
+            except ValueError as e:
+                print(f'  {name:<22} ошибка разбора: {str(e).splitlines()[0]}')
+                continue
+            print(f'  {name:<22} {args.rows / best:>14,.0f} строк/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -20,18 +20,26 @@ interface ForecastRun {
 const BenchmarkComparisonPage: React.FC = () => {
   const [results, setResults] = useState<ForecastRun[]>([]);
   const [error, setError] = useState<string>('');
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
+  const [loading, setLoading] = useState<boolean>(false);
+
+  // Результаты отдаются страницами (cursor pagination): следующая страница загружается по кнопке
+  const fetchBenchmarkResults = async (url: string, append: boolean) => {
+    setLoading(true);
+    try {
+      const response: { data: { results: ForecastRun[]; next: string | null } } = await apiClient.get(url);
+      setResults(prevResults => (append ? [...prevResults, ...response.data.results] : response.data.results));
+      setNextUrl(response.data.next);
+    } catch (err: any) {
+     const errorMsg = err.response?.data?.error || 'Ошибка при выполнение бенчмарка';
+      console.error(errorMsg);
+    } finally {
+      setLoading(false);
+    }
+  };
 
   useEffect(() => {
-    const fetchBenchmarkResults = async () => {
-      try {
-        const response = await apiClient.get('/forecasting/benchmark-results/');
-        setResults(response.data);
-      } catch (err: any) {
-       const errorMsg = err.response?.data?.error || 'Ошибка при выполнение бенчмарка';
-        console.error(errorMsg);
-      }
-    };
-    fetchBenchmarkResults();
+    fetchBenchmarkResults('/forecasting/benchmark-results/', false);
   }, []);
 
   const getDataSourceName = (run: ForecastRun) => {
@@ -182,6 +190,15 @@ const BenchmarkComparisonPage: React.FC = () => {
           </Table>
         </div>
       ))}
+      {nextUrl && (
+        <button
+          className="btn btn-secondary mb-5"
+          disabled={loading}
+          onClick={() => fetchBenchmarkResults(nextUrl, true)}
+        >
+          {loading ? 'Загрузка...' : 'Показать ещё'}
+        </button>
+      )}
     </div>
   );
 };